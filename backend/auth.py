@@ -1,3 +1,5 @@
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -18,4 +20,26 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(
         to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm
     )
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+# 已驗證過簽章的 token -> claims, 重連風暴時不必重複驗證簽章
+_claims_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def decode_access_token(token: str) -> dict:
+    claims = _claims_cache.get(token)
+    if claims is not None:
+        if claims["exp"] > time.time():
+            _claims_cache.move_to_end(token)
+            return claims
+        del _claims_cache[token]
+
+    # 驗證失敗時拋出 JWTError
+    claims = jwt.decode(
+        token, settings.jwt_secret, algorithms=[settings.jwt_algorithm]
+    )
+    if "exp" in claims:
+        _claims_cache[token] = claims
+        if len(_claims_cache) > settings.jwt_claims_cache_size:
+            _claims_cache.popitem(last=False)
+    return claims
\ No newline at end of file
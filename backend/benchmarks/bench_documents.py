@@ -0,0 +1,62 @@
+"""比較寫入路徑建立 MongoDB 文件的成本: Pydantic model vs 輕量文件建構器
+
+執行: python benchmarks/bench_documents.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models import UserDocument, UserModel, VideoDocument, VideoModel  # noqa: E402
+
+BATCH = 10_000
+ROUNDS = 5
+
+
+def pydantic_videos():
+    return [
+        VideoModel(title=f"video {i}", file_path=f"{i}.mp4", uploader_id="u1",
+                   uploader_username="root").dict(exclude={"id"})
+        for i in range(BATCH)
+    ]
+
+
+def lean_videos():
+    return [
+        VideoDocument(title=f"video {i}", file_path=f"{i}.mp4", uploader_id="u1",
+                      uploader_username="root").to_document()
+        for i in range(BATCH)
+    ]
+
+
+def pydantic_users():
+    return [
+        UserModel(username=f"user{i}", email=f"user{i}@example.com",
+                  password="hash").dict(exclude={"id"})
+        for i in range(BATCH)
+    ]
+
+
+def lean_users():
+    return [
+        UserDocument(username=f"user{i}", email=f"user{i}@example.com",
+                     password="hash").to_document()
+        for i in range(BATCH)
+    ]
+
+
+def main():
+    print(f"building {BATCH} documents for one insert_many batch")
+    for label, legacy, lean in [
+        ("videos", pydantic_videos, lean_videos),
+        ("users", pydantic_users, lean_users),
+    ]:
+        t_legacy = min(timeit.repeat(legacy, number=1, repeat=ROUNDS))
+        t_lean = min(timeit.repeat(lean, number=1, repeat=ROUNDS))
+        print(f"{label:7s} pydantic {t_legacy * 1000:8.2f} ms   "
+              f"lean {t_lean * 1000:8.2f} ms   x{t_legacy / t_lean:.1f}")
+
+
+if __name__ == "__main__":
+    main()
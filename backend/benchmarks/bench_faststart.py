@@ -0,0 +1,171 @@
+"""比較 moov 在檔尾與 faststart 佈局的首幀時間 (time-to-first-frame)
+
+在本機啟動與 main.py 相同的 /uploads/ 靜態路由 (支援 Range), 由 client 模擬瀏覽器的
+progressive 播放實際發出 HTTP 請求並計時: 從檔頭開始循序讀取頂層 box, moov 在 mdat 之前時
+同一個回應中讀到 moov 與第一個 frame 即可開始播放; moov 在檔尾時須另外以 range request
+讀取檔尾的 moov, 再以 range request 回到 mdat 開頭。
+網路條件以伺服器端每個請求延遲一個 RTT、client 端依頻寬限速讀取來模擬。
+另外量測 faststart 改寫本身的耗時與記憶體用量。
+
+執行: python benchmarks/bench_faststart.py
+"""
+import asyncio
+import os
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from faststart import faststart  # noqa: E402
+from tests.mp4_samples import build_mp4  # noqa: E402
+
+SECONDS = 600
+MDAT_BYTES = 64 * 1024 * 1024
+FIRST_FRAME_BYTES = 256 * 1024
+CHUNK_BYTES = 16 * 1024
+RUNS = 5
+# (名稱, RTT 秒, 頻寬 bytes/s)
+NETWORKS = [
+    ("lan", 0.002, 100e6),
+    ("broadband", 0.040, 6e6),
+    ("4g", 0.090, 2e6),
+]
+
+
+class Link:
+    """client 端的限速讀取: 每個回應讀到的 bytes 不超過收到回應後的經過時間 x 頻寬"""
+
+    def __init__(self, bandwidth: float):
+        self.bandwidth = bandwidth
+        self.start = time.perf_counter()
+        self.response_start = self.start
+        self.received = 0
+
+    def begin(self):
+        # 等待 RTT 的期間沒有傳輸資料, 不能累積成之後的頻寬
+        self.response_start = time.perf_counter()
+        self.received = 0
+
+    async def read(self, response: aiohttp.ClientResponse, nbytes: int) -> bytes:
+        data = await response.content.readexactly(nbytes)
+        self.received += nbytes
+        wait = self.response_start + self.received / self.bandwidth - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return data
+
+    async def read_chunked(self, response: aiohttp.ClientResponse, nbytes: int) -> bytes:
+        chunks = []
+        while nbytes > 0:
+            chunk = await self.read(response, min(CHUNK_BYTES, nbytes))
+            chunks.append(chunk)
+            nbytes -= len(chunk)
+        return b"".join(chunks)
+
+
+async def time_to_first_frame(session: aiohttp.ClientSession, url: str, bandwidth: float):
+    """回傳 (開始播放前經過的秒數, HTTP 請求數)"""
+    link = Link(bandwidth)
+    requests = 1
+    async with session.get(url, headers={"Range": "bytes=0-"}) as response:
+        link.begin()
+        offset = 0
+        while True:
+            size, box_type = struct.unpack(">I4s", await link.read(response, 8))
+            header_size = 8
+            if size == 1:
+                size = struct.unpack(">Q", await link.read(response, 8))[0]
+                header_size = 16
+            if box_type == b"moov":
+                # moov 在 mdat 之前: 同一個回應接著讀到第一個 frame
+                await link.read_chunked(response, size - header_size)
+                await link.read_chunked(response, 8 + FIRST_FRAME_BYTES)
+                return time.perf_counter() - link.start, requests
+            if box_type == b"mdat":
+                mdat_payload = offset + header_size
+                moov_offset = offset + size
+                break
+            await link.read_chunked(response, size - header_size)
+            offset += size
+    # 放棄循序讀取, 改讀檔尾的 moov 後回到 mdat 開頭
+    requests += 1
+    async with session.get(url, headers={"Range": f"bytes={moov_offset}-"}) as response:
+        link.begin()
+        await link.read_chunked(response, response.content_length)
+    requests += 1
+    end = mdat_payload + FIRST_FRAME_BYTES - 1
+    async with session.get(url, headers={"Range": f"bytes={mdat_payload}-{end}"}) as response:
+        link.begin()
+        await link.read_chunked(response, response.content_length)
+    return time.perf_counter() - link.start, requests
+
+
+async def measure(directory: str, names):
+    rtt = 0.0
+
+    @web.middleware
+    async def latency(request, handler):
+        await asyncio.sleep(rtt)
+        return await handler(request)
+
+    app = web.Application(middlewares=[latency])
+    app.router.add_static("/uploads/", directory)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    results = {}
+    try:
+        async with aiohttp.ClientSession() as session:
+            for network, network_rtt, bandwidth in NETWORKS:
+                rtt = network_rtt
+                for name in names:
+                    url = f"http://127.0.0.1:{port}/uploads/{name}"
+                    samples = [await time_to_first_frame(session, url, bandwidth)
+                               for _ in range(RUNS)]
+                    results[network, name] = (
+                        statistics.median(elapsed for elapsed, _ in samples),
+                        samples[0][1],
+                    )
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        before = os.path.join(tmp, "moov-at-end.mp4")
+        after = os.path.join(tmp, "faststart.mp4")
+        with open(before, "wb") as f:
+            f.write(build_mp4(seconds=SECONDS, mdat_size=MDAT_BYTES))
+        shutil.copyfile(before, after)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        faststart(after)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results = asyncio.run(measure(tmp, ["moov-at-end.mp4", "faststart.mp4"]))
+
+    print(f"rewrite {MDAT_BYTES / 2**20:.0f} MiB: {elapsed * 1000:.1f} ms, "
+          f"peak python memory {peak / 2**20:.2f} MiB")
+    for network, _, _ in NETWORKS:
+        t_before, n_before = results[network, "moov-at-end.mp4"]
+        t_after, n_after = results[network, "faststart.mp4"]
+        print(f"{network:10s} ttff moov-at-end {t_before * 1000:7.1f} ms ({n_before} requests)   "
+              f"faststart {t_after * 1000:7.1f} ms ({n_after} requests)")
+
+
+if __name__ == "__main__":
+    main()
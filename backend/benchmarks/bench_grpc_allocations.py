@@ -0,0 +1,79 @@
+"""GetVideo 每 GB 串流的記憶體配置: VideoChunk 訊息 vs StreamVideo 預先編碼的 frame
+
+兩條路徑都以 gRPC 實際會做的方式序列化 (SerializeToString / identity),
+以 tracemalloc 量測每個 chunk 的暫時配置量後換算成每 GB
+(只包含 Python 物件, protobuf 的 C arena 不在 tracemalloc 的範圍內)。
+
+執行: python benchmarks/bench_grpc_allocations.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import video_service_pb2  # noqa: E402
+from bench_grpc_stream import LegacyVideoService  # noqa: E402
+
+FILE_BYTES = 256 * 1024 * 1024
+GB = 1024 ** 3
+
+
+class Context:
+    async def send_initial_metadata(self, metadata):
+        pass
+
+    async def abort(self, code, details):
+        raise RuntimeError(details)
+
+
+async def measure(stream, serialize):
+    allocated = chunks = streamed = 0
+    iterator = stream.__aiter__()
+    start = time.perf_counter()
+    while True:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            message = await iterator.__anext__()
+        except StopAsyncIteration:
+            break
+        # 分兩段量測: 讀檔 / 建立訊息, 以及序列化; 各段的峰值增量即為該段配置的量
+        current, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+        tracemalloc.reset_peak()
+        frame = serialize(message)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+        streamed += len(frame)
+        chunks += 1
+        del message, frame
+    return allocated, chunks, streamed, time.perf_counter() - start
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs("uploads")
+        with open(os.path.join("uploads", "bench.mp4"), "wb") as f:
+            f.write(os.urandom(FILE_BYTES))
+
+        service = LegacyVideoService()
+        request = video_service_pb2.VideoRequest(video_id="bench")
+        tracemalloc.start()
+        for label, stream, serialize in [
+            ("VideoChunk", service.GetVideo(request, Context()),
+             lambda message: message.SerializeToString()),
+            ("StreamVideo", service.StreamVideo(request, Context()), lambda frame: frame),
+        ]:
+            allocated, chunks, streamed, elapsed = await measure(stream, serialize)
+            print(f"{label:12s} {chunks:5d} chunks   "
+                  f"{allocated * GB / streamed / 2**20:8.0f} MiB allocated per GB   "
+                  f"{streamed / elapsed / 2**20:8.0f} MiB/s")
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
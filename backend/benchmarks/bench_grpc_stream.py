@@ -0,0 +1,98 @@
+"""並行 GetVideo stream 的吞吐量: 舊設定 (ThreadPoolExecutor + 預設 options) vs create_server() + StreamVideo
+
+執行: python benchmarks/bench_grpc_stream.py [並行數 ...]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import video_service_pb2  # noqa: E402
+import video_service_pb2_grpc  # noqa: E402
+from grpc_server import VideoService, add_video_service, create_server  # noqa: E402
+
+FILE_BYTES = 32 * 1024 * 1024
+CHANNELS = 4
+
+
+class LegacyVideoService(VideoService):
+    """改版前的 GetVideo: 每個 1MB chunk 建立一個 VideoChunk 訊息, 每個都帶 video_id"""
+
+    async def GetVideo(self, request, context):
+        file_path = os.path.join(self.upload_path, f"{request.video_id}.mp4")
+        if not os.path.exists(file_path):
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Video not found")
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                yield video_service_pb2.VideoChunk(content=chunk, video_id=request.video_id)
+
+
+def legacy_server():
+    server = grpc.aio.server(futures.ThreadPoolExecutor(max_workers=10))
+    video_service_pb2_grpc.add_VideoServiceServicer_to_server(LegacyVideoService(), server)
+    return server
+
+
+def tuned_server():
+    server = create_server()
+    add_video_service(VideoService(), server)
+    return server
+
+
+async def run(factory, streams: int):
+    server = factory()
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+
+    channels = [grpc.aio.insecure_channel(f"127.0.0.1:{port}") for _ in range(CHANNELS)]
+    stubs = [video_service_pb2_grpc.VideoServiceStub(channel) for channel in channels]
+
+    async def fetch(index: int) -> float:
+        start = time.perf_counter()
+        received = 0
+        request = video_service_pb2.VideoRequest(video_id="bench")
+        async for chunk in stubs[index % CHANNELS].GetVideo(request):
+            received += len(chunk.content)
+        assert received == FILE_BYTES
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    durations = sorted(await asyncio.gather(*[fetch(i) for i in range(streams)]))
+    elapsed = time.perf_counter() - start
+
+    for channel in channels:
+        await channel.close()
+    await server.stop(grace=None)
+    return elapsed, durations
+
+
+async def main(concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs("uploads")
+        with open(os.path.join("uploads", "bench.mp4"), "wb") as f:
+            f.write(os.urandom(FILE_BYTES))
+
+        print(f"{FILE_BYTES / 2**20:.0f} MiB per stream over {CHANNELS} channels")
+        for streams in concurrency:
+            for label, factory in [("legacy", legacy_server), ("tuned", tuned_server)]:
+                elapsed, durations = await run(factory, streams)
+                total = FILE_BYTES * streams / 2**20
+                p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+                print(f"streams {streams:4d} {label:7s} {total / elapsed:8.1f} MiB/s   "
+                      f"p50 {statistics.median(durations) * 1000:8.1f} ms   "
+                      f"p99 {p99 * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1, 8, 32]))
@@ -0,0 +1,63 @@
+"""metrics 熱路徑的成本: Counter.inc / Histogram.observe 與 aiohttp middleware
+
+執行: python benchmarks/bench_metrics.py
+"""
+import asyncio
+import os
+import sys
+import time
+import timeit
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import Registry, metrics_middleware  # noqa: E402
+
+N = 1_000_000
+REQUESTS = 100_000
+
+
+def bench_primitives():
+    registry = Registry()
+    counter = registry.counter("bench_total", "bench", ("kind",))
+    histogram = registry.histogram("bench_seconds", "bench", ("route", "status"))
+    for label, stmt in [
+        ("counter.inc", lambda: counter.inc(1, "chat")),
+        ("histogram.observe", lambda: histogram.observe(0.0123, "/api/videos", "200")),
+        ("time.perf_counter x2", lambda: (time.perf_counter(), time.perf_counter())),
+    ]:
+        elapsed = min(timeit.repeat(stmt, number=N, repeat=3))
+        print(f"{label:22s} {elapsed / N * 1e9:7.1f} ns/op")
+
+
+async def bench_middleware():
+    async def handler(request):
+        return web.Response(text="ok")
+
+    # 使用真正的路由解析結果, 讓 middleware 取得路由樣板
+    app = web.Application()
+    app.router.add_get("/api/videos/{video_id}", handler)
+    request = make_mocked_request("GET", "/api/videos/1", app=app)
+    match_info = await app.router.resolve(request)
+    request = make_mocked_request("GET", "/api/videos/1", app=app, match_info=match_info)
+
+    async def direct():
+        for _ in range(REQUESTS):
+            await handler(request)
+
+    async def wrapped():
+        for _ in range(REQUESTS):
+            await metrics_middleware(request, handler)
+
+    for label, run in [("handler", direct), ("handler + metrics", wrapped)]:
+        start = time.perf_counter()
+        await run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:22s} {elapsed / REQUESTS * 1e6:7.2f} us/request")
+
+
+if __name__ == "__main__":
+    bench_primitives()
+    asyncio.run(bench_middleware())
@@ -0,0 +1,64 @@
+"""10k 筆影片列表的 JSON 序列化微基準
+
+執行: python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import serialization  # noqa: E402
+
+N_VIDEOS = 10_000
+ROUNDS = 20
+
+
+def build_listing():
+    uploader = ObjectId()
+    return [
+        {
+            "id": ObjectId(),
+            "title": f"video {i}.mp4",
+            "description": "premiere recording " * 3,
+            "file_path": f"{ObjectId()}.mp4",
+            "uploader": "root",
+            "uploader_id": uploader,
+            "created_at": datetime.utcnow(),
+            "views": i,
+        }
+        for i in range(N_VIDEOS)
+    ]
+
+
+def legacy(listing):
+    # 舊做法: handler 手動 str() 後交給 web.json_response (json.dumps)
+    converted = [
+        {**video, "id": str(video["id"]), "uploader_id": str(video["uploader_id"]),
+         "created_at": video["created_at"].isoformat()}
+        for video in listing
+    ]
+    return json.dumps(converted).encode()
+
+
+def main():
+    listing = build_listing()
+    candidates = {"legacy json.dumps + str()": legacy}
+    for name, dumps in serialization.BACKENDS.items():
+        candidates[f"serialization[{name}]"] = dumps
+
+    baseline = None
+    for name, fn in candidates.items():
+        seconds = min(timeit.repeat(lambda: fn(listing), number=1, repeat=ROUNDS))
+        baseline = baseline or seconds
+        size = len(fn(listing))
+        print(f"{name:32s} {seconds * 1000:8.2f} ms  {size / 1024:8.0f} KiB  "
+              f"x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""multi-worker 模式的 REST 吞吐量: 1..N 個 worker 以 SO_REUSEPORT 共用同一個 port
+
+每個 worker 與 main.py --workers 相同, 以 TCPSite(reuse_port=True) 監聽; handler 每次
+序列化 200 筆影片 (列表快取未命中時的主要 CPU 成本), 不需要 MongoDB。
+壓測 client 在另外的 process 中執行, 也會占用 CPU, 結果以相對於 1 個 worker 的倍數為準。
+
+執行: python benchmarks/bench_workers.py [worker 數 ...]
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from serialization import json_response  # noqa: E402
+
+VIDEOS = [
+    {
+        "id": f"{i:024x}",
+        "title": f"Video {i}",
+        "description": "x" * 200,
+        "file_path": f"{i:024x}.mp4",
+        "uploader": "bench",
+        "views": i,
+        "created_at": datetime(2024, 1, 1),
+        "duration": 120.5,
+    }
+    for i in range(200)
+]
+DURATION = 5.0
+CONNECTIONS = 32
+
+_context = multiprocessing.get_context("spawn")
+
+
+def serve(port: int, ready):
+    async def handler(request):
+        return json_response(VIDEOS)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/api/videos", handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port, reuse_port=True).start()
+        ready.put(os.getpid())
+        await asyncio.Future()
+
+    asyncio.run(run())
+
+
+def load(port: int, results):
+    async def client(session, deadline):
+        done = 0
+        while time.monotonic() < deadline:
+            async with session.get(f"http://127.0.0.1:{port}/api/videos") as res:
+                await res.read()
+            done += 1
+        return done
+
+    async def run():
+        # 每個請求使用新的連線, 讓 kernel 把連線平均分配到各個 worker
+        connector = aiohttp.TCPConnector(force_close=True, limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            deadline = time.monotonic() + DURATION
+            counts = await asyncio.gather(*[client(session, deadline) for _ in range(CONNECTIONS)])
+        results.put(sum(counts))
+
+    asyncio.run(run())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(workers: int, clients: int) -> float:
+    port = free_port()
+    ready, results = _context.Queue(), _context.Queue()
+    servers = [_context.Process(target=serve, args=(port, ready)) for _ in range(workers)]
+    for process in servers:
+        process.start()
+    for _ in servers:
+        ready.get()
+    loaders = [_context.Process(target=load, args=(port, results)) for _ in range(clients)]
+    for process in loaders:
+        process.start()
+    total = sum(results.get() for _ in loaders)
+    for process in loaders + servers:
+        process.terminate()
+        process.join()
+    return total / DURATION
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    counts = [int(n) for n in sys.argv[1:]] or sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    clients = max(1, cores // 2)
+    print(f"{cores} cores, {clients} load processes x {CONNECTIONS} connections")
+    baseline = None
+    for workers in counts:
+        rate = measure(workers, clients)
+        baseline = baseline or rate
+        print(f"{workers:3d} workers {rate:10.0f} req/s   x{rate / baseline:.2f}")
@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from config import settings
+from database import connect_to_mongo, close_mongo_connection, get_database
+from ingest import IngestPipeline
+from logging_config import setup_logging
+from media_probe import CONTAINER_EXTENSIONS, SNIFF_BYTES, sniff_container
+from models import VideoDocument
+from quotas import QuotaExceeded, UploadQuotas
+from reaper import NOT_DELETED, new_blob_name
+
+UPLOAD_DIR = "uploads"
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_source(item: dict, import_root: str) -> str:
+    """manifest 中的 path 或 file:// URL 轉成 import_root 底下的實際路徑"""
+    source = item.get("path") or item.get("url")
+    if not isinstance(source, str) or not source:
+        raise ValueError("path or url is required")
+    if "://" in source:
+        url = urlsplit(source)
+        if url.scheme != "file":
+            raise ValueError(f"Unsupported URL scheme: {url.scheme}")
+        source = unquote(url.path)
+
+    root = os.path.realpath(import_root)
+    path = os.path.realpath(os.path.join(root, source))
+    # 只允許匯入掛載目錄內的檔案
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("path is outside the import root")
+    if not os.path.isfile(path):
+        raise ValueError("file not found")
+    return path
+
+
+def _sniff(path: str) -> str:
+    # 與 REST 上傳相同, 依 magic bytes 判斷格式, 副檔名以實際格式為準
+    with open(path, "rb") as f:
+        container = sniff_container(f.read(SNIFF_BYTES))
+    if container is None:
+        raise ValueError("Unsupported video format")
+    return container
+
+
+def _probe(item: dict, import_root: str) -> Tuple[str, str, int]:
+    # 在 executor 中執行, 掛載目錄很慢時也不會阻塞 event loop
+    source = resolve_source(item, import_root)
+    return source, _sniff(source), os.path.getsize(source)
+
+
+async def ensure_import_index(db):
+    # 續傳時以 source_path 查詢已匯入的檔案; 只有匯入的影片有這個欄位, 用 sparse index
+    await db.videos.create_index("source_path", sparse=True)
+
+
+def _materialize(source: str, destination: str) -> str:
+    # 同一個檔案系統時用 hard link, 否則複製到暫存檔再 rename
+    try:
+        os.link(source, destination)
+        return "linked"
+    except OSError:
+        tmp_path = destination + ".part"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+        return "copied"
+
+
+async def import_manifest(
+    db,
+    items: List[dict],
+    uploader_id: str,
+    uploader_username: Optional[str] = None,
+    import_root: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    quotas: Optional[UploadQuotas] = None,
+) -> List[dict]:
+    """匯入 manifest 中的影片, 回傳每個項目的結果
+
+    已匯入過的來源檔 (以 source_path 判斷, 已刪除的不算) 會被略過, 中斷後重新執行即可續傳。
+    與 REST 上傳相同檢查檔案格式與上傳者的配額: 整次匯入佔用一個並行名額,
+    名額已滿時拋出 QuotaExceeded; 空間不足的項目個別回報錯誤。
+    """
+    import_root = import_root or settings.import_root
+    concurrency = concurrency or settings.import_concurrency
+    batch_size = batch_size or settings.import_batch_size
+    quotas = quotas or UploadQuotas()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe_one(item) -> Tuple[str, str, int]:
+        if not isinstance(item, dict):
+            raise ValueError("item must be an object")
+        async with semaphore:
+            return await loop.run_in_executor(None, _probe, item, import_root)
+
+    async def copy_one(result: dict, source: str, video: VideoDocument) -> bool:
+        async with semaphore:
+            try:
+                result["method"] = await loop.run_in_executor(
+                    None, _materialize, source,
+                    os.path.join(UPLOAD_DIR, video.file_path),
+                )
+                return True
+            except OSError as e:
+                result["error"] = str(e)
+                return False
+
+    # 路徑檢查、格式判斷與檔案大小都需要存取檔案系統, 與複製相同在 executor 中並行執行
+    probes = await asyncio.gather(*map(probe_one, items), return_exceptions=True)
+
+    results: List[dict] = []
+    pending = []
+    seen = {}
+    for index, (item, probe) in enumerate(zip(items, probes)):
+        result = {"index": index, "title": None, "status": "error"}
+        results.append(result)
+        if isinstance(item, dict):
+            result["title"] = item.get("title")
+        try:
+            if isinstance(probe, BaseException):
+                raise probe
+            source, container, size = probe
+            video = VideoDocument(
+                title=item.get("title") or os.path.basename(source),
+                description=item.get("description"),
+                file_path=new_blob_name(CONTAINER_EXTENSIONS[container]),
+                uploader_id=uploader_id,
+                uploader_username=uploader_username,
+                size=size,
+            )
+        except (ValueError, OSError) as e:
+            result["error"] = str(e)
+            continue
+        result["title"] = video.title
+        if source in seen:
+            result.update(status="skipped", duplicate_of=seen[source])
+            continue
+        seen[source] = index
+        pending.append((result, source, video))
+
+    await ensure_import_index(db)
+    reservation = await quotas.acquire(db, uploader_id)
+    try:
+        done = len(results) - len(pending)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            await _import_batch(db, batch, reservation, copy_one)
+            done += len(batch)
+            if progress is not None:
+                progress(done, len(results))
+    finally:
+        # 中途失敗時也只計入已寫入資料庫的檔案, 多預留的部分歸還
+        await reservation.commit()
+    return results
+
+
+async def _import_batch(db, batch: list, reservation, copy_one):
+    # 一次查出這批中已經匯入過且未刪除的來源檔
+    found = await db.videos.find(
+        {"source_path": {"$in": [source for _, source, _ in batch]}, **NOT_DELETED},
+        {"source_path": 1},
+    ).to_list(length=None)
+    existing = {doc["source_path"]: doc["_id"] for doc in found}
+    reserved = imported = 0
+    try:
+        todo = []
+        for result, source, video in batch:
+            if source in existing:
+                result.update(status="skipped", id=str(existing[source]))
+                continue
+            try:
+                await reservation.reserve(video.size)
+            except QuotaExceeded as e:
+                result["error"] = str(e)
+                continue
+            reserved += video.size
+            todo.append((result, source, video))
+
+        copied = await asyncio.gather(*[copy_one(*entry) for entry in todo])
+        todo = [entry for entry, ok in zip(todo, copied) if ok]
+        if not todo:
+            return
+
+        documents = []
+        for result, source, video in todo:
+            document = video.to_document()
+            document["source_path"] = source
+            documents.append(document)
+        failed = {}
+        try:
+            await db.videos.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "insert failed")
+                      for err in e.details.get("writeErrors", [])}
+        for position, ((result, source, video), document) in enumerate(zip(todo, documents)):
+            if position in failed:
+                result["error"] = failed[position]
+                _remove_quietly(os.path.join(UPLOAD_DIR, video.file_path))
+                continue
+            result.update(status="imported", id=str(document["_id"]),
+                          file_path=video.file_path)
+            imported += video.size
+    finally:
+        # 沒有複製成功或沒有寫入的檔案不計入已用空間
+        reservation.refund(reserved - imported)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def summarize(results: List[dict]) -> dict:
+    summary = {"imported": 0, "skipped": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return summary
+
+
+def load_manifest(path: str) -> List[dict]:
+    # 支援 JSON 陣列或每行一個物件的 JSON Lines
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import videos from a manifest")
+    parser.add_argument("manifest", help="JSON or JSON Lines manifest")
+    parser.add_argument("--uploader-id", required=True)
+    parser.add_argument("--import-root", default=settings.import_root)
+    parser.add_argument("--concurrency", type=int, default=settings.import_concurrency)
+    parser.add_argument("--batch-size", type=int, default=settings.import_batch_size)
+    args = parser.parse_args()
+
+    setup_logging()
+    items = load_manifest(args.manifest)
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        uploader = None
+        if ObjectId.is_valid(args.uploader_id):
+            uploader = await db.users.find_one(
+                {"_id": ObjectId(args.uploader_id)}, {"username": 1}
+            )
+        results = await import_manifest(
+            db, items, args.uploader_id,
+            uploader_username=uploader["username"] if uploader else None,
+            import_root=args.import_root,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            progress=lambda done, total: logger.info("Progress: %d/%d", done, total),
+        )
+
+        # 解析匯入影片的 metadata; CLI 在伺服器之外執行, 無法推送 video_created,
+        # 前端在列表快取失效 (change stream 或輪詢) 後才會看到新影片
+        pipeline = IngestPipeline()
+        for result in results:
+            if result["status"] == "imported":
+                pipeline.submit(ObjectId(result["id"]), result["file_path"])
+        await pipeline.drain()
+    finally:
+        await close_mongo_connection()
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    print(json.dumps(summarize(results)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
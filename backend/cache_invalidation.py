@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from datetime import timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import settings
+from database import get_database
+from reaper import TOMBSTONE_FIELD
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("videos", "users")
+
+# standalone mongod 不支援 change stream 時回傳的錯誤碼
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324)
+
+_UNSEEN = object()
+
+# 不改變數量、最大 _id 與觀看次數的寫入 (改名、軟刪除、ingest metadata) 一併設定此欄位,
+# 輪詢模式以其最大值偵測這類更新
+UPDATED_FIELD = "updated_at"
+
+
+class InvalidationBus:
+    """程序內的快取失效通知, 各個快取以 subscribe 註冊回呼"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[dict], None]] = []
+
+    def subscribe(self, callback: Callable[[dict], None]):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[dict], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, event: dict):
+        # event: {"collection", "operation", "document_id", "fields"}
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception("Error in invalidation subscriber")
+
+
+invalidation_bus = InvalidationBus()
+
+
+class CatalogueWatcher:
+    """監看 videos / users 的 change stream, 不支援時改用輪詢"""
+
+    def __init__(self, bus: InvalidationBus = invalidation_bus,
+                 collections: Tuple[str, ...] = WATCHED_COLLECTIONS,
+                 poll_interval: Optional[float] = None):
+        self.bus = bus
+        self.collections = collections
+        self.poll_interval = (
+            poll_interval if poll_interval is not None
+            else settings.cache_poll_interval_ms / 1000
+        )
+        self.mode: Optional[str] = None
+        self.events = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self._lag_total = 0.0
+        self._resume_tokens: Dict[str, dict] = {}
+        self._fingerprints: Dict[str, Optional[dict]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "events": self.events,
+            "lag_last_seconds": round(self.lag_last, 3),
+            "lag_max_seconds": round(self.lag_max, 3),
+            "lag_avg_seconds": round(self._lag_total / self.events, 3) if self.events else 0.0,
+        }
+
+    def _record_lag(self, lag: float):
+        lag = max(lag, 0.0)
+        self.events += 1
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        self._lag_total += lag
+
+    async def _run(self):
+        db = get_database()
+        if db is None:
+            return
+        self.mode = "change_stream"
+        watchers = [asyncio.create_task(self._watch(db, name)) for name in self.collections]
+        try:
+            await asyncio.gather(*watchers)
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAM_UNSUPPORTED:
+                raise
+        finally:
+            for task in watchers:
+                task.cancel()
+
+        logger.warning("Change streams unavailable, falling back to polling")
+        self.mode = "polling"
+        await self._poll(db)
+
+    async def _watch(self, db, name: str):
+        while True:
+            try:
+                async with db[name].watch(
+                    resume_after=self._resume_tokens.get(name)
+                ) as stream:
+                    async for change in stream:
+                        self._resume_tokens[name] = change["_id"]
+                        self.handle_change(name, change)
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                logger.warning("Change stream on %s failed: %s", name, e)
+            except PyMongoError as e:
+                logger.warning("Change stream on %s failed: %s", name, e)
+            # 重新連線期間可能漏掉事件, 保守地讓整個集合失效
+            self._resume_tokens.pop(name, None)
+            self.bus.publish({"collection": name, "operation": "invalidate",
+                              "document_id": None, "fields": None})
+            await asyncio.sleep(1)
+
+    def handle_change(self, name: str, change: dict):
+        # wallTime (MongoDB 6.0+) 精度為毫秒, 舊版本只能用 clusterTime 的秒數
+        wall_time = change.get("wallTime")
+        if wall_time is not None:
+            # wallTime 為 UTC naive datetime
+            lag = time.time() - wall_time.replace(tzinfo=timezone.utc).timestamp()
+        elif change.get("clusterTime") is not None:
+            lag = time.time() - change["clusterTime"].time
+        else:
+            lag = 0.0
+        self._record_lag(lag)
+
+        document_key = change.get("documentKey") or {}
+        description = change.get("updateDescription") or {}
+        self.bus.publish({
+            "collection": name,
+            "operation": change.get("operationType"),
+            "document_id": str(document_key["_id"]) if "_id" in document_key else None,
+            "fields": description.get("updatedFields"),
+        })
+
+    async def _poll(self, db):
+        last = time.monotonic()
+        while True:
+            for name in self.collections:
+                try:
+                    fingerprint = await self._fingerprint(db, name)
+                except PyMongoError as e:
+                    logger.warning("Polling %s failed: %s", name, e)
+                    continue
+                previous = self._fingerprints.get(name, _UNSEEN)
+                self._fingerprints[name] = fingerprint
+                if previous is not _UNSEEN and previous != fingerprint:
+                    # 輪詢模式的延遲上限為兩次輪詢之間的時間
+                    self._record_lag(time.monotonic() - last)
+                    self.bus.publish({"collection": name, "operation": "poll",
+                                      "document_id": None, "fields": None})
+            last = time.monotonic()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _fingerprint(self, db, name: str) -> Optional[dict]:
+        # 數量 + 最大 _id 可偵測新增與刪除, 觀看次數總和可偵測 views 更新,
+        # 軟刪除數量與最大 updated_at 可偵測軟刪除、改名與 metadata 更新
+        group = {"_id": None, "count": {"$sum": 1}, "max_id": {"$max": "$_id"},
+                 "updated_at": {"$max": f"${UPDATED_FIELD}"}}
+        if name == "videos":
+            group["views"] = {"$sum": "$views"}
+            group["deleted"] = {
+                "$sum": {"$cond": [{"$ifNull": [f"${TOMBSTONE_FIELD}", False]}, 1, 0]}
+            }
+        result = await db[name].aggregate([{"$group": group}]).to_list(length=1)
+        return result[0] if result else None
+
+
+catalogue_watcher_key = web.AppKey("catalogue_watcher", CatalogueWatcher)
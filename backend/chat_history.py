@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from pymongo.errors import CollectionInvalid
+
+from config import settings
+from database import get_database
+
+CHAT_COLLECTION = "chat_messages"
+
+logger = logging.getLogger(__name__)
+
+
+class ChatHistory:
+    """每個房間保留最近 N 則聊天訊息, 並可選擇批次寫入 MongoDB capped collection"""
+
+    def __init__(self, size: Optional[int] = None, persist: Optional[bool] = None):
+        self.size = size or settings.chat_history_size
+        self.persist = settings.chat_persist_enabled if persist is None else persist
+        self.rooms: Dict[str, Deque[dict]] = {}
+        self._loaded: Set[str] = set()
+        # 讀取中的房間; 同時加入的連線等待同一次讀取
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def append(self, room: str, message: dict):
+        ring = self.rooms.get(room)
+        if ring is None:
+            ring = self.rooms[room] = deque(maxlen=self.size)
+        ring.append(message)
+
+        if self.persist:
+            # 另存一份, 避免 insert_many 寫回的 _id 混進記憶體中的訊息
+            self._buffer.append({**message, "room": room})
+            if len(self._buffer) >= settings.chat_persist_batch_size:
+                self._wakeup.set()
+
+    def recent(self, room: str) -> List[dict]:
+        return list(self.rooms.get(room, ()))
+
+    async def load(self, room: str):
+        # 每個房間只在第一次有人加入時讀一次資料庫; 讀取失敗時下一個加入的連線會重試
+        if not self.persist or room in self._loaded:
+            return
+        task = self._loading.get(room)
+        if task is None:
+            task = self._loading[room] = asyncio.create_task(self._load(room))
+            task.add_done_callback(lambda _: self._loading.pop(room, None))
+        # 其中一個連線中斷時不取消其他連線也在等待的讀取
+        await asyncio.shield(task)
+
+    async def _load(self, room: str):
+        db = get_database()
+        if db is None:
+            return
+        try:
+            cursor = db[CHAT_COLLECTION].find(
+                {"room": room}, {"_id": 0, "room": 0}
+            ).sort("$natural", -1).limit(self.size)
+            stored = await cursor.to_list(length=self.size)
+        except Exception:
+            logger.exception("Error loading chat history for room %s", room)
+            return
+
+        ring = deque(reversed(stored), maxlen=self.size)
+        ring.extend(self.rooms.get(room, ()))
+        self.rooms[room] = ring
+        self._loaded.add(room)
+
+    async def start(self):
+        if not self.persist or self._writer_task is not None:
+            return
+        db = get_database()
+        if db is None:
+            return
+        try:
+            await db.create_collection(
+                CHAT_COLLECTION,
+                capped=True,
+                size=settings.chat_capped_collection_bytes,
+            )
+        except CollectionInvalid:
+            pass  # 已存在
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def _writer(self):
+        interval = settings.chat_persist_interval_ms / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error persisting chat messages")
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        db = get_database()
+        if db is None:
+            return
+        await db[CHAT_COLLECTION].insert_many(batch, ordered=False)
+
+    async def stop(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        await self.flush()
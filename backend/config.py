@@ -2,6 +2,7 @@
 from pydantic_settings import BaseSettings  # 修改這行
 from pydantic import EmailStr
 import os
+from typing import Dict
 
 class Settings(BaseSettings):
     mongodb_url: str = "mongodb://{host}:{port}".format(
@@ -11,8 +12,108 @@ class Settings(BaseSettings):
     database_name: str = "video_platform"
     jwt_secret: str = "your-secret-key"
     jwt_algorithm: str = "HS256"
+    jwt_claims_cache_size: int = 10000
     websocket_port: int = 8765
     grpc_port: int = 50051
     api_port: int = 8080
+    # JSON 序列化後端: auto (有 orjson 時使用 orjson) / orjson / json
+    json_backend: str = "auto"
+    # 聊天訊息批次送出的間隔 (毫秒), 0 表示每則訊息立即送出
+    websocket_batch_interval_ms: int = 0
+    # 每個使用者同時可開啟的 WebSocket 連線數
+    websocket_max_connections_per_user: int = 5
+    # views_updated 事件合併觀看次數的間隔 (毫秒)
+    view_event_interval_ms: int = 1000
+    # 影片目錄快取失效: change stream 監看, standalone mongod 改用輪詢
+    cache_watcher_enabled: bool = True
+    cache_poll_interval_ms: int = 2000
+    # GET /api/videos 回應快取
+    video_cache_ttl_ms: int = 5000
+    video_cache_max_entries: int = 256
+    # 批次匯入: 允許匯入的本機掛載目錄、檔案複製並行數與 insert_many 批次大小
+    import_root: str = "imports"
+    import_concurrency: int = 8
+    import_batch_size: int = 100
+    import_max_items: int = 10000
+    # 批次刪除與背景清除檔案
+    delete_max_ids: int = 1000
+    reaper_interval_ms: int = 30000
+    reaper_batch_size: int = 500
+    reaper_concurrency: int = 4
+    reaper_orphan_gc: bool = True
+    reaper_orphan_grace_seconds: int = 3600
+    # 上傳限制: 單檔大小、每位使用者的總空間與並行上傳數
+    upload_max_file_bytes: int = 1024 ** 3
+    upload_form_overhead_bytes: int = 64 * 1024
+    upload_quota_bytes: int = 10 * 1024 ** 3
+    upload_max_concurrent: int = 2
+    upload_quota_lease_bytes: int = 8 * 1024 * 1024
+    upload_quota_cache_ttl_ms: int = 10000
+    upload_slot_ttl_seconds: int = 3600
+    # 非串流 (JSON) 請求 body 的上限
+    max_request_body_bytes: int = 16 * 1024 * 1024
+    # 聊天紀錄: 每個房間保留的訊息數, 以及是否批次寫入 capped collection
+    chat_history_size: int = 200
+    chat_persist_enabled: bool = False
+    chat_persist_interval_ms: int = 1000
+    chat_persist_batch_size: int = 500
+    chat_capped_collection_bytes: int = 16 * 1024 * 1024
+    # 上傳後的背景處理: 並行數, 以及解析 moov box 時允許讀入的上限
+    ingest_concurrency: int = 2
+    probe_max_moov_bytes: int = 64 * 1024 * 1024
+    # 將 moov 移到檔頭 (faststart) 以及複製時使用的 buffer 大小
+    faststart_enabled: bool = True
+    faststart_buffer_bytes: int = 1024 * 1024
+    # gRPC 伺服器: 每個連線的並行 stream 數 (0 表示不限制 RPC 總數)、訊息大小、
+    # keepalive、壓縮 (none / gzip / deflate) 與 HTTP/2 flow control
+    grpc_max_concurrent_streams: int = 100
+    grpc_max_concurrent_rpcs: int = 0
+    grpc_max_message_bytes: int = 8 * 1024 * 1024
+    grpc_keepalive_time_ms: int = 30000
+    grpc_keepalive_timeout_ms: int = 10000
+    grpc_min_ping_interval_ms: int = 10000
+    grpc_compression: str = "none"
+    grpc_bdp_probe: bool = True
+    grpc_lookahead_bytes: int = 0
+    grpc_write_buffer_bytes: int = 0
+    # ListVideos 每頁的影片數
+    grpc_list_page_size: int = 100
+    grpc_list_max_page_size: int = 1000
+    # GetVideo 依送出速度調整 chunk 大小: 送出比 target 快就加倍, 慢就減半
+    grpc_chunk_min_bytes: int = 64 * 1024
+    grpc_chunk_max_bytes: int = 1024 * 1024
+    grpc_chunk_target_ms: int = 20
+    # gRPC 分段上傳: part 大小下限 (最後一個 part 除外)、part 數上限與未完成上傳的保留時間
+    multipart_min_part_bytes: int = 1024 * 1024
+    multipart_max_parts: int = 10000
+    multipart_upload_ttl_seconds: int = 86400
+    # /metrics 與 event loop 延遲的取樣間隔
+    metrics_enabled: bool = True
+    loop_lag_interval_ms: int = 500
+    # 阻塞 event loop 超過門檻時記錄 loop 執行緒的 stack (見 loop_watchdog)
+    loop_watchdog_enabled: bool = False
+    loop_watchdog_threshold_ms: int = 100
+    # request tracing: 關閉時 span 不會產生; tracing_exporter 為 log 或 memory
+    tracing_enabled: bool = False
+    tracing_exporter: str = "log"
+    # multi-worker 模式 (main.py --workers N): worker 心跳間隔與逾時、啟動與結束的等待上限
+    workers: int = 1
+    worker_heartbeat_interval_ms: int = 1000
+    worker_heartbeat_timeout_ms: int = 10000
+    worker_startup_timeout_seconds: int = 30
+    # 需大於 shutdown_timeout_seconds, worker 才有時間完成關閉程序
+    worker_shutdown_timeout_seconds: int = 40
+    # 收到 SIGTERM / SIGINT 後整個關閉程序的上限; 進行中的上傳與串流最多等待
+    # shutdown_timeout_seconds - shutdown_reserve_seconds, 保留的時間給 ingest 與 websocket 收尾,
+    # websocket 送出累積事件並以 1001 關閉至少另有 shutdown_websocket_seconds
+    shutdown_timeout_seconds: int = 30
+    shutdown_reserve_seconds: float = 5
+    shutdown_websocket_seconds: float = 2
+    # logging: 由背景執行緒輸出到 stdout, log_format 為 json 或 text
+    log_level: str = "INFO"
+    log_format: str = "json"
+    # 大量事件的 log 取樣比例 (logger 名稱 -> 保留比例, 1 為全部保留);
+    # 每個 REST 請求的 access log 與每個 span 的 log, WARNING 以上與 5xx 一律保留
+    log_sample_rates: Dict[str, float] = {"aiohttp.access": 0.1, "tracing": 0.1}
 
 settings = Settings()
\ No newline at end of file
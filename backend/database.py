@@ -1,26 +1,38 @@
+import logging
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
+from metrics import MongoCommandMetrics
+from tracing import MongoCommandTracer
+
+logger = logging.getLogger(__name__)
 
 class Database:
     client: AsyncIOMotorClient = None
 
 async def connect_to_mongo():
     try:
-        Database.client = AsyncIOMotorClient(settings.mongodb_url)
+        # 記錄每個 MongoDB command 的耗時, 開啟 tracing 時另外產生 span
+        listeners = [MongoCommandMetrics()] if settings.metrics_enabled else []
+        if settings.tracing_enabled:
+            listeners.append(MongoCommandTracer())
+        Database.client = AsyncIOMotorClient(
+            settings.mongodb_url, event_listeners=listeners
+        )
         # 測試連接
         await Database.client.admin.command('ping')
-        print("Connected to MongoDB!")
+        logger.info("Connected to MongoDB")
     except Exception as e:
-        print(f"Error connecting to MongoDB: {str(e)}")
+        logger.error("Error connecting to MongoDB: %s", e)
         raise
 
 async def close_mongo_connection():
     if Database.client is not None:
         Database.client.close()
-        print("Closed MongoDB connection")
+        logger.info("Closed MongoDB connection")
 
 def get_database():
     if Database.client is None:
-        print("Warning: Database client is None")
+        logger.warning("Database client is None")
         return None
     return Database.client[settings.database_name]
\ No newline at end of file
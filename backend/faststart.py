@@ -0,0 +1,104 @@
+import os
+import struct
+from typing import BinaryIO, Optional
+
+from config import settings
+from media_probe import iter_boxes, read_top_level_boxes
+
+# 含有 stco / co64 的 box 路徑: moov > trak > mdia > minf > stbl
+_OFFSET_CONTAINERS = {b"trak", b"mdia", b"minf", b"stbl"}
+
+_MAX_STCO = 0xFFFFFFFF
+
+
+class OffsetOverflow(Exception):
+    """位移後的 chunk offset 超出 stco 的 32-bit 範圍"""
+
+
+def shift_chunk_offsets(moov: bytearray, shift: int, start: int, end: int,
+                        box_start: int = 0, box_end: Optional[int] = None):
+    """將 [start, end) 範圍內的 chunk offset 加上 shift (原地修改)"""
+    box_end = len(moov) if box_end is None else box_end
+    for box_type, payload, child_end in iter_boxes(moov, box_start, box_end):
+        if box_type in _OFFSET_CONTAINERS:
+            shift_chunk_offsets(moov, shift, start, end, payload, child_end)
+        elif box_type in (b"stco", b"co64"):
+            fmt = ">I" if box_type == b"stco" else ">Q"
+            width = struct.calcsize(fmt)
+            count = struct.unpack_from(">I", moov, payload + 4)[0]
+            position = payload + 8
+            for _ in range(count):
+                offset = struct.unpack_from(fmt, moov, position)[0]
+                if start <= offset < end:
+                    offset += shift
+                    if box_type == b"stco" and offset > _MAX_STCO:
+                        raise OffsetOverflow(offset)
+                    struct.pack_into(fmt, moov, position, offset)
+                position += width
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, length: int, buffer: bytearray):
+    # 以固定大小的 buffer 複製, 記憶體用量與檔案大小無關
+    view = memoryview(buffer)
+    src.seek(offset)
+    while length > 0:
+        n = src.readinto(view[:min(length, len(buffer))])
+        if not n:
+            raise IOError("unexpected end of file")
+        dst.write(view[:n])
+        length -= n
+
+
+def faststart(path: str, buffer_size: Optional[int] = None) -> bool:
+    """把 moov 移到 mdat 之前, 讓瀏覽器不需先讀檔尾即可開始播放
+
+    已經是 faststart 佈局、不是 MP4/MOV 或無法安全改寫時回傳 False。
+    改寫結果先寫入暫存檔, fsync 後以 os.replace 原子地取代原檔。
+    """
+    buffer = bytearray(buffer_size or settings.faststart_buffer_bytes)
+    with open(path, "rb") as src:
+        file_size = os.fstat(src.fileno()).st_size
+        boxes = list(read_top_level_boxes(src, file_size))
+        types = [box_type for box_type, _, _, _ in boxes]
+        if b"moov" not in types or b"mdat" not in types:
+            return False
+        moov_index = types.index(b"moov")
+        mdat_index = types.index(b"mdat")
+        if moov_index < mdat_index:
+            return False
+        # 頂層 box 沒有涵蓋整個檔案時 (截斷或格式錯誤) 不改寫
+        _, last_offset, _, last_size = boxes[-1]
+        if last_offset + last_size != file_size:
+            return False
+
+        _, moov_offset, moov_header, moov_size = boxes[moov_index]
+        if moov_size > settings.probe_max_moov_bytes:
+            return False
+        src.seek(moov_offset)
+        moov = bytearray(src.read(moov_size))
+
+        # moov 插在第一個 mdat 之前, 兩者之間的資料都往後移 moov_size
+        insert_at = boxes[mdat_index][1]
+        try:
+            shift_chunk_offsets(moov, moov_size, insert_at, moov_offset, moov_header)
+        except OffsetOverflow:
+            return False
+
+        tmp_path = path + ".part"
+        try:
+            with open(tmp_path, "wb") as dst:
+                _copy_range(src, dst, 0, insert_at, buffer)
+                dst.write(moov)
+                _copy_range(src, dst, insert_at, moov_offset - insert_at, buffer)
+                tail = moov_offset + moov_size
+                _copy_range(src, dst, tail, file_size - tail, buffer)
+                dst.flush()
+                os.fsync(dst.fileno())
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    os.replace(tmp_path, path)
+    return True
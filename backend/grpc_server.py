@@ -1,29 +1,148 @@
 import grpc
-from concurrent import futures
 import video_service_pb2
 import video_service_pb2_grpc
 import asyncio
 from config import settings
 import os
+import time
+from typing import Optional
+from bson import ObjectId
+from cache_invalidation import invalidation_bus
+from database import get_database
+from media_probe import SNIFF_BYTES, sniff_container
+from metrics import GRPC_STREAM_BYTES, MetricsInterceptor
+from multipart_upload import MultipartUploadError, MultipartUploadManager
+from tracing import TRACER, TracingInterceptor
+from video_queries import get_video_info, increment_views, iter_video_pages
+from websocket_server import get_websocket_server
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+def server_options(reuse_port: bool = False) -> list:
+    """依 Settings 產生 grpc.aio.server 的 channel options
+
+    reuse_port 只在 multi-worker 模式開啟 (多個 worker 共用同一個 port);
+    grpc 在 Linux 上預設會開啟 SO_REUSEPORT, 單一 process 時明確關閉,
+    誤啟動第二個 server 時才會因 port 被占用而失敗。
+    """
+    options = [
+        ("grpc.so_reuseport", int(reuse_port)),
+        ("grpc.max_concurrent_streams", settings.grpc_max_concurrent_streams),
+        ("grpc.max_send_message_length", settings.grpc_max_message_bytes),
+        ("grpc.max_receive_message_length", settings.grpc_max_message_bytes),
+        ("grpc.keepalive_time_ms", settings.grpc_keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", settings.grpc_keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.min_ping_interval_without_data_ms", settings.grpc_min_ping_interval_ms),
+        ("grpc.http2.max_pings_without_data", 0),
+        # BDP probe 依實際頻寬延遲積自動調整 flow control window
+        ("grpc.http2.bdp_probe", int(settings.grpc_bdp_probe)),
+    ]
+    if settings.grpc_lookahead_bytes:
+        options.append(("grpc.http2.lookahead_bytes", settings.grpc_lookahead_bytes))
+    if settings.grpc_write_buffer_bytes:
+        options.append(("grpc.http2.write_buffer_size", settings.grpc_write_buffer_bytes))
+    return options
+
+
+def create_server(reuse_port: bool = False) -> grpc.aio.Server:
+    # servicer 全部是 coroutine, 不需要 ThreadPoolExecutor
+    if settings.grpc_compression not in COMPRESSION:
+        raise ValueError(f"Unknown gRPC compression: {settings.grpc_compression}")
+    interceptors = []
+    if settings.tracing_enabled:
+        interceptors.append(TracingInterceptor())
+    if settings.metrics_enabled:
+        interceptors.append(MetricsInterceptor())
+    return grpc.aio.server(
+        options=server_options(reuse_port),
+        interceptors=interceptors or None,
+        maximum_concurrent_rpcs=settings.grpc_max_concurrent_rpcs or None,
+        compression=COMPRESSION[settings.grpc_compression],
+    )
+
+
+def _video_info(video: dict) -> video_service_pb2.VideoInfo:
+    return video_service_pb2.VideoInfo(
+        id=str(video["id"]),
+        title=video["title"],
+        description=video["description"] or "",
+        file_path=video["file_path"],
+        uploader=video["uploader"],
+        views=int(video["views"]),
+        duration=video["duration"] or 0.0,
+    )
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+class ChunkSizer:
+    """依每個 chunk 送出所花的時間 (反映 HTTP/2 flow control window 的消化速度) 調整大小"""
+
+    def __init__(self, minimum: Optional[int] = None, maximum: Optional[int] = None,
+                 target: Optional[float] = None):
+        self.minimum = minimum or settings.grpc_chunk_min_bytes
+        # 保留 VideoChunk 欄位標頭的空間, 不超過 max message size
+        self.maximum = min(maximum or settings.grpc_chunk_max_bytes,
+                           settings.grpc_max_message_bytes - 1024)
+        self.target = target if target is not None else settings.grpc_chunk_target_ms / 1000
+        self.size = self.minimum
+
+    def observe(self, elapsed: float):
+        if elapsed < self.target / 4:
+            self.size = min(self.size * 2, self.maximum)
+        elif elapsed > self.target:
+            self.size = max(self.size // 2, self.minimum)
+
 
 class VideoService(video_service_pb2_grpc.VideoServiceServicer):
-    def __init__(self):
+    def __init__(self, multipart_enabled: bool = True):
         self.upload_path = "uploads"
         os.makedirs(self.upload_path, exist_ok=True)
+        # 分段上傳的狀態只存在這個 process 中; multi-worker 模式下後續的 UploadPart /
+        # CompleteMultipartUpload 可能連到其他 worker, 因此不提供
+        self.multipart_enabled = multipart_enabled
+        self.multipart = MultipartUploadManager(self.upload_path)
 
     async def UploadVideo(self, request_iterator, context):
         video_data = bytearray()
         video_id = None
+        checked = False
 
         async for chunk in request_iterator:
             if not video_id:
                 video_id = chunk.video_id
             video_data.extend(chunk.content)
+            # 收到足夠的開頭後立即檢查格式, 不是影片就不再接收
+            if not checked and len(video_data) >= SNIFF_BYTES:
+                await self._check_container(video_data, context)
+                checked = True
 
         if video_id:
+            if not checked:
+                await self._check_container(video_data, context)
             file_path = os.path.join(self.upload_path, f"{video_id}.mp4")
-            with open(file_path, "wb") as f:
-                f.write(video_data)
+            with TRACER.span("storage.write", attributes={"file.path": file_path,
+                                                          "file.bytes": len(video_data)}):
+                with open(file_path, "wb") as f:
+                    f.write(video_data)
+            GRPC_STREAM_BYTES.inc(len(video_data), "UploadVideo", "received")
             return video_service_pb2.UploadResponse(
                 video_id=video_id,
                 success=True,
@@ -34,20 +153,180 @@ class VideoService(video_service_pb2_grpc.VideoServiceServicer):
             message="Failed to upload video"
         )
 
+    async def _check_container(self, head, context):
+        if sniff_container(bytes(head[:SNIFF_BYTES])) is None:
+            await context.abort(
+                grpc.StatusCode.INVALID_ARGUMENT, "Unsupported video format"
+            )
+
     async def GetVideo(self, request, context):
-        video_id = request.video_id
-        file_path = os.path.join(self.upload_path, f"{video_id}.mp4")
+        """只在以產生的 add_VideoServiceServicer_to_server 註冊時使用 (回傳 VideoChunk 訊息);
+        add_video_service 以 GetVideo 的名稱直接註冊 StreamVideo。
+        """
+        async for frame in self.StreamVideo(request, context):
+            yield video_service_pb2.VideoChunk.FromString(frame)
 
-        if not os.path.exists(file_path):
-            context.abort(grpc.StatusCode.NOT_FOUND, "Video not found")
+    async def StreamVideo(self, request, context):
+        """GetVideo 的串流實作: 重複使用讀取 buffer 並直接產生編碼好的 VideoChunk
 
-        chunk_size = 1024 * 1024  # 1MB chunks
-        with open(file_path, "rb") as f:
+        video_id 只放在 initial metadata 與第一個 chunk, 回傳的 bytes 以 identity
+        serializer 送出, 每個 chunk 只配置一次記憶體。
+        """
+        video_id = request.video_id
+        file_path = os.path.join(self.upload_path, f"{video_id}.mp4")
+        try:
+            f = open(file_path, "rb", buffering=0)
+        except FileNotFoundError:
+            # abort 會拋出例外結束 RPC, 必須 await 才不會繼續串流
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Video not found")
+        with f, TRACER.span("storage.read", attributes={"file.path": file_path}) as span:
+            await context.send_initial_metadata((("x-video-id", video_id),))
+            encoded_id = video_id.encode()
+            first = b"\x12" + _varint(len(encoded_id)) + encoded_id
+            # 資料讀到固定位置, 欄位標頭寫在資料前面, 不需要再複製資料
+            header_room = len(first) + 11
+            sizer = ChunkSizer()
+            buffer = bytearray(header_room + sizer.maximum)
+            view = memoryview(buffer)
+            loop = asyncio.get_running_loop()
+            sent = 0
             while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
+                end = header_room + sizer.size
+                n = await loop.run_in_executor(None, f.readinto, view[header_room:end])
+                if not n:
                     break
-                yield video_service_pb2.VideoChunk(
-                    content=chunk,
-                    video_id=video_id
-                )
+                header = first + b"\x0a" + _varint(n)
+                first = b""
+                start = header_room - len(header)
+                view[start:header_room] = header
+                started = time.monotonic()
+                yield bytes(view[start:header_room + n])
+                sizer.observe(time.monotonic() - started)
+                GRPC_STREAM_BYTES.inc(n, "GetVideo", "sent")
+                sent += n
+            span.set_attribute("file.bytes", sent)
+
+    async def ListVideos(self, request, context):
+        page_size = min(
+            request.page_size or settings.grpc_list_page_size,
+            settings.grpc_list_max_page_size,
+        )
+        after = None
+        if request.page_token:
+            if not ObjectId.is_valid(request.page_token):
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Invalid page token")
+            after = ObjectId(request.page_token)
+
+        async for videos, last_id in iter_video_pages(get_database(), page_size, after):
+            # 不足一頁就是最後一頁, 不回傳 token, 客戶端不必再多請求一次空的頁面
+            yield video_service_pb2.VideoPage(
+                videos=[_video_info(video) for video in videos],
+                next_page_token=str(last_id) if len(videos) == page_size else "",
+            )
+
+    async def GetVideoInfo(self, request, context):
+        video = await get_video_info(get_database(), request.video_id)
+        if video is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Video not found")
+        return _video_info(video)
+
+    async def IncrementViews(self, request_iterator, context):
+        db = get_database()
+        accepted = updated = 0
+        async for batch in request_iterator:
+            counts, matched = await increment_views(db, list(batch.video_ids))
+            accepted += sum(counts.values())
+            updated += matched
+            if not counts:
+                continue
+            # 與 REST 相同: 讓列表快取失效並合併成 views_updated 事件
+            invalidation_bus.publish({
+                "collection": "videos",
+                "operation": "update",
+                "document_id": None,
+                "fields": ["views"],
+            })
+            ws_server = get_websocket_server()
+            if ws_server is not None:
+                for video_id, count in counts.items():
+                    ws_server.publish_view(video_id, count)
+        return video_service_pb2.IncrementViewsResponse(
+            accepted=accepted, updated=updated
+        )
+
+    async def CreateMultipartUpload(self, request, context):
+        if not self.multipart_enabled:
+            await context.abort(
+                grpc.StatusCode.UNIMPLEMENTED,
+                "Multipart uploads are not available with multiple workers, use UploadVideo",
+            )
+        try:
+            upload = self.multipart.create(
+                request.video_id, request.total_size, request.part_size
+            )
+        except MultipartUploadError as e:
+            await context.abort(e.code, str(e))
+        return video_service_pb2.CreateMultipartUploadResponse(
+            upload_id=upload.upload_id,
+            part_size=upload.part_size,
+            part_count=upload.part_count,
+        )
+
+    async def UploadPart(self, request_iterator, context):
+        # upload_id 與 part_number 只在第一個訊息
+        first = None
+        async for first in request_iterator:
+            break
+        if first is None:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Empty part")
+
+        async def contents():
+            yield first.content
+            async for chunk in request_iterator:
+                yield chunk.content
+
+        try:
+            checksum, size = await self.multipart.write_part(
+                first.upload_id, first.part_number, contents()
+            )
+        except MultipartUploadError as e:
+            await context.abort(e.code, str(e))
+        GRPC_STREAM_BYTES.inc(size, "UploadPart", "received")
+        return video_service_pb2.UploadPartResponse(
+            part_number=first.part_number, sha256=checksum, size=size
+        )
+
+    async def CompleteMultipartUpload(self, request, context):
+        try:
+            upload = self.multipart.get(request.upload_id)
+            await self.multipart.complete(
+                request.upload_id,
+                [(part.part_number, part.sha256) for part in request.parts],
+            )
+        except MultipartUploadError as e:
+            await context.abort(e.code, str(e))
+        return video_service_pb2.UploadResponse(
+            video_id=upload.video_id,
+            success=True,
+            message="Video uploaded successfully"
+        )
+
+    async def AbortMultipartUpload(self, request, context):
+        await self.multipart.abort(request.upload_id)
+        return video_service_pb2.UploadResponse(
+            success=True, message="Upload aborted"
+        )
+
+
+def add_video_service(service: VideoService, server: grpc.aio.Server):
+    # GetVideo 先交給送出預先編碼 bytes 的 handler, 其餘 RPC 使用產生的 servicer
+    server.add_generic_rpc_handlers((
+        grpc.method_handlers_generic_handler("video.VideoService", {
+            "GetVideo": grpc.unary_stream_rpc_method_handler(
+                service.StreamVideo,
+                request_deserializer=video_service_pb2.VideoRequest.FromString,
+                response_serializer=_identity,
+            ),
+        }),
+    ))
+    video_service_pb2_grpc.add_VideoServiceServicer_to_server(service, server)
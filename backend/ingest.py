@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Set
+
+from aiohttp import web
+from bson import ObjectId
+
+from cache_invalidation import UPDATED_FIELD, InvalidationBus, invalidation_bus
+from config import settings
+from database import get_database
+from faststart import faststart
+from media_probe import probe_file
+from tracing import TRACER
+
+UPLOAD_DIR = "uploads"
+
+logger = logging.getLogger(__name__)
+
+# 每個 stage 接收檔案路徑, 回傳要 $set 到影片文件的欄位 (或 None)
+IngestStage = Callable[[str], Optional[dict]]
+
+
+def probe_stage(path: str) -> Optional[dict]:
+    metadata = probe_file(path)
+    if metadata is None:
+        return None
+    return {"metadata": metadata}
+
+
+def faststart_stage(path: str) -> Optional[dict]:
+    # 只改寫檔案內容, 不需要更新影片文件
+    faststart(path)
+    return None
+
+
+def default_stages() -> List[IngestStage]:
+    stages: List[IngestStage] = []
+    if settings.faststart_enabled:
+        stages.append(faststart_stage)
+    stages.append(probe_stage)
+    return stages
+
+
+class IngestPipeline:
+    """上傳完成後在背景處理影片檔案, 各 stage 在 executor 中執行"""
+
+    def __init__(self, stages: Optional[List[IngestStage]] = None,
+                 upload_dir: Optional[str] = None,
+                 concurrency: Optional[int] = None,
+                 bus: InvalidationBus = invalidation_bus):
+        self.stages = default_stages() if stages is None else list(stages)
+        self.upload_dir = upload_dir or UPLOAD_DIR
+        self.bus = bus
+        self._semaphore = asyncio.Semaphore(concurrency or settings.ingest_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, video_id: ObjectId, file_path: str) -> asyncio.Task:
+        task = asyncio.create_task(self.process(video_id, file_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def process(self, video_id: ObjectId, file_path: str) -> dict:
+        path = os.path.join(self.upload_dir, file_path)
+        loop = asyncio.get_running_loop()
+        updates: dict = {}
+        async with self._semaphore:
+            for stage in self.stages:
+                try:
+                    with TRACER.span(f"ingest.{stage.__name__}", attributes={"file.path": path}):
+                        result = await loop.run_in_executor(None, stage, path)
+                except Exception as e:
+                    logger.error("Error in ingest stage %s for %s: %s", stage.__name__, file_path, e)
+                    # 記錄在影片文件中, 處理失敗的影片可以被找出來
+                    updates.setdefault("ingest_errors", {})[stage.__name__] = str(e)
+                    continue
+                if result:
+                    updates.update(result)
+
+        if updates:
+            db = get_database()
+            if db is not None:
+                await db.videos.update_one(
+                    {"_id": video_id}, {"$set": {**updates, UPDATED_FIELD: datetime.utcnow()}}
+                )
+                # 列表中包含 metadata, 寫入後讓快取失效
+                self.bus.publish({
+                    "collection": "videos",
+                    "operation": "update",
+                    "document_id": video_id,
+                    "fields": list(updates),
+                })
+        return updates
+
+
+ingest_pipeline_key = web.AppKey("ingest_pipeline", IngestPipeline)
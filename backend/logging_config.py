@@ -0,0 +1,163 @@
+import atexit
+import contextvars
+import copy
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+
+from config import settings
+from serialization import dumps_str
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+# LogRecord 內建的屬性, 其餘透過 extra= 傳入的欄位會輸出到 JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_JSON_TYPES = (str, int, float, bool, type(None), list, dict)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value if isinstance(value, _JSON_TYPES) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return dumps_str(entry)
+
+
+class ContextFilter(logging.Filter):
+    """在產生 log 的 task 中讀取 request id (QueueHandler 之後就換了執行緒)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """大量事件只保留約 r 的比例; r 取自 extra={"sample_rate": r} 或依 logger 名稱設定的比例。
+    WARNING 以上與 5xx 的 access log 一律保留。
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self._rates = dict(rates or {})
+        self._seen: Dict[Tuple[str, str], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self._rates.get(record.name)
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        status = getattr(record, "response_status", None)
+        if isinstance(status, int) and status >= 500:
+            return True
+        if rate <= 0:
+            return False
+        every = max(1, round(1 / rate))
+        sample_key = getattr(record, "sample_key", None)
+        if sample_key is not None:
+            # 同一個 key (例如 trace id) 的事件一起保留或捨棄
+            return zlib.crc32(str(sample_key).encode()) % every == 0
+        # 依 (logger, 訊息樣板) 計數, 每 1/rate 筆保留一筆, 結果可重現;
+        # 沒有 args 的訊息 (例如 access log) 已經是完整字串, 只依 logger 計數
+        key = (record.name, str(record.msg) if record.args else "")
+        seen = self._seen.get(key, 0)
+        self._seen[key] = seen + 1
+        return seen % every == 0
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """與 QueueHandler 相同, 但 traceback 保留在 exc_text 而不是併入訊息,
+    listener 端的 formatter (例如 JsonFormatter 的 "exc" 欄位) 才能分開輸出
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # args 可能無法 pickle 或之後被修改, 在產生 log 的執行緒先合併成訊息
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """root logger 只把 record 放進 queue, 由背景執行緒格式化並寫到 stdout
+
+    stdout 是慢速 pipe 時也不會阻塞 event loop。重複呼叫時沿用同一個 listener。
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(settings.log_sample_rates))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.log_format == "json"
+                        else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level or settings.log_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    # 停止前會先寫完 queue 中剩下的 record
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@web.middleware
+async def request_id_middleware(request: web.Request, handler):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        e.headers["X-Request-ID"] = request_id
+        raise
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
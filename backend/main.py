@@ -1,28 +1,56 @@
+import argparse
 import asyncio
 import logging
+import signal
 from aiohttp import web
 import aiohttp_cors
 import websockets  # 添加這行
-from concurrent import futures
 from database import connect_to_mongo, close_mongo_connection
-from websocket_server import WebSocketServer
-from grpc_server import VideoService
-import video_service_pb2_grpc
+from cache_invalidation import CatalogueWatcher, catalogue_watcher_key, invalidation_bus
+from response_cache import ResponseCache, video_cache_key
+from reaper import BlobReaper
+from quotas import UploadQuotas, upload_quotas_key
+from metrics import LoopLagMonitor, metrics_middleware
+from logging_config import request_id_middleware, setup_logging
+from loop_watchdog import LoopWatchdog
+from tracing import EXPORTERS, TRACER, tracing_middleware
+from ingest import IngestPipeline, ingest_pipeline_key
+from websocket_server import WebSocketServer, WebSocketHub
+from supervisor import WorkerAgent
+from grpc_server import VideoService, add_video_service, create_server
 from config import settings
-import grpc
 from pathlib import Path  # 添加這行
+from typing import Optional
 
+logger = logging.getLogger(__name__)
 
-async def init_app() -> web.Application:
-    # 初始化 logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
 
+async def init_app() -> web.Application:
     # 創建 aiohttp 應用
+    # 影片上傳以串流方式讀取並由 create_video 自行檢查大小,
+    # client_max_size 只限制一次讀入記憶體的 JSON body
+    middlewares = [request_id_middleware]
+    if settings.tracing_enabled:
+        TRACER.configure(EXPORTERS[settings.tracing_exporter]())
+        middlewares.append(tracing_middleware)
+    if settings.metrics_enabled:
+        middlewares.append(metrics_middleware)
     app = web.Application(
-        client_max_size=1024 ** 3  # 設置為 1GB
+        client_max_size=settings.max_request_body_bytes,
+        middlewares=middlewares,
     )
 
+    # 每位使用者的上傳空間與並行數限制
+    app[upload_quotas_key] = UploadQuotas()
+
+    # 上傳後的背景處理 (解析 metadata)
+    app[ingest_pipeline_key] = IngestPipeline()
+
+    # GET /api/videos 回應快取, 由寫入與 invalidation bus 使其失效
+    video_cache = ResponseCache()
+    app[video_cache_key] = video_cache
+    invalidation_bus.subscribe(video_cache.on_invalidation)
+
     # 添加靜態文件服務
     app.router.add_static('/uploads/', Path('uploads/'), show_index=True)
 
@@ -50,64 +78,159 @@ async def init_app() -> web.Application:
     return app
 
 
-async def start_websocket_server():
+async def start_websocket_server() -> WebSocketServer:
     ws_server = WebSocketServer()
-    await websockets.serve(
+    WebSocketHub.server = ws_server
+    await ws_server.history.start()
+    ws_server.serving = await websockets.serve(
         ws_server.handler,
         "0.0.0.0",
-        settings.websocket_port
+        settings.websocket_port,
+        process_request=ws_server.process_request
     )
+    return ws_server
 
 
-async def start_grpc_server():
-    server = grpc.aio.server(futures.ThreadPoolExecutor(max_workers=10))
-    video_service_pb2_grpc.add_VideoServiceServicer_to_server(
-        VideoService(), server
-    )
+async def start_grpc_server(reuse_port: bool = False):
+    server = create_server(reuse_port)
+    # reuse_port 表示 multi-worker 模式, 分段上傳無法跨 worker 進行
+    add_video_service(VideoService(multipart_enabled=not reuse_port), server)
     server.add_insecure_port(f'[::]:{settings.grpc_port}')
     await server.start()
     return server
 
 
-async def cleanup_mongo(app):
-    await close_mongo_connection()
+async def _drain(aw, deadline: float, what: str):
+    # 超過關閉期限的步驟直接放棄, 其餘步驟照常執行
+    remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+    try:
+        await asyncio.wait_for(aw, remaining)
+    except asyncio.TimeoutError:
+        logger.warning("Shutdown deadline reached while waiting for %s", what)
+
+
+def request_drain_seconds() -> float:
+    # 進行中的 REST 請求與 gRPC 呼叫只能用到期限前 shutdown_reserve_seconds, 其餘留給後續步驟
+    return max(0.0, settings.shutdown_timeout_seconds - settings.shutdown_reserve_seconds)
 
 
-async def main():
+async def shutdown_services(runner: web.AppRunner, grpc_server, ingest: IngestPipeline,
+                            background, ws_server: Optional[WebSocketServer] = None):
+    """依序關閉服務, 整個程序不超過 shutdown_timeout_seconds (websocket 收尾另有保留)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.shutdown_timeout_seconds
+
+    # 1. 停止接受新連線, 等待進行中的 REST 請求與 gRPC 呼叫 (上傳、串流) 完成;
+    #    runner 的 shutdown_timeout 同樣是 request_drain_seconds()
+    if ws_server is not None:
+        ws_server.stop_accepting()
+    await asyncio.gather(
+        runner.cleanup(),
+        grpc_server.stop(grace=request_drain_seconds()),
+    )
+
+    # 2. 已上傳影片的背景處理
+    await _drain(ingest.drain(), deadline, "ingest")
+    for service in background:
+        await service.stop()
+
+    # 3. 送出累積的觀看次數事件與聊天紀錄, 再以 1001 (going away) 關閉 websocket;
+    #    前面的步驟用完期限時仍有自己的時間, 客戶端不會只看到 1006
+    if ws_server is not None:
+        ws_deadline = max(deadline, loop.time() + settings.shutdown_websocket_seconds)
+        await _drain(ws_server.shutdown(), ws_deadline, "websocket connections")
+
+
+async def main(agent: Optional[WorkerAgent] = None):
+    """啟動所有服務
+
+    agent 不為 None 時是 multi-worker 模式下的 worker: 只執行 REST 與 gRPC
+    (以 SO_REUSEPORT 與其他 worker 共用 port), websocket 事件經 agent.relay 交給
+    supervisor, reaper 也只在 supervisor 中執行。
+    """
+    worker = agent is not None
     # 初始化所有服務
-    logging.info("Initializing all services...")
+    logger.info("Initializing all services...")
 
     app = await init_app()
-    app.on_cleanup.append(cleanup_mongo)  # 添加清理函數
 
-    # 啟動 WebSocket 服務器
-    logging.info("Starting WebSocket server...")
-    await start_websocket_server()
+    # 啟動快取失效監看 (change stream / 輪詢)
+    watcher = CatalogueWatcher(invalidation_bus)
+    app[catalogue_watcher_key] = watcher
+    if settings.cache_watcher_enabled:
+        await watcher.start()
+
+    # event loop 延遲, 匯出於 /metrics
+    lag_monitor = LoopLagMonitor(settings.loop_lag_interval_ms / 1000)
+    if settings.metrics_enabled:
+        await lag_monitor.start()
+
+    # 選用: 找出阻塞 event loop 的同步呼叫
+    watchdog = LoopWatchdog(settings.loop_watchdog_threshold_ms / 1000)
+    if settings.loop_watchdog_enabled:
+        await watchdog.start()
+
+    # 背景清除軟刪除影片的檔案與孤兒檔案
+    reaper = BlobReaper()
+    ws_server = None
+    if worker:
+        WebSocketHub.server = agent.relay
+    else:
+        await reaper.start()
+
+        # 啟動 WebSocket 服務器
+        logger.info("Starting WebSocket server...")
+        ws_server = await start_websocket_server()
 
     # 啟動 gRPC 服務器
-    logging.info("Starting gRPC server...")
-    grpc_server = await start_grpc_server()
+    logger.info("Starting gRPC server...")
+    grpc_server = await start_grpc_server(reuse_port=worker)
 
     # 啟動 REST API 服務器
-    logging.info("Starting REST API server...")
-    runner = web.AppRunner(app)
+    logger.info("Starting REST API server...")
+    # 關閉時最多等待 request_drain_seconds() 讓進行中的請求 (上傳) 完成
+    runner = web.AppRunner(app, shutdown_timeout=request_drain_seconds())
     await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", settings.api_port)
+    site = web.TCPSite(runner, "0.0.0.0", settings.api_port, reuse_port=worker)
     await site.start()
 
-    logging.info(f"REST API server started on port {settings.api_port}")
-    logging.info(f"WebSocket server started on port {settings.websocket_port}")
-    logging.info(f"gRPC server started on port {settings.grpc_port}")
-
-    # 保持服務運行
+    logger.info("REST API server started on port %d", settings.api_port)
+    if not worker:
+        logger.info("WebSocket server started on port %d", settings.websocket_port)
+    logger.info("gRPC server started on port %d", settings.grpc_port)
+
+    # 保持服務運行, 直到收到 SIGTERM / SIGINT
+    # (worker 的 SIGINT 已忽略, 由 supervisor 以 SIGTERM 依序結束)
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    for sig in (signal.SIGTERM,) if worker else (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(None))
     try:
-        await asyncio.Future()  # run forever
+        if worker:
+            await agent.serve(stopped)
+        else:
+            await stopped
     finally:
-        logging.info("Cleaning up...")
-        await runner.cleanup()
-        await grpc_server.stop(grace=None)
+        logger.info("Shutting down...")
+        await shutdown_services(
+            runner, grpc_server, app[ingest_pipeline_key],
+            [watcher, reaper, lag_monitor, watchdog], ws_server,
+        )
+        # 最後才關閉 MongoDB, 前面的步驟仍可能寫入
+        await close_mongo_connection()
+        logger.info("Shutdown complete")
 
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Video platform backend")
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="REST/gRPC worker processes sharing the ports via SO_REUSEPORT")
+    args = parser.parse_args()
+
+    # JSON log 經由 queue 交給背景執行緒寫出, 不阻塞 event loop
+    setup_logging()
+    if args.workers > 1:
+        from supervisor import Supervisor
+        asyncio.run(Supervisor(args.workers).run())
+    else:
+        asyncio.run(main())
\ No newline at end of file
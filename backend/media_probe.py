@@ -0,0 +1,225 @@
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from config import settings
+
+# 判斷容器格式需要的開頭長度 (MPEG-TS 需要兩個 188 bytes 的 packet)
+SNIFF_BYTES = 512
+
+# ISO BMFF 的 ftyp 中代表 MP4/MOV 影片的 brand; HEIC/AVIF 圖片與 M4A/M4B 音訊也是 ISO BMFF
+_VIDEO_BRANDS = {
+    b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6",
+    b"mp41", b"mp42", b"avc1", b"dash", b"M4V ", b"qt  ",
+}
+# major brand 為圖片或音訊時, 即使相容 brand 列出 isom / mp42 也不是影片
+_NON_VIDEO_BRANDS = {
+    b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1", b"avif", b"avis",
+    b"M4A ", b"M4B ", b"M4P ", b"F4A ", b"F4B ",
+}
+
+
+def _is_video_brand(brand: bytes) -> bool:
+    return brand in _VIDEO_BRANDS or brand.startswith(b"3gp")
+
+
+def _bmff_video_brand(head: bytes) -> Optional[bytes]:
+    """檔頭為 ftyp 且 brand 屬於影片時回傳 major brand, 否則回傳 None"""
+    if len(head) < 12 or head[4:8] != b"ftyp":
+        return None
+    major = head[8:12]
+    if _is_video_brand(major):
+        return major
+    if major in _NON_VIDEO_BRANDS:
+        return None
+    # 其他 major brand (廠商自訂) 以相容 brand 判斷, 在 minor version 之後
+    size = min(struct.unpack(">I", head[:4])[0], len(head))
+    compatible = [head[i:i + 4] for i in range(16, size - 3, 4)]
+    if any(_is_video_brand(brand) for brand in compatible):
+        return major
+    return None
+
+CONTAINER_EXTENSIONS = {
+    "mp4": ".mp4",
+    "mov": ".mov",
+    "webm": ".webm",
+    "mkv": ".mkv",
+    "avi": ".avi",
+    "flv": ".flv",
+    "ogg": ".ogv",
+    "ts": ".ts",
+    "mpeg": ".mpg",
+    "asf": ".wmv",
+}
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """依檔頭的 magic bytes 判斷影片容器格式, 不是影片時回傳 None"""
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        brand = _bmff_video_brand(head)
+        if brand is None:
+            return None
+        return "mov" if brand == b"qt  " else "mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm" if b"webm" in head[:64] else "mkv"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if head.startswith(b"FLV\x01"):
+        return "flv"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return "ts"
+    if head.startswith(b"\x00\x00\x01\xba"):
+        return "mpeg"
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "asf"
+    return None
+
+
+def iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """逐一回傳 (type, payload 起點, box 終點)"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def read_top_level_boxes(f: BinaryIO, file_size: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """只讀取每個頂層 box 的標頭, 回傳 (type, box 起點, 標頭長度, box 長度)"""
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            return
+        yield box_type, offset, header_size, size
+        offset += size
+
+
+def _find(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for child_type, child_start, child_end in iter_boxes(data, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _parse_mvhd(data: bytes, start: int) -> Tuple[int, int]:
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return timescale, duration
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> dict:
+    track = {}
+    tkhd = _find(data, start, end, b"tkhd")
+    if tkhd is not None:
+        # tkhd 最後 8 bytes 為 16.16 定點數的顯示寬高
+        width, height = struct.unpack_from(">II", data, tkhd[1] - 8)
+        track["width"], track["height"] = width >> 16, height >> 16
+
+    mdia = _find(data, start, end, b"mdia")
+    if mdia is None:
+        return track
+    hdlr = _find(data, mdia[0], mdia[1], b"hdlr")
+    if hdlr is not None:
+        track["handler"] = data[hdlr[0] + 8:hdlr[0] + 12]
+    mdhd = _find(data, mdia[0], mdia[1], b"mdhd")
+    if mdhd is not None:
+        track["timescale"], track["duration"] = _parse_mvhd(data, mdhd[0])
+
+    minf = _find(data, mdia[0], mdia[1], b"minf")
+    stbl = _find(data, minf[0], minf[1], b"stbl") if minf else None
+    if stbl is None:
+        return track
+    stsd = _find(data, stbl[0], stbl[1], b"stsd")
+    if stsd is not None and stsd[1] - stsd[0] >= 16:
+        # 第一個 sample entry 的 type 即為 codec (avc1, hvc1, mp4a ...)
+        track["codec"] = data[stsd[0] + 12:stsd[0] + 16].decode("latin-1").strip()
+    stsz = _find(data, stbl[0], stbl[1], b"stsz")
+    if stsz is not None:
+        track["samples"] = struct.unpack_from(">I", data, stsz[0] + 8)[0]
+    return track
+
+
+def parse_moov(moov: bytes, file_size: int, brand: Optional[bytes] = None) -> dict:
+    metadata = {"container": "mov" if brand == b"qt  " else "mp4"}
+    mvhd = _find(moov, 0, len(moov), b"mvhd")
+    duration = None
+    if mvhd is not None:
+        timescale, ticks = _parse_mvhd(moov, mvhd[0])
+        if timescale:
+            duration = ticks / timescale
+            metadata["duration"] = round(duration, 3)
+
+    for box_type, start, end in iter_boxes(moov):
+        if box_type != b"trak":
+            continue
+        track = _parse_trak(moov, start, end)
+        handler = track.get("handler")
+        if handler == b"vide" and "video_codec" not in metadata:
+            metadata["video_codec"] = track.get("codec")
+            metadata["width"] = track.get("width")
+            metadata["height"] = track.get("height")
+            if track.get("timescale") and track.get("duration") and track.get("samples"):
+                seconds = track["duration"] / track["timescale"]
+                metadata["frame_rate"] = round(track["samples"] / seconds, 3)
+        elif handler == b"soun" and "audio_codec" not in metadata:
+            metadata["audio_codec"] = track.get("codec")
+
+    if duration:
+        metadata["bitrate"] = int(file_size * 8 / duration)
+    return metadata
+
+
+def probe_file(path: str) -> Optional[dict]:
+    """讀取 MP4/MOV 的 moov box 取得長度、解析度、codec 與 bitrate
+
+    只讀取頂層 box 的標頭與 moov 本身, 不會讀取整個檔案;
+    其他影片容器或 moov 過大時回傳 None。檔頭不是可辨識的影片格式
+    (包括 ftyp brand 不屬於影片的 ISO BMFF) 時拋出 ValueError, 不會嘗試解析。
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        # 與上傳相同的格式判斷, ftyp 必須在檔頭且 brand 屬於影片
+        head = f.read(SNIFF_BYTES)
+        container = sniff_container(head)
+        if container is None:
+            raise ValueError("Unsupported video format")
+        if container not in ("mp4", "mov"):
+            return None
+        brand = _bmff_video_brand(head)
+        for box_type, offset, header_size, size in read_top_level_boxes(f, file_size):
+            if box_type == b"moov":
+                if size > settings.probe_max_moov_bytes:
+                    return None
+                f.seek(offset + header_size)
+                moov = f.read(size - header_size)
+                return parse_moov(moov, file_size, brand)
+    return None
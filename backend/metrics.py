@@ -0,0 +1,337 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import grpc
+from aiohttp import web
+from pymongo import monitoring
+
+# 延遲類 histogram 的預設 bucket (秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """只增不減的計數器; 以 label 值的 tuple 為 key 存在 dict 中
+
+    更新不使用鎖: event loop 上的更新不會互相打斷, 少數來自 executor 執行緒的
+    更新 (MongoDB 事件) 在極少數情況下可能少算一次, 對監控用途可以接受。
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labels: str):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in list(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """可增可減的數值"""
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def dec(self, amount: float = 1, *labels: str):
+        self.inc(-amount, *labels)
+
+
+class Histogram(Metric):
+    """固定 bucket 的 histogram; observe 只做一次二分搜尋與兩個加法, 累計值在匯出時計算"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各 bucket 的次數 ..., +Inf 的次數, 總和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "REST request latency by route",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "REST requests currently being handled",
+)
+GRPC_HANDLING_DURATION = REGISTRY.histogram(
+    "grpc_server_handling_seconds", "gRPC method duration",
+    ("method", "code"),
+)
+GRPC_STREAM_BYTES = REGISTRY.counter(
+    "grpc_server_stream_bytes_total", "Video bytes streamed over gRPC",
+    ("method", "direction"),
+)
+WEBSOCKET_CONNECTIONS = REGISTRY.gauge(
+    "websocket_connections", "Open WebSocket connections",
+)
+WEBSOCKET_MESSAGES = REGISTRY.counter(
+    "websocket_messages_total", "WebSocket frames sent by fan-out",
+    ("kind",),
+)
+WEBSOCKET_FANOUT_DURATION = REGISTRY.histogram(
+    "websocket_fanout_seconds", "Time to send one frame to every recipient",
+    ("kind",),
+)
+MONGO_COMMAND_DURATION = REGISTRY.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency",
+    ("command", "outcome"),
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled wakeup and when it ran",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_BLOCKED = REGISTRY.counter(
+    "event_loop_blocked_total", "Times the event loop was blocked past the watchdog threshold",
+    ("site",),
+)
+
+
+# route 物件 -> 路由樣板; resource.canonical 每次都會重新計算, 快取起來
+_route_labels: Dict[object, str] = {}
+
+
+def route_label(request: web.Request) -> str:
+    route = request.match_info.route
+    label = _route_labels.get(route)
+    if label is None:
+        resource = route.resource
+        # 404/405 每次都是新的 SystemRoute, 不放進快取
+        if resource is None:
+            return "unmatched"
+        label = _route_labels[route] = resource.canonical
+    return label
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    start = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # 以路由樣板 (例如 /api/videos/{video_id}) 作為 label, 避免每個 id 產生一條時間序列
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, request.method, route_label(request), str(status)
+        )
+
+
+# grpc.aio 的 context.code() 回傳數值, 轉成 StatusCode 名稱
+_STATUS_NAMES = {code.value[0]: code.name for code in grpc.StatusCode}
+
+
+def status_name(context, failed: bool) -> str:
+    code = context.code()
+    if code is None:
+        return "UNKNOWN" if failed else "OK"
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    return _STATUS_NAMES.get(code, str(code))
+
+
+class MetricsInterceptor(grpc.aio.ServerInterceptor):
+    """記錄每個 gRPC method 的處理時間與結果"""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+
+        if handler.unary_unary or handler.stream_unary:
+            behavior = handler.unary_unary or handler.stream_unary
+
+            async def unary_response(request, context):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    response = await behavior(request, context)
+                    failed = False
+                    return response
+                finally:
+                    GRPC_HANDLING_DURATION.observe(
+                        time.perf_counter() - start, method, status_name(context, failed)
+                    )
+
+            field = "unary_unary" if handler.unary_unary else "stream_unary"
+            return handler._replace(**{field: unary_response})
+
+        behavior = handler.unary_stream or handler.stream_stream
+
+        async def stream_response(request, context):
+            start = time.perf_counter()
+            failed = True
+            try:
+                async for response in behavior(request, context):
+                    yield response
+                failed = False
+            finally:
+                GRPC_HANDLING_DURATION.observe(
+                    time.perf_counter() - start, method, status_name(context, failed)
+                )
+
+        field = "unary_stream" if handler.unary_stream else "stream_stream"
+        return handler._replace(**{field: stream_response})
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command 事件; Motor 在 executor 執行緒上呼叫, 只做 dict 操作與一次 observe"""
+
+    def __init__(self):
+        self._started: Dict[Tuple[int, str], float] = {}
+
+    def started(self, event):
+        self._started[(event.request_id, event.command_name)] = time.perf_counter()
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+    def _finish(self, event, outcome: str):
+        start = self._started.pop((event.request_id, event.command_name), None)
+        if start is not None:
+            MONGO_COMMAND_DURATION.observe(
+                time.perf_counter() - start, event.command_name, outcome
+            )
+
+
+class LoopLagMonitor:
+    """定期排程一次 sleep, 實際醒來時間與預期的差即為 event loop 的延遲"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+
+    def record(self, lag: float):
+        self.last_lag = lag
+        EVENT_LOOP_LAG.observe(lag)
+
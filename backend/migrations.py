@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateMany
+
+from cache_invalidation import UPDATED_FIELD
+from database import connect_to_mongo, close_mongo_connection, get_database
+from logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_uploader_usernames(db, batch_size: int = 500) -> int:
+    """替尚未有 uploader_username 的影片補上上傳者名稱, 回傳更新的影片數"""
+    missing = {"uploader_username": {"$exists": False}}
+    uploader_ids = await db.videos.distinct("uploader_id", missing)
+
+    updated = 0
+    for start in range(0, len(uploader_ids), batch_size):
+        batch = uploader_ids[start:start + batch_size]
+
+        # 每批上傳者只查一次 users
+        object_ids = [ObjectId(uid) for uid in batch
+                      if isinstance(uid, str) and ObjectId.is_valid(uid)]
+        users = await db.users.find(
+            {"_id": {"$in": object_ids}}, {"username": 1}
+        ).to_list(length=None)
+        names = {str(user["_id"]): user["username"] for user in users}
+
+        # 找不到的上傳者寫入 None, 列表直接顯示 Unknown 而不再查詢
+        result = await db.videos.bulk_write(
+            [
+                UpdateMany(
+                    {"uploader_id": uid, **missing},
+                    {"$set": {"uploader_username": names.get(uid),
+                              UPDATED_FIELD: datetime.utcnow()}},
+                )
+                for uid in batch
+            ],
+            ordered=False,
+        )
+        updated += result.modified_count
+        logger.info("Backfilled %d videos (%d/%d uploaders)",
+                    updated, min(start + batch_size, len(uploader_ids)), len(uploader_ids))
+    return updated
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Video platform data migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser(
+        "backfill-uploader-usernames",
+        help="store uploader_username on existing video documents",
+    )
+    backfill.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_logging()
+    await connect_to_mongo()
+    try:
+        if args.command == "backfill-uploader-usernames":
+            await backfill_uploader_usernames(get_database(), args.batch_size)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
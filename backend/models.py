@@ -1,7 +1,8 @@
 # models.py
 from datetime import datetime
 from typing import Optional, Annotated
-from pydantic import BaseModel, EmailStr, ConfigDict, GetJsonSchemaHandler
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, GetJsonSchemaHandler
+from pydantic.networks import validate_email
 from bson import ObjectId
 from typing_extensions import Annotated
 from pydantic.json_schema import JsonSchemaValue
@@ -33,7 +34,7 @@ class UserModel(BaseModel):
     username: str
     email: EmailStr
     password: str
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
     def dict(self, *args, **kwargs):
         result = super().model_dump(*args, **kwargs)
@@ -50,11 +51,90 @@ class VideoModel(BaseModel):
     description: Optional[str] = None
     file_path: str
     uploader_id: str
-    created_at: datetime = datetime.utcnow()
+    uploader_username: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
     views: int = 0
+    size: Optional[int] = None
 
     def dict(self, *args, **kwargs):
         result = super().model_dump(*args, **kwargs)
         if result.get("id"):
             result["id"] = str(result["id"])
-        return result
\ No newline at end of file
+        return result
+
+
+# 寫入路徑用的輕量文件建構器: 只做必要驗證, 直接產生要寫入 MongoDB 的 dict,
+# 省去 Pydantic model 建立與 model_dump 的成本
+
+
+def _require_str(name: str, value, allow_empty: bool = False) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string")
+    if not allow_empty and not value.strip():
+        raise ValueError(f"{name} must not be empty")
+    return value
+
+
+class UserDocument:
+    __slots__ = ("username", "email", "password", "created_at")
+
+    def __init__(self, username: str, email: str, password: str,
+                 created_at: Optional[datetime] = None):
+        self.username = _require_str("username", username)
+        # 與 EmailStr 相同的驗證與正規化
+        self.email = validate_email(_require_str("email", email))[1]
+        self.password = _require_str("password", password)
+        self.created_at = created_at or datetime.utcnow()
+
+    def to_document(self) -> dict:
+        return {
+            "username": self.username,
+            "email": self.email,
+            "password": self.password,
+            "created_at": self.created_at,
+        }
+
+    def __repr__(self) -> str:
+        return f"UserDocument(username={self.username!r}, email={self.email!r})"
+
+
+class VideoDocument:
+    __slots__ = ("title", "description", "file_path", "uploader_id",
+                 "uploader_username", "created_at", "views", "size")
+
+    def __init__(self, title: str, file_path: str, uploader_id: str,
+                 description: Optional[str] = None,
+                 uploader_username: Optional[str] = None,
+                 created_at: Optional[datetime] = None, views: int = 0,
+                 size: Optional[int] = None):
+        self.title = _require_str("title", title, allow_empty=True)
+        self.file_path = _require_str("file_path", file_path)
+        self.uploader_id = _require_str("uploader_id", uploader_id)
+        if description is not None:
+            _require_str("description", description, allow_empty=True)
+        self.description = description
+        if uploader_username is not None:
+            _require_str("uploader_username", uploader_username)
+        self.uploader_username = uploader_username
+        self.created_at = created_at or datetime.utcnow()
+        if not isinstance(views, int) or isinstance(views, bool) or views < 0:
+            raise ValueError("views must be a non-negative integer")
+        self.views = views
+        if size is not None and (not isinstance(size, int) or size < 0):
+            raise ValueError("size must be a non-negative integer")
+        self.size = size
+
+    def to_document(self) -> dict:
+        return {
+            "title": self.title,
+            "description": self.description,
+            "file_path": self.file_path,
+            "uploader_id": self.uploader_id,
+            "uploader_username": self.uploader_username,
+            "created_at": self.created_at,
+            "views": self.views,
+            "size": self.size,
+        }
+
+    def __repr__(self) -> str:
+        return f"VideoDocument(title={self.title!r}, file_path={self.file_path!r})"
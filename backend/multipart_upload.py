@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import grpc
+
+from config import settings
+from media_probe import SNIFF_BYTES, sniff_container
+from tracing import TRACER
+
+
+class MultipartUploadError(Exception):
+    def __init__(self, message: str, code: grpc.StatusCode = grpc.StatusCode.INVALID_ARGUMENT):
+        super().__init__(message)
+        self.code = code
+
+
+class MultipartUpload:
+    """一次分段上傳: 各 part 以 os.pwrite 寫入預先配置好大小的暫存檔
+
+    writers 為正在寫入的 part 數; 中止時若仍有 part 在寫入, 只標記 aborted,
+    由最後一個離開的 writer 關閉 fd 並刪除暫存檔, executor 中的 pwrite 不會用到已關閉的 fd。
+    """
+
+    def __init__(self, upload_id: str, video_id: str, path: str,
+                 total_size: int, part_size: int):
+        self.upload_id = upload_id
+        self.video_id = video_id
+        self.path = path
+        self.total_size = total_size
+        self.part_size = part_size
+        self.part_count = max(1, -(-total_size // part_size))
+        # part_number -> (sha256, size)
+        self.parts: Dict[int, Tuple[str, int]] = {}
+        self.created_at = time.monotonic()
+        self.writers = 0
+        self.aborted = False
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._allocate()
+
+    def _allocate(self):
+        # 先配置完整大小, 各 part 寫入不同位置時不需擴充檔案
+        try:
+            os.posix_fallocate(self.fd, 0, self.total_size)
+        except (AttributeError, OSError):
+            os.ftruncate(self.fd, self.total_size)
+
+    def part_range(self, part_number: int) -> Tuple[int, int]:
+        if not 1 <= part_number <= self.part_count:
+            raise MultipartUploadError(f"Invalid part number: {part_number}")
+        offset = (part_number - 1) * self.part_size
+        return offset, min(self.part_size, self.total_size - offset)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class MultipartUploadManager:
+    """管理進行中的分段上傳; 同一個 upload 的各 part 可以在不同 stream 上並行寫入"""
+
+    def __init__(self, upload_dir: str):
+        self.upload_dir = upload_dir
+        self.uploads: Dict[str, MultipartUpload] = {}
+
+    def create(self, video_id: str, total_size: int, part_size: int) -> MultipartUpload:
+        self.expire()
+        if not video_id or os.path.basename(video_id) != video_id:
+            raise MultipartUploadError("Invalid video id")
+        if not 0 < total_size <= settings.upload_max_file_bytes:
+            raise MultipartUploadError("Invalid total size")
+        part_size = part_size or settings.multipart_min_part_bytes
+        if part_size < settings.multipart_min_part_bytes and part_size < total_size:
+            raise MultipartUploadError("Part size is too small")
+        if -(-total_size // part_size) > settings.multipart_max_parts:
+            raise MultipartUploadError("Too many parts")
+
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.upload_dir, f"{video_id}.{upload_id}.part")
+        upload = MultipartUpload(upload_id, video_id, path, total_size, part_size)
+        self.uploads[upload_id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> MultipartUpload:
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise MultipartUploadError("Upload not found", grpc.StatusCode.NOT_FOUND)
+        return upload
+
+    async def write_part(self, upload_id: str, part_number: int,
+                         chunks: AsyncIterator[bytes]) -> Tuple[str, int]:
+        upload = self.get(upload_id)
+        offset, length = upload.part_range(part_number)
+        loop = asyncio.get_running_loop()
+        digest = hashlib.sha256()
+        written = 0
+        checked = part_number != 1
+        upload.writers += 1
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if written + len(chunk) > length:
+                    raise MultipartUploadError(f"Part {part_number} exceeds {length} bytes")
+                # 等待下一個 chunk 時上傳可能已被中止或逾時清除
+                _check_not_aborted(upload)
+                with TRACER.span("storage.write", attributes={"file.path": upload.path,
+                                                              "file.bytes": len(chunk)}):
+                    await loop.run_in_executor(None, os.pwrite, upload.fd, chunk, offset + written)
+                digest.update(chunk)
+                written += len(chunk)
+                # 第一個 part 收到足夠的開頭後檢查容器格式
+                if not checked and written >= min(SNIFF_BYTES, length):
+                    head = os.pread(upload.fd, SNIFF_BYTES, 0)
+                    if sniff_container(head) is None:
+                        await self.abort(upload_id)
+                        raise MultipartUploadError("Unsupported video format")
+                    checked = True
+            _check_not_aborted(upload)
+            if written != length:
+                raise MultipartUploadError(
+                    f"Part {part_number} has {written} bytes, expected {length}"
+                )
+            checksum = digest.hexdigest()
+            upload.parts[part_number] = (checksum, written)
+            return checksum, written
+        finally:
+            upload.writers -= 1
+            if upload.aborted and upload.writers == 0:
+                _discard(upload)
+
+    async def complete(self, upload_id: str, parts: List[Tuple[int, str]]) -> str:
+        """確認所有 part 都已上傳且 checksum 相符後, 以 os.replace 產生最終檔案"""
+        upload = self.get(upload_id)
+        expected = {number: checksum for number, checksum in parts}
+        if sorted(expected) != list(range(1, upload.part_count + 1)):
+            raise MultipartUploadError("Parts list is incomplete", grpc.StatusCode.FAILED_PRECONDITION)
+        for number, checksum in expected.items():
+            received = upload.parts.get(number)
+            if received is None:
+                raise MultipartUploadError(
+                    f"Part {number} was not uploaded", grpc.StatusCode.FAILED_PRECONDITION
+                )
+            if received[0] != checksum.lower():
+                raise MultipartUploadError(f"Checksum mismatch for part {number}")
+        if upload.writers:
+            # 重新上傳中的 part 可能正在覆寫已確認過 checksum 的內容
+            raise MultipartUploadError(
+                "Parts are still being uploaded", grpc.StatusCode.FAILED_PRECONDITION
+            )
+
+        # 從此不再接受新的 part, 也不會被 abort 或 expire 清除
+        del self.uploads[upload_id]
+        loop = asyncio.get_running_loop()
+        final_path = os.path.join(self.upload_dir, f"{upload.video_id}.mp4")
+        try:
+            await loop.run_in_executor(None, os.fsync, upload.fd)
+            upload.close()
+            os.replace(upload.path, final_path)
+        except OSError as e:
+            _discard(upload)
+            raise MultipartUploadError(
+                f"Failed to store upload: {e.strerror}", grpc.StatusCode.INTERNAL
+            )
+        return final_path
+
+    async def abort(self, upload_id: str):
+        upload = self.uploads.pop(upload_id, None)
+        if upload is not None:
+            _abandon(upload)
+
+    def expire(self, max_age: Optional[float] = None):
+        # 逾時未完成的上傳直接清除暫存檔
+        max_age = max_age if max_age is not None else settings.multipart_upload_ttl_seconds
+        cutoff = time.monotonic() - max_age
+        for upload_id, upload in list(self.uploads.items()):
+            if upload.created_at < cutoff:
+                del self.uploads[upload_id]
+                _abandon(upload)
+
+
+def _check_not_aborted(upload: MultipartUpload):
+    if upload.aborted:
+        raise MultipartUploadError("Upload was aborted", grpc.StatusCode.ABORTED)
+
+
+def _abandon(upload: MultipartUpload):
+    # 仍有 part 在寫入時只標記, 由最後一個 writer 在 write_part 結束時清除
+    upload.aborted = True
+    if upload.writers == 0:
+        _discard(upload)
+
+
+def _discard(upload: MultipartUpload):
+    upload.close()
+    try:
+        os.remove(upload.path)
+    except OSError:
+        pass
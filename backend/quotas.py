@@ -0,0 +1,186 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+
+QUOTA_COLLECTION = "user_quotas"
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, status: int = 413):
+        super().__init__(message)
+        self.status = status
+
+
+def _slot_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.upload_slot_ttl_seconds)
+
+
+def _live_slots(now: datetime) -> dict:
+    # 過期的名額 (行程當機未釋放) 不計入並行上傳數
+    return {"$filter": {
+        "input": {"$ifNull": ["$slots", []]},
+        "cond": {"$gt": ["$$this.expires_at", now]},
+    }}
+
+
+class UploadReservation:
+    """單次上傳佔用的名額; 寫入時以 lease 為單位向 MongoDB 預留空間
+
+    名額記錄在配額文件的 slots 陣列中, 各自帶有 id 與到期時間; 每次預留空間時延長到期時間,
+    因此仍在寫入的上傳不會過期, 而釋放只移除自己的名額, 不會影響其他上傳。
+    """
+
+    def __init__(self, quotas: "UploadQuotas", db, user_id: str,
+                 slot_id: Optional[ObjectId] = None):
+        self.quotas = quotas
+        self.db = db
+        self.user_id = user_id
+        self.slot_id = slot_id
+        self.size = 0
+        self.leased = 0
+        self.closed = False
+
+    async def consume(self, nbytes: int):
+        self.size += nbytes
+        while self.size > self.leased:
+            await self._lease()
+
+    async def _lease(self):
+        # 以條件式 $inc 原子地預留空間, 多個並行上傳或多個副本也不會超額
+        lease = settings.upload_quota_lease_bytes
+        limit = self.quotas.max_bytes
+        doc = await self._increment(lease)
+        if doc is None:
+            # 最後一段不足一個 lease 時只預留實際需要的量
+            need = self.size - self.leased
+            doc = await self._increment(need)
+            if doc is None:
+                raise QuotaExceeded("Storage quota exceeded")
+            lease = need
+        self.leased += lease
+        self.quotas.remember(self.user_id, doc["bytes_used"])
+
+    async def reserve(self, nbytes: int):
+        """一次預留已知大小的檔案 (批次匯入); 空間不足時拋出 QuotaExceeded, 不預留任何空間"""
+        doc = await self._increment(nbytes)
+        if doc is None:
+            raise QuotaExceeded("Storage quota exceeded")
+        self.size += nbytes
+        self.leased += nbytes
+        self.quotas.remember(self.user_id, doc["bytes_used"])
+
+    async def _increment(self, nbytes: int) -> Optional[dict]:
+        # 以條件式 $inc 預留空間, 同時延長自己名額的到期時間
+        return await self.db[QUOTA_COLLECTION].find_one_and_update(
+            {"_id": self.user_id, "bytes_used": {"$lte": self.quotas.max_bytes - nbytes}},
+            {"$inc": {"bytes_used": nbytes},
+             "$set": {"slots.$[slot].expires_at": _slot_expiry()}},
+            array_filters=[{"slot.id": self.slot_id}],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def refund(self, nbytes: int):
+        # 預留後沒有寫入的檔案; 多預留的空間在 commit 時歸還
+        self.size -= nbytes
+
+    async def commit(self):
+        # 歸還多預留的空間並釋放並行名額
+        await self._close(self.size - self.leased)
+
+    async def release(self):
+        # 上傳失敗: 歸還所有預留空間
+        await self._close(-self.leased)
+
+    async def _close(self, bytes_delta: int):
+        if self.closed:
+            return
+        self.closed = True
+        # 名額已過期並被其他上傳清除時 $pull 不做事, 並行數不會被多扣
+        doc = await self.db[QUOTA_COLLECTION].find_one_and_update(
+            {"_id": self.user_id},
+            {"$inc": {"bytes_used": bytes_delta}, "$pull": {"slots": {"id": self.slot_id}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is not None:
+            self.quotas.remember(self.user_id, doc["bytes_used"])
+
+
+class UploadQuotas:
+    """每位使用者的儲存空間與並行上傳數限制, 計數器存在 MongoDB"""
+
+    def __init__(self, max_bytes: Optional[int] = None,
+                 max_concurrent: Optional[int] = None):
+        self.max_bytes = max_bytes or settings.upload_quota_bytes
+        self.max_concurrent = max_concurrent or settings.upload_max_concurrent
+        # user_id -> (bytes_used, 讀取時間), 用來在不查資料庫的情況下提早拒絕
+        self._usage: Dict[str, Tuple[int, float]] = {}
+
+    def remember(self, user_id: str, bytes_used: int):
+        self._usage[user_id] = (bytes_used, time.monotonic())
+
+    def precheck(self, user_id: str, content_length: Optional[int]):
+        if content_length is None:
+            return
+        cached = self._usage.get(user_id)
+        if cached is None or time.monotonic() - cached[1] > settings.upload_quota_cache_ttl_ms / 1000:
+            return
+        if cached[0] + content_length - settings.upload_form_overhead_bytes > self.max_bytes:
+            raise QuotaExceeded("Storage quota exceeded")
+
+    async def acquire(self, db, user_id: str) -> UploadReservation:
+        now = datetime.utcnow()
+        slot_id = ObjectId()
+        live = _live_slots(now)
+        # 行程當機遺留的名額在 upload_slot_ttl_seconds 內沒有延長就會過期, 取得名額時一併清除
+        try:
+            doc = await db[QUOTA_COLLECTION].find_one_and_update(
+                {"_id": user_id, "$expr": {"$lt": [{"$size": live}, self.max_concurrent]}},
+                [{"$set": {
+                    "slots": {"$concatArrays": [
+                        live, [{"id": slot_id, "expires_at": _slot_expiry()}],
+                    ]},
+                    "bytes_used": {"$ifNull": ["$bytes_used", 0]},
+                }}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # 文件存在但條件不符 (名額已滿), upsert 嘗試插入同一個 _id
+            raise QuotaExceeded("Too many concurrent uploads", status=429)
+        self.remember(user_id, doc["bytes_used"])
+        reservation = UploadReservation(self, db, user_id, slot_id)
+        if doc["bytes_used"] >= self.max_bytes:
+            await reservation.release()
+            raise QuotaExceeded("Storage quota exceeded")
+        return reservation
+
+
+def storage_usage(videos) -> Dict[str, int]:
+    """依上傳者加總影片大小, 沒有 size 欄位的舊文件略過"""
+    usage: Dict[str, int] = {}
+    for video in videos:
+        size = video.get("size")
+        uploader_id = video.get("uploader_id")
+        if isinstance(size, int) and isinstance(uploader_id, str):
+            usage[uploader_id] = usage.get(uploader_id, 0) + size
+    return usage
+
+
+async def adjust_storage(db, deltas: Dict[str, int]):
+    """批次調整各使用者的已用空間 (匯入為正, 刪除為負)"""
+    operations = [
+        UpdateOne({"_id": user_id}, {"$inc": {"bytes_used": delta}}, upsert=True)
+        for user_id, delta in deltas.items() if delta
+    ]
+    if operations:
+        await db[QUOTA_COLLECTION].bulk_write(operations, ordered=False)
+
+
+upload_quotas_key = web.AppKey("upload_quotas", UploadQuotas)
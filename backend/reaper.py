@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import List, Optional
+
+from bson import ObjectId
+
+from config import settings
+from database import get_database
+from quotas import adjust_storage, storage_usage
+
+UPLOAD_DIR = "uploads"
+
+logger = logging.getLogger(__name__)
+
+# 軟刪除標記: 帶有 deleted_at 的影片不會出現在列表中, 由 BlobReaper 清除
+TOMBSTONE_FIELD = "deleted_at"
+NOT_DELETED = {TOMBSTONE_FIELD: {"$exists": False}}
+
+# create_video 與批次匯入產生的檔名前綴; 孤兒回收只處理這類檔案。gRPC UploadVideo 與
+# multipart 上傳以 video_id 命名 ({video_id}.mp4 與 .part 暫存檔), 沒有對應的 videos 文件
+BLOB_PREFIX = "blob-"
+_MANAGED_NAME = re.compile(rf"^{BLOB_PREFIX}([0-9a-f]{{24}})(\.[A-Za-z0-9]+)?(\.part)?$")
+
+
+def new_blob_name(extension: str) -> str:
+    """REST 上傳與批次匯入的檔名 (前綴 + ObjectId + 副檔名)"""
+    return f"{BLOB_PREFIX}{ObjectId()}{extension}"
+
+
+def _remove_blob(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except Exception as e:
+        logger.error("Error deleting file %s: %s", path, e)
+        return False
+
+
+def schedule_blob_removal(file_path: str):
+    """在 executor 中刪除檔案, 不阻塞 event loop"""
+    path = os.path.join(UPLOAD_DIR, file_path)
+    asyncio.get_running_loop().run_in_executor(None, _remove_blob, path)
+
+
+class BlobReaper:
+    """定期刪除軟刪除影片的檔案與資料庫紀錄, 並回收 uploads/ 中的孤兒檔案"""
+
+    def __init__(self, upload_dir: Optional[str] = None):
+        self.upload_dir = upload_dir or UPLOAD_DIR
+        self.interval = settings.reaper_interval_ms / 1000
+        self.batch_size = settings.reaper_batch_size
+        self.orphan_grace = settings.reaper_orphan_grace_seconds
+        self._semaphore = asyncio.Semaphore(settings.reaper_concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception("Error in blob reaper")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> dict:
+        reaped = await self.reap_tombstones()
+        orphans = await self.collect_orphans() if settings.reaper_orphan_gc else 0
+        return {"reaped": reaped, "orphans": orphans}
+
+    async def _remove_all(self, paths: List[str]) -> List[bool]:
+        loop = asyncio.get_running_loop()
+
+        async def remove(path: str) -> bool:
+            async with self._semaphore:
+                return await loop.run_in_executor(None, _remove_blob, path)
+
+        return await asyncio.gather(*[remove(path) for path in paths])
+
+    async def reap_tombstones(self) -> int:
+        db = get_database()
+        if db is None:
+            return 0
+        reaped = 0
+        while True:
+            videos = await db.videos.find(
+                {TOMBSTONE_FIELD: {"$exists": True}},
+                {"file_path": 1, "uploader_id": 1, "size": 1},
+            ).to_list(length=self.batch_size)
+            if not videos:
+                return reaped
+
+            removed = await self._remove_all(
+                [os.path.join(self.upload_dir, video["file_path"]) for video in videos]
+            )
+            # 檔案確定刪除後才移除紀錄; 中途當機時下次會重試
+            gone = [video for video, ok in zip(videos, removed) if ok]
+            ids = [video["_id"] for video in gone]
+            if ids:
+                result = await db.videos.delete_many(
+                    {"_id": {"$in": ids}, TOMBSTONE_FIELD: {"$exists": True}}
+                )
+                reaped += result.deleted_count
+                await adjust_storage(
+                    db, {uid: -size for uid, size in storage_usage(gone).items()}
+                )
+            if len(ids) < len(videos) or len(videos) < self.batch_size:
+                return reaped
+
+    async def collect_orphans(self) -> int:
+        db = get_database()
+        if db is None or not os.path.isdir(self.upload_dir):
+            return 0
+        loop = asyncio.get_running_loop()
+        candidates = await loop.run_in_executor(None, self._scan_candidates)
+        if not candidates:
+            return 0
+
+        referenced = set(await db.videos.distinct("file_path"))
+        orphans = [name for name in candidates if name not in referenced]
+        removed = await self._remove_all(
+            [os.path.join(self.upload_dir, name) for name in orphans]
+        )
+        return sum(removed)
+
+    def _scan_candidates(self) -> List[str]:
+        # 只處理本服務產生的檔名, 且超過寬限期, 避免刪到上傳中的檔案
+        cutoff = time.time() - self.orphan_grace
+        candidates = []
+        with os.scandir(self.upload_dir) as entries:
+            for entry in entries:
+                match = _MANAGED_NAME.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
+                if ObjectId(match.group(1)).generation_time.timestamp() > cutoff:
+                    continue
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                candidates.append(entry.name)
+        return candidates
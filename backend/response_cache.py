@@ -0,0 +1,96 @@
+import hashlib
+import time
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from config import settings
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "version", "expires")
+
+    def __init__(self, body: bytes, etag: str, version: int, expires: float):
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self.expires = expires
+
+
+class ResponseCache:
+    """以查詢參數為 key 保存已序列化的回應, 目錄版本改變或 TTL 到期即失效"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.video_cache_ttl_ms / 1000
+        self.max_entries = max_entries or settings.video_cache_max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, CachedResponse] = {}
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == self.version and entry.expires > time.monotonic():
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, key: str, body: bytes, version: int) -> CachedResponse:
+        # version 為查詢開始時的版本; 查詢期間若有寫入, 結果不放進快取
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = CachedResponse(body, f'"{version}-{digest}"', version,
+                               time.monotonic() + self.ttl)
+        if version == self.version:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+    def bump(self):
+        self.version += 1
+        self._entries.clear()
+
+    def on_invalidation(self, event: dict):
+        if event.get("collection") in ("videos", "users"):
+            self.bump()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+            "version": self.version,
+        }
+
+
+video_cache_key = web.AppKey("video_cache", ResponseCache)
+
+
+def cache_key(request: web.Request) -> str:
+    # 參數順序不同視為同一個查詢
+    return "&".join(f"{k}={v}" for k, v in sorted(request.query.items()))
+
+
+def cached_json_response(request: web.Request, entry: CachedResponse,
+                         hit: bool) -> web.Response:
+    headers = {"ETag": entry.etag, "X-Cache": "HIT" if hit else "MISS"}
+    if _etag_matches(request.headers.get("If-None-Match"), entry.etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=entry.body, content_type="application/json",
+                        headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def bump_video_cache(request: web.Request):
+    cache = request.app.get(video_cache_key)
+    if cache is not None:
+        cache.bump()
@@ -1,70 +1,110 @@
+import logging
 import os
+from datetime import datetime
 from typing import Any, Dict
 
 import aiohttp_cors
 from aiohttp import web
 from bson import ObjectId
 
-from auth import create_access_token, get_password_hash, verify_password
+from auth import (
+    create_access_token,
+    decode_access_token,
+    get_password_hash,
+    verify_password,
+)
+from bulk_import import import_manifest, summarize
+from cache_invalidation import UPDATED_FIELD, catalogue_watcher_key
+from config import settings
 from database import get_database
-from models import UserModel, VideoModel
+from ingest import ingest_pipeline_key
+from media_probe import CONTAINER_EXTENSIONS, SNIFF_BYTES, sniff_container
+from metrics import REGISTRY
+from models import UserDocument, VideoDocument
+from quotas import QuotaExceeded, adjust_storage, storage_usage, upload_quotas_key
+from reaper import NOT_DELETED, TOMBSTONE_FIELD, new_blob_name, schedule_blob_removal
+from response_cache import (
+    bump_video_cache,
+    cache_key,
+    cached_json_response,
+    video_cache_key,
+)
+from serialization import dumps, json_response
+from tracing import TRACER
+from video_queries import increment_view, list_videos
+from websocket_server import get_websocket_server
+
+logger = logging.getLogger(__name__)
 
 routes = web.RouteTableDef()
 
+
+def _authenticated_user_id(request: web.Request) -> str:
+    """Bearer token 的 sub (使用者 _id); 缺少或無效的 token 一律回傳 401"""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        raise web.HTTPUnauthorized(text="Missing or invalid token")
+    try:
+        user_id = decode_access_token(auth_header.split(" ")[1]).get("sub")
+    except Exception:
+        raise web.HTTPUnauthorized(text="Invalid token")
+    # sub 必須是使用者的 ObjectId, 否則之後的 uploader_id 與查詢都對應不到使用者
+    if not isinstance(user_id, str) or not ObjectId.is_valid(user_id):
+        raise web.HTTPUnauthorized(text="Invalid token")
+    return user_id
+
+
 @routes.post("/api/register")
 async def register(request: web.Request) -> web.Response:
     try:
         # 檢查數據庫連接
         db = get_database()
         if db is None:  # 使用 is None 而不是直接檢查 db
-            print("Database connection failed")
+            logger.error("Database connection failed")
             raise web.HTTPInternalServerError(text="Database connection failed")
 
         # 解析請求數據
         try:
             data = await request.json()
-            print(f"Received registration data: {data}")
         except Exception as e:
-            print(f"Error parsing request data: {str(e)}")
+            logger.info("Invalid registration body: %s", e)
             raise web.HTTPBadRequest(text="Invalid request data")
 
         # 驗證數據
         required_fields = ["username", "email", "password"]
         if not all(field in data for field in required_fields):
             missing_fields = [field for field in required_fields if field not in data]
-            print(f"Missing fields: {missing_fields}")
+            logger.info("Registration missing fields: %s", missing_fields)
             raise web.HTTPBadRequest(text=f"Missing required fields: {missing_fields}")
 
         # 檢查郵箱
         existing_user = await db.users.find_one({"email": data["email"]})
         if existing_user:
-            print(f"Email already exists: {data['email']}")
             raise web.HTTPBadRequest(text="Email already registered")
 
         try:
-            # 創建用戶模型
-            user = UserModel(
+            # 創建用戶文件
+            user = UserDocument(
                 username=data["username"],
                 email=data["email"],
                 password=get_password_hash(data["password"]),
             )
-            print(f"Created user model: {user}")
         except Exception as e:
-            print(f"Error creating user model: {str(e)}")
+            logger.info("Invalid registration data: %s", e)
             raise web.HTTPBadRequest(text=f"Invalid user data: {str(e)}")
 
         try:
             # 保存到數據庫
-            result = await db.users.insert_one(user.dict(exclude={"id"}))
-            print(f"User saved with ID: {result.inserted_id}")
+            result = await db.users.insert_one(user.to_document())
+            logger.info("Registered user %s", result.inserted_id)
         except Exception as e:
-            print(f"Error saving to database: {str(e)}")
+            logger.error("Error saving user: %s", e)
             raise web.HTTPInternalServerError(text=f"Database error: {str(e)}")
 
         # 返回結果
-        return web.json_response(
+        return json_response(
             {
-                "id": str(result.inserted_id),
+                "id": result.inserted_id,
                 "username": user.username,
                 "email": user.email,
             }
@@ -73,7 +113,7 @@ async def register(request: web.Request) -> web.Response:
     except web.HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in register: {str(e)}")
+        logger.exception("Unexpected error in register")
         raise web.HTTPInternalServerError(text=str(e))
 
 
@@ -90,66 +130,53 @@ async def login(request: web.Request) -> web.Response:
         raise web.HTTPUnauthorized(text="Invalid credentials")
 
     access_token = create_access_token({"sub": str(user["_id"])})
-    return web.json_response({"access_token": access_token})
+    return json_response({"access_token": access_token})
 
 
 @routes.get("/api/videos")
 async def get_videos(request: web.Request) -> web.Response:
+    # 先查回應快取, 命中時不需查詢資料庫與重新序列化
+    cache = request.app.get(video_cache_key)
+    if cache is not None:
+        key = cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            return cached_json_response(request, entry, hit=True)
+        version = cache.version
+
     db = get_database()
-    videos = []
+    videos = await list_videos(db)
 
-    video_list = await db.videos.find().to_list(length=None)
+    with TRACER.span("videos.serialize", attributes={"videos.count": len(videos)}):
+        if cache is not None:
+            entry = cache.put(key, dumps(videos), version)
+            return cached_json_response(request, entry, hit=False)
+        return json_response(videos)
 
-    for video in video_list:
-        try:
-            uploader = None
-            uploader_id = video["uploader_id"]
 
-            # 處理有效的 ObjectId
-            if isinstance(uploader_id, str) and uploader_id != "default_user_id":
-                try:
-                    uploader = await db.users.find_one({"_id": ObjectId(uploader_id)})
-                except:
-                    pass
+@routes.get("/api/cache/stats")
+async def get_cache_stats(request: web.Request) -> web.Response:
+    stats: Dict[str, Any] = {}
+    cache = request.app.get(video_cache_key)
+    if cache is not None:
+        stats["videos"] = cache.stats()
+    watcher = request.app.get(catalogue_watcher_key)
+    if watcher is not None:
+        stats["watcher"] = watcher.stats()
+    return json_response(stats)
 
-            videos.append(
-                {
-                    "id": str(video["_id"]),
-                    "title": video["title"],
-                    "description": video.get("description", ""),
-                    "file_path": video["file_path"],
-                    "uploader": uploader["username"] if uploader else "Unknown",
-                    "views": video["views"],
-                }
-            )
-        except Exception as e:
-            print(f"Error processing video {video.get('_id')}: {str(e)}")
-            continue
 
-    return web.json_response(videos)
+@routes.get("/metrics")
+async def get_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=REGISTRY.render(), content_type="text/plain")
 
 
 @routes.post("/api/videos")
 async def create_video(request: web.Request) -> web.Response:
+    reservation = None
     try:
-        # 從 authorization header 獲取 token
-        auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
-            raise web.HTTPUnauthorized(text="Missing or invalid token")
-
-        token = auth_header.split(" ")[1]
-        try:
-            # 解析 token 獲取用戶 ID
-            from jose import jwt
-
-            from config import settings
-
-            payload = jwt.decode(
-                token, settings.jwt_secret, algorithms=[settings.jwt_algorithm]
-            )
-            user_id = payload.get("sub")
-        except Exception as e:
-            raise web.HTTPUnauthorized(text="Invalid token")
+        # 從 authorization header 的 token 獲取用戶 ID
+        user_id = _authenticated_user_id(request)
 
         reader = await request.multipart()
 
@@ -162,32 +189,100 @@ async def create_video(request: web.Request) -> web.Response:
         # 獲取視頻文件
         field = await reader.next()
         if field.name == "file":
-            # 生成唯一的文件名
-            filename = f"{str(ObjectId())}{os.path.splitext(field.filename)[1]}"
+            # 先讀取開頭判斷容器格式, 不是影片就不寫入磁碟也不再讀取剩下的 body
+            head = await _read_head(field)
+            container = sniff_container(head)
+            if container is None:
+                raise web.HTTPUnsupportedMediaType(text="Unsupported video format")
+
+            # 生成唯一的文件名, 副檔名依實際格式決定
+            filename = new_blob_name(CONTAINER_EXTENSIONS[container])
 
             # 確保 uploads 目錄存在
             os.makedirs("uploads", exist_ok=True)
 
-            # 寫入文件
+            db = get_database()
+
+            # 取得上傳名額; 空間以 lease 方式邊寫邊預留
+            quotas = request.app.get(upload_quotas_key)
+            if quotas is not None:
+                try:
+                    quotas.precheck(user_id, request.content_length)
+                    reservation = await quotas.acquire(db, user_id)
+                except QuotaExceeded as e:
+                    raise _quota_error(e, request.content_length or 0)
+
+            # 寫入文件, 超過上限時立即中止, 不再讀取剩下的 body
             file_path = os.path.join("uploads", filename)
-            with open(file_path, "wb") as f:
-                while True:
-                    chunk = await field.read_chunk()
-                    if not chunk:
-                        break
-                    f.write(chunk)
+            size = 0
+            try:
+                with open(file_path, "wb") as f, TRACER.span("storage.write") as span:
+                    span.set_attribute("file.path", file_path)
+                    chunk = head
+                    while chunk:
+                        size += len(chunk)
+                        if size > settings.upload_max_file_bytes:
+                            raise QuotaExceeded("File exceeds the maximum upload size")
+                        if reservation is not None:
+                            await reservation.consume(len(chunk))
+                        f.write(chunk)
+                        chunk = await field.read_chunk()
+                    span.set_attribute("file.bytes", size)
+            except QuotaExceeded as e:
+                os.remove(file_path)
+                # 已收到的 bytes 由 finally 中的 release 全數歸還
+                raise _quota_error(e, size)
+
+            # 上傳者名稱直接寫入影片文件, 列表時不必再 join users
+            uploader_username = None
+            try:
+                uploader = await db.users.find_one(
+                    {"_id": ObjectId(user_id)}, {"username": 1}
+                )
+                if uploader:
+                    uploader_username = uploader["username"]
+            except Exception:
+                pass
 
             # 創建視頻記錄
-            video = VideoModel(
-                title=title, file_path=filename, uploader_id=user_id  # 只儲存文件名
+            video = VideoDocument(
+                title=title,
+                file_path=filename,  # 只儲存文件名
+                uploader_id=user_id,
+                uploader_username=uploader_username,
+                size=size,
             )
 
             # 保存到數據庫
-            result = await get_database().videos.insert_one(video.dict(exclude={"id"}))
-
-            return web.json_response(
+            result = await db.videos.insert_one(video.to_document())
+            if reservation is not None:
+                # consume() 計入的就是寫入檔案的 bytes, 多預留的 lease 在這裡歸還
+                await reservation.commit()
+            bump_video_cache(request)
+
+            # 通知前端新增影片, 不必重新下載整個列表
+            ws_server = get_websocket_server()
+            if ws_server is not None:
+                ws_server.publish_video_created(
+                    {
+                        "id": result.inserted_id,
+                        "title": video.title,
+                        "description": video.description or "",
+                        "file_path": filename,
+                        "uploader_id": user_id,
+                        "uploader": uploader_username or "Unknown",
+                        "views": video.views,
+                    }
+                )
+
+            # 背景解析影片 metadata, 不延遲回應
+            pipeline = request.app.get(ingest_pipeline_key)
+            if pipeline is not None:
+                pipeline.submit(result.inserted_id, filename)
+
+            return json_response(
                 {
-                    "id": str(result.inserted_id),
+                    "id": result.inserted_id,
                     "title": video.title,
                     "file_path": filename,
                 }
@@ -198,8 +293,168 @@ async def create_video(request: web.Request) -> web.Response:
     except web.HTTPException:
         raise
     except Exception as e:
-        print(f"Error uploading video: {str(e)}")
+        logger.exception("Error uploading video")
         raise web.HTTPInternalServerError(text=str(e))
+    finally:
+        # 失敗時歸還預留的空間與名額 (commit 之後 release 不會有作用)
+        if reservation is not None:
+            await reservation.release()
+
+
+async def _read_head(field) -> bytes:
+    head = b""
+    while len(head) < SNIFF_BYTES:
+        chunk = await field.read_chunk()
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+def _quota_error(e: QuotaExceeded, actual_size: int = 0) -> web.HTTPException:
+    if e.status == 429:
+        return web.HTTPTooManyRequests(text=str(e))
+    return web.HTTPRequestEntityTooLarge(
+        max_size=settings.upload_max_file_bytes, actual_size=actual_size, text=str(e)
+    )
+
+
+@routes.post("/api/videos/import")
+async def import_videos(request: web.Request) -> web.Response:
+    user_id = _authenticated_user_id(request)
+
+    try:
+        data = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(text="Invalid request data")
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise web.HTTPBadRequest(text="Manifest must be a non-empty list of items")
+    if len(items) > settings.import_max_items:
+        raise web.HTTPRequestEntityTooLarge(
+            max_size=settings.import_max_items, actual_size=len(items)
+        )
+
+    db = get_database()
+    uploader = await db.users.find_one({"_id": ObjectId(user_id)}, {"username": 1})
+    uploader_username = uploader["username"] if uploader else None
+    try:
+        results = await import_manifest(
+            db, items, user_id,
+            uploader_username=uploader_username,
+            quotas=request.app.get(upload_quotas_key),
+        )
+    except QuotaExceeded as e:
+        raise _quota_error(e)
+    summary = summarize(results)
+    if summary["imported"]:
+        bump_video_cache(request)
+        pipeline = request.app.get(ingest_pipeline_key)
+        ws_server = get_websocket_server()
+        for result in results:
+            if result["status"] != "imported":
+                continue
+            # 與單檔上傳相同: 通知前端新增影片並在背景解析 metadata
+            if ws_server is not None:
+                ws_server.publish_video_created(
+                    {
+                        "id": result["id"],
+                        "title": result["title"],
+                        "description": items[result["index"]].get("description") or "",
+                        "file_path": result["file_path"],
+                        "uploader_id": user_id,
+                        "uploader": uploader_username or "Unknown",
+                        "views": 0,
+                    }
+                )
+            if pipeline is not None:
+                pipeline.submit(ObjectId(result["id"]), result["file_path"])
+
+    return json_response({**summary, "results": results})
+
+
+@routes.put("/api/users/me")
+async def update_username(request: web.Request) -> web.Response:
+    user_id = _authenticated_user_id(request)
+
+    try:
+        data = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(text="Invalid request data")
+    username = data.get("username") if isinstance(data, dict) else None
+    if not isinstance(username, str) or not username.strip():
+        raise web.HTTPBadRequest(text="Missing required fields: ['username']")
+
+    db = get_database()
+    now = datetime.utcnow()
+    result = await db.users.update_one(
+        {"_id": ObjectId(user_id)}, {"$set": {"username": username, UPDATED_FIELD: now}}
+    )
+    if result.matched_count == 0:
+        raise web.HTTPNotFound(text="User not found")
+
+    # 影片文件中的 uploader_username 以單一 update_many 同步
+    fan_out = await db.videos.update_many(
+        {"uploader_id": user_id},
+        {"$set": {"uploader_username": username, UPDATED_FIELD: now}},
+    )
+    bump_video_cache(request)
+
+    return json_response(
+        {"id": user_id, "username": username, "videos_updated": fan_out.modified_count}
+    )
+
+
+@routes.delete("/api/videos")
+async def delete_videos(request: web.Request) -> web.Response:
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        raise web.HTTPUnauthorized(text="Missing or invalid token")
+    try:
+        decode_access_token(auth_header.split(" ")[1])
+    except Exception:
+        raise web.HTTPUnauthorized(text="Invalid token")
+
+    try:
+        data = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(text="Invalid request data")
+    video_ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(video_ids, list) or not video_ids:
+        raise web.HTTPBadRequest(text="ids must be a non-empty list")
+    if len(video_ids) > settings.delete_max_ids:
+        raise web.HTTPBadRequest(text=f"At most {settings.delete_max_ids} ids per request")
+    invalid = [vid for vid in video_ids if not isinstance(vid, str) or not ObjectId.is_valid(vid)]
+    if invalid:
+        raise web.HTTPBadRequest(text=f"Invalid video ID format: {invalid}")
+
+    db = get_database()
+    object_ids = [ObjectId(vid) for vid in set(video_ids)]
+
+    # 只標記軟刪除; 檔案與紀錄由 BlobReaper 以 delete_many 分批清除
+    live = await db.videos.find(
+        {"_id": {"$in": object_ids}, **NOT_DELETED}, {"_id": 1}
+    ).to_list(length=None)
+    deleted_ids = [video["_id"] for video in live]
+    if deleted_ids:
+        now = datetime.utcnow()
+        await db.videos.update_many(
+            {"_id": {"$in": deleted_ids}, **NOT_DELETED},
+            {"$set": {TOMBSTONE_FIELD: now, UPDATED_FIELD: now}},
+        )
+        bump_video_cache(request)
+        ws_server = get_websocket_server()
+        if ws_server is not None:
+            for video_id in deleted_ids:
+                ws_server.publish_video_deleted(str(video_id))
+
+    return json_response(
+        {
+            "message": "Videos deleted successfully",
+            "deleted": len(deleted_ids),
+            "video_ids": deleted_ids,
+        }
+    )
 
 
 @routes.delete("/api/videos/{video_id}")
@@ -217,36 +472,42 @@ async def delete_video(request: web.Request) -> web.Response:
 
         db = get_database()
 
-        # 3. 查找視頻
-        video = await db.videos.find_one({"_id": ObjectId(video_id)})
+        # 3. 查找視頻; 已由 DELETE /api/videos 軟刪除的影片由 BlobReaper 清除, 視為不存在
+        video = await db.videos.find_one({"_id": ObjectId(video_id), **NOT_DELETED})
         if not video:
             raise web.HTTPNotFound(text="Video not found")
 
-        # 4. 刪除文件
-        try:
-            file_path = os.path.join("uploads", video["file_path"])
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            print(f"Error deleting file: {str(e)}")
-            # 即使文件刪除失敗，仍繼續刪除數據庫記錄
-
-        # 5. 從數據庫中刪除記錄
-        delete_result = await db.videos.delete_one({"_id": ObjectId(video_id)})
+        # 4. 先從數據庫中刪除記錄, 當機時最多留下孤兒檔案, 由 BlobReaper 回收;
+        # 查詢之後才被軟刪除的影片不會在這裡重複刪除與歸還空間
+        delete_result = await db.videos.delete_one({"_id": ObjectId(video_id), **NOT_DELETED})
 
         if delete_result.deleted_count == 0:
             raise web.HTTPNotFound(text="Video not found or already deleted")
 
-        return web.json_response(
+        await adjust_storage(
+            db, {uid: -size for uid, size in storage_usage([video]).items()}
+        )
+
+        # 5. 在背景刪除文件, 不阻塞 event loop
+        try:
+            schedule_blob_removal(video["file_path"])
+        except Exception as e:
+            logger.error("Error deleting file: %s", e)
+
+        bump_video_cache(request)
+        ws_server = get_websocket_server()
+        if ws_server is not None:
+            ws_server.publish_video_deleted(video_id)
+
+        return json_response(
             {"message": "Video deleted successfully", "video_id": video_id}
         )
 
-    except web.HTTPException as he:
-        print(f"HTTP Exception in delete_video: {str(he)}")
-        raise he
+    except web.HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in delete_video: {str(e)}")
-        return web.json_response(
+        logger.exception("Error in delete_video")
+        return json_response(
             {"error": "Failed to delete video", "details": str(e)}, status=500
         )
 
@@ -257,14 +518,15 @@ async def increment_views(request: web.Request) -> web.Response:
         video_id = request.match_info["video_id"]
         db = get_database()
 
-        result = await db.videos.update_one(
-            {"_id": ObjectId(video_id)}, {"$inc": {"views": 1}}
-        )
-
-        if result.modified_count == 0:
+        if not await increment_view(db, video_id):
             raise web.HTTPNotFound(text="Video not found")
 
-        return web.json_response({"message": "View count updated"})
+        bump_video_cache(request)
+        ws_server = get_websocket_server()
+        if ws_server is not None:
+            ws_server.publish_view(video_id)
+
+        return json_response({"message": "View count updated"})
     except web.HTTPNotFound as e:
         raise e
     except Exception as e:
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+from bson import ObjectId
+
+from config import settings
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用套件, 沒有安裝時使用標準函式庫
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # 讓 handler 可以直接放入 ObjectId / datetime, 不必自己呼叫 str()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+BACKENDS: Dict[str, Callable[[Any], bytes]] = {"json": _stdlib_dumps}
+if orjson is not None:
+    BACKENDS["orjson"] = _orjson_dumps
+
+
+def _select_backend(name: str) -> str:
+    if name == "auto":
+        return "orjson" if "orjson" in BACKENDS else "json"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    return name
+
+
+backend = _select_backend(settings.json_backend)
+_dumps = BACKENDS[backend]
+
+
+def set_backend(name: str):
+    global backend, _dumps
+    backend = _select_backend(name)
+    _dumps = BACKENDS[backend]
+
+
+def dumps(obj: Any) -> bytes:
+    return _dumps(obj)
+
+
+def dumps_str(obj: Any) -> str:
+    # websocket 需要 str 才會以文字 frame 送出
+    return _dumps(obj).decode()
+
+
+def json_response(data: Any, status: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> web.Response:
+    return web.Response(
+        body=_dumps(data), status=status, headers=headers,
+        content_type="application/json",
+    )
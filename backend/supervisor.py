@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from config import settings
+from database import close_mongo_connection, connect_to_mongo
+from logging_config import setup_logging
+from reaper import BlobReaper
+from websocket_server import WebSocketRelay, WebSocketServer
+
+logger = logging.getLogger(__name__)
+
+# worker 以 spawn 啟動, 不繼承 supervisor 的 event loop 與執行緒 (log listener、Motor executor)
+_context = multiprocessing.get_context("spawn")
+
+
+class WorkerAgent:
+    """worker process 中與 supervisor 溝通的一端: websocket 事件、ready 與心跳共用同一個 queue"""
+
+    def __init__(self, slot: int, queue):
+        self.slot = slot
+        self.queue = queue
+        self.relay = WebSocketRelay(queue)
+
+    async def serve(self, stopped: asyncio.Future):
+        """通知 supervisor 已開始接受連線, 之後定期送出心跳直到 stopped 完成"""
+        loop = asyncio.get_running_loop()
+        pid = os.getpid()
+        self.queue.put(("ready", pid))
+        interval = settings.worker_heartbeat_interval_ms / 1000
+        while not stopped.done():
+            expected = loop.time() + interval
+            await asyncio.wait([stopped], timeout=interval)
+            # 心跳由 event loop 送出, loop 被阻塞時 supervisor 就收不到
+            self.queue.put(("heartbeat", pid, max(0.0, loop.time() - expected)))
+
+
+def worker_entry(slot: int, queue):
+    # Ctrl-C 會送給整個 process group, 由 supervisor 以 SIGTERM 依序結束 worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    import main
+    asyncio.run(main.main(WorkerAgent(slot, queue)))
+
+
+class WorkerProcess:
+    def __init__(self, slot: int, process):
+        self.slot = slot
+        self.process = process
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.last_heartbeat: Optional[float] = None
+        self.lag = 0.0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+
+class Supervisor:
+    """multi-worker 模式: N 個 worker 以 SO_REUSEPORT 共用 REST 與 gRPC port
+
+    websocket 連線、聊天紀錄與 BlobReaper 只在 supervisor 中各有一份; worker 發布的
+    websocket 事件經 queue 轉送到這裡。worker 結束或心跳逾時會被重新啟動,
+    SIGHUP 逐一替換所有 worker (rolling restart)。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue = _context.Queue()
+        self.slots: Dict[int, WorkerProcess] = {}
+        self.ws_server: Optional[WebSocketServer] = None
+        self._by_pid: Dict[int, WorkerProcess] = {}
+        self._restarting = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, slot: int) -> WorkerProcess:
+        process = _context.Process(
+            target=worker_entry, args=(slot, self.queue), name=f"worker-{slot}"
+        )
+        process.start()
+        worker = WorkerProcess(slot, process)
+        self._by_pid[worker.pid] = worker
+        logger.info("Started worker %d (pid %d)", slot, worker.pid)
+        return worker
+
+    def handle_message(self, message: tuple):
+        kind = message[0]
+        if kind in ("ready", "heartbeat"):
+            worker = self._by_pid.get(message[1])
+            if worker is None:
+                return
+            worker.last_heartbeat = time.monotonic()
+            if kind == "ready":
+                worker.ready = True
+                logger.info("Worker %d (pid %d) is ready", worker.slot, worker.pid)
+            else:
+                worker.lag = message[2]
+        elif self.ws_server is not None:
+            self.ws_server.handle_relayed(message)
+
+    def check_workers(self, now: Optional[float] = None) -> List[int]:
+        """回傳需要重新啟動的 slot: process 已結束、啟動逾時或心跳逾時"""
+        now = now if now is not None else time.monotonic()
+        failed = []
+        for slot, worker in self.slots.items():
+            if not worker.process.is_alive():
+                reason = f"exited with code {worker.process.exitcode}"
+            elif not worker.ready:
+                if now - worker.started_at <= settings.worker_startup_timeout_seconds:
+                    continue
+                reason = "did not become ready"
+            elif now - worker.last_heartbeat > settings.worker_heartbeat_timeout_ms / 1000:
+                reason = "missed heartbeats"
+            else:
+                continue
+            logger.error("Worker %d (pid %d) %s, restarting", slot, worker.pid, reason)
+            failed.append(slot)
+        return failed
+
+    async def restart(self, slot: int):
+        await self._kill(self.slots[slot])
+        self.slots[slot] = self.spawn(slot)
+
+    async def _kill(self, worker: WorkerProcess):
+        if worker.process.is_alive():
+            worker.process.kill()
+        # join 在 executor 中等待, 不延誤其他 worker 的心跳與健康檢查
+        await asyncio.get_running_loop().run_in_executor(None, worker.process.join)
+        self._by_pid.pop(worker.pid, None)
+
+    async def _terminate(self, worker: WorkerProcess):
+        # SIGTERM: worker 停止接受新連線並執行原本的清理
+        worker.process.terminate()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, worker.process.join, settings.worker_shutdown_timeout_seconds
+        )
+        if worker.process.is_alive():
+            logger.warning("Worker %d (pid %d) did not exit, killing", worker.slot, worker.pid)
+        await self._kill(worker)
+
+    async def _wait_ready(self, worker: WorkerProcess) -> bool:
+        deadline = time.monotonic() + settings.worker_startup_timeout_seconds
+        while not worker.ready:
+            if not worker.process.is_alive() or time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    async def rolling_restart(self):
+        """逐一替換 worker: 新 worker 已在共用的 port 上接受連線後才結束舊的, 服務不中斷"""
+        if self._restarting:
+            return
+        self._restarting = True
+        logger.info("Rolling restart of %d workers", len(self.slots))
+        try:
+            for slot in sorted(self.slots):
+                replacement = self.spawn(slot)
+                if not await self._wait_ready(replacement):
+                    logger.error("Replacement for worker %d failed to start, "
+                                 "keeping the remaining workers", slot)
+                    await self._kill(replacement)
+                    return
+                old, self.slots[slot] = self.slots[slot], replacement
+                await self._terminate(old)
+            logger.info("Rolling restart finished")
+        finally:
+            self._restarting = False
+
+    def _read_queue(self, loop: asyncio.AbstractEventLoop):
+        # multiprocessing queue 只能阻塞讀取, 在獨立執行緒中讀取後交回 event loop
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            loop.call_soon_threadsafe(self.handle_message, message)
+
+    def _start_task(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self):
+        from main import start_websocket_server
+
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, lambda: stopped.done() or stopped.set_result(None))
+        loop.add_signal_handler(signal.SIGHUP, lambda: self._start_task(self.rolling_restart()))
+        reader = threading.Thread(target=self._read_queue, args=(loop,), name="worker-relay")
+        reader.start()
+
+        await connect_to_mongo()
+        logger.info("Starting WebSocket server...")
+        self.ws_server = await start_websocket_server()
+        reaper = BlobReaper()
+        await reaper.start()
+
+        for slot in range(self.workers):
+            self.slots[slot] = self.spawn(slot)
+
+        try:
+            while not stopped.done():
+                await asyncio.wait([stopped], timeout=settings.worker_heartbeat_interval_ms / 1000)
+                if not stopped.done() and not self._restarting:
+                    for slot in self.check_workers():
+                        await self.restart(slot)
+        finally:
+            logger.info("Stopping %d workers...", len(self.slots))
+            await asyncio.gather(*(self._terminate(worker) for worker in self.slots.values()))
+            self.queue.put(None)
+            await loop.run_in_executor(None, reader.join)
+            await reaper.stop()
+            # worker 結束前轉送的事件都已處理, 再以 1001 關閉 websocket
+            try:
+                await asyncio.wait_for(self.ws_server.shutdown(),
+                                       settings.shutdown_timeout_seconds)
+            except asyncio.TimeoutError:
+                logger.warning("Shutdown deadline reached while closing websocket connections")
+            await close_mongo_connection()
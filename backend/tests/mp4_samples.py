@@ -0,0 +1,61 @@
+"""測試用的最小 MP4 產生器 (只有 box 結構, 沒有實際影像)"""
+import struct
+
+
+def box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type: bytes, payload: bytes, version: int = 0) -> bytes:
+    return box(box_type, bytes([version, 0, 0, 0]) + payload)
+
+
+def _tkhd(width: int, height: int) -> bytes:
+    payload = struct.pack(">IIIII", 0, 0, 1, 0, 0) + bytes(52)
+    return full_box(b"tkhd", payload + struct.pack(">II", width << 16, height << 16))
+
+
+def _mdhd(timescale: int, duration: int) -> bytes:
+    return full_box(b"mdhd", struct.pack(">IIIIHH", 0, 0, timescale, duration, 0, 0))
+
+
+def _hdlr(handler: bytes) -> bytes:
+    return full_box(b"hdlr", struct.pack(">I4s", 0, handler) + bytes(12) + b"\0")
+
+
+def _stbl(codec: bytes, samples: int, chunk_offsets) -> bytes:
+    entry = box(codec, bytes(6) + struct.pack(">H", 1) + bytes(70))
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + entry)
+    stsz = full_box(b"stsz", struct.pack(">II", 0, samples) + struct.pack(">I", 1) * samples)
+    stco = full_box(
+        b"stco",
+        struct.pack(">I", len(chunk_offsets))
+        + b"".join(struct.pack(">I", offset) for offset in chunk_offsets),
+    )
+    return box(b"stbl", stsd + stsz + stco)
+
+
+def _trak(handler, codec, timescale, duration, samples, chunk_offsets, width=0, height=0):
+    minf = box(b"minf", _stbl(codec, samples, chunk_offsets))
+    mdia = box(b"mdia", _mdhd(timescale, duration) + _hdlr(handler) + minf)
+    return box(b"trak", _tkhd(width, height) + mdia)
+
+
+def build_mp4(seconds: int = 10, width: int = 1280, height: int = 720, fps: int = 25,
+              mdat_size: int = 4096, moov_first: bool = False, brand: bytes = b"isom") -> bytes:
+    """產生含 H.264 影像與 AAC 音訊 track 的 MP4, 預設 moov 在檔尾"""
+    ftyp = box(b"ftyp", brand + struct.pack(">I", 0) + b"isomiso2avc1mp41")
+    mdat = box(b"mdat", bytes(mdat_size))
+
+    def moov(mdat_offset: int) -> bytes:
+        mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, seconds * 1000) + bytes(80))
+        video = _trak(b"vide", b"avc1", fps * 100, seconds * fps * 100, seconds * fps,
+                      [mdat_offset + 8], width, height)
+        audio = _trak(b"soun", b"mp4a", 48000, seconds * 48000, 4,
+                      [mdat_offset + 8 + mdat_size // 2])
+        return box(b"moov", mvhd + video + audio)
+
+    if moov_first:
+        size = len(moov(0))
+        return ftyp + moov(len(ftyp) + size) + mdat
+    return ftyp + mdat + moov(len(ftyp))
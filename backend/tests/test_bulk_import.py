@@ -0,0 +1,173 @@
+import os
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+import bulk_import
+from mp4_samples import box
+
+
+def video_bytes(name: str) -> bytes:
+    brand = b"qt  " if name.endswith(".mov") else b"isom"
+    return box(b"ftyp", brand + bytes(4) + brand) + b"video-" + name.encode()
+
+
+@pytest.fixture
+def import_root(tmp_path):
+    root = tmp_path / "imports"
+    root.mkdir()
+    for name in ["a.mp4", "b.mp4", "c.mov"]:
+        (root / name).write_bytes(video_bytes(name))
+    return root
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    monkeypatch.setattr(bulk_import, "UPLOAD_DIR", str(uploads))
+    return uploads
+
+
+@pytest.fixture
+def mock_db():
+    db = MagicMock()
+    db.videos.create_index = AsyncMock()
+    db.videos.find.return_value.to_list = AsyncMock(return_value=[])
+    db.__getitem__.return_value.find_one_and_update = AsyncMock(
+        return_value={"bytes_used": 0}
+    )
+
+    async def insert_many(documents, ordered):
+        for document in documents:
+            document["_id"] = ObjectId()
+
+    db.videos.insert_many = AsyncMock(side_effect=insert_many)
+    db.__getitem__.return_value.bulk_write = AsyncMock()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_import_manifest_links_files_and_inserts_in_batches(
+    mock_db, import_root, upload_dir
+):
+    """BI-001: 檔案放入 uploads 並以 insert_many 分批寫入"""
+    items = [
+        {"title": "A", "path": "a.mp4"},
+        {"title": "B", "path": f"file://{import_root / 'b.mp4'}"},
+        {"title": "C", "path": "c.mov", "description": "third"},
+    ]
+    progress = []
+
+    results = await bulk_import.import_manifest(
+        mock_db, items, "u1", uploader_username="root",
+        import_root=str(import_root), concurrency=2, batch_size=2,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+
+    assert [r["status"] for r in results] == ["imported"] * 3
+    assert mock_db.videos.insert_many.await_count == 2
+    assert progress == [(2, 3), (3, 3)]
+    for result in results:
+        stored = upload_dir / result["file_path"]
+        assert b"video-" in stored.read_bytes()
+    assert results[2]["file_path"].endswith(".mov")
+    mock_db.videos.create_index.assert_awaited_once_with("source_path", sparse=True)
+    inserted = mock_db.videos.insert_many.await_args_list[1].args[0][0]
+    assert inserted["description"] == "third"
+    assert inserted["uploader_username"] == "root"
+    assert inserted["source_path"] == os.path.realpath(import_root / "c.mov")
+    # 匯入的大小與上傳相同以配額預留, 計入上傳者的已用空間
+    charged = [
+        call.args[1]["$inc"]["bytes_used"]
+        for call in mock_db.__getitem__.return_value.find_one_and_update.await_args_list[1:]
+    ]
+    assert sum(charged) == sum(len(video_bytes(n)) for n in ["a.mp4", "b.mp4", "c.mov"])
+
+
+@pytest.mark.asyncio
+async def test_import_manifest_reports_errors_and_resumes(
+    mock_db, import_root, upload_dir
+):
+    """BI-002: 每個項目各自回報錯誤, 已匯入的來源檔會被略過"""
+    existing_id = ObjectId()
+    mock_db.videos.find.return_value.to_list = AsyncMock(return_value=[
+        {"_id": existing_id, "source_path": os.path.realpath(import_root / "a.mp4")}
+    ])
+    items = [
+        {"title": "A", "path": "a.mp4"},
+        {"title": "escape", "path": "../secret.mp4"},
+        {"title": "missing", "path": "nope.mp4"},
+        {"title": "remote", "url": "http://example.com/x.mp4"},
+        {"title": "B", "path": "b.mp4"},
+        {"title": "B again", "path": "b.mp4"},
+    ]
+
+    results = await bulk_import.import_manifest(
+        mock_db, items, "u1", import_root=str(import_root)
+    )
+
+    assert [r["status"] for r in results] == [
+        "skipped", "error", "error", "error", "imported", "skipped"
+    ]
+    assert results[0]["id"] == str(existing_id)
+    assert "outside the import root" in results[1]["error"]
+    assert results[5]["duplicate_of"] == 4
+    assert bulk_import.summarize(results) == {"imported": 1, "skipped": 2, "error": 3}
+
+
+@pytest.mark.asyncio
+async def test_import_manifest_applies_upload_checks(mock_db, import_root, upload_dir):
+    """BI-003: 匯入與上傳相同檢查格式與配額, 已刪除的來源檔可以重新匯入"""
+    (import_root / "notes.mp4").write_bytes(b"%PDF-1.7\n")
+    (import_root / "photo.mp4").write_bytes(box(b"ftyp", b"heic" + bytes(4) + b"mif1heic"))
+    quota = mock_db.__getitem__.return_value.find_one_and_update
+    # 取得名額成功, a.mp4 預留成功, b.mp4 空間不足, 最後 commit
+    quota.side_effect = [{"bytes_used": 0}, {"bytes_used": 10}, None, {"bytes_used": 10}]
+    items = [
+        {"title": "A", "path": "a.mp4"},
+        {"title": "notes", "path": "notes.mp4"},
+        {"title": "photo", "path": "photo.mp4"},
+        {"title": "B", "path": "b.mp4"},
+    ]
+
+    results = await bulk_import.import_manifest(
+        mock_db, items, "u1", import_root=str(import_root)
+    )
+
+    assert [r["status"] for r in results] == ["imported", "error", "error", "error"]
+    assert results[1]["error"] == results[2]["error"] == "Unsupported video format"
+    assert results[3]["error"] == "Storage quota exceeded"
+    assert [p.name for p in upload_dir.iterdir()] == [results[0]["file_path"]]
+    [query, _] = mock_db.videos.find.call_args.args
+    assert query["deleted_at"] == {"$exists": False}
+    # a.mp4 的空間已預留, commit 時只釋放名額
+    assert quota.await_args_list[-1].args[1]["$inc"] == {"bytes_used": 0}
+    assert "$pull" in quota.await_args_list[-1].args[1]
+
+
+@pytest.mark.asyncio
+async def test_import_manifest_probes_files_off_the_event_loop(
+    mock_db, import_root, upload_dir, monkeypatch
+):
+    """BI-004: 來源路徑檢查與格式判斷在 executor 中執行, 不佔用 event loop 執行緒"""
+    threads = []
+    probe = bulk_import._probe
+
+    def recording_probe(item, root):
+        threads.append(threading.current_thread())
+        return probe(item, root)
+
+    monkeypatch.setattr(bulk_import, "_probe", recording_probe)
+    items = [{"path": "a.mp4"}, {"path": "missing.mp4"}, "not-an-object"]
+
+    results = await bulk_import.import_manifest(
+        mock_db, items, "u1", import_root=str(import_root)
+    )
+
+    assert [r["status"] for r in results] == ["imported", "error", "error"]
+    assert results[1]["error"] == "file not found"
+    assert results[2]["error"] == "item must be an object"
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
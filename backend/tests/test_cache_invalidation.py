@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+from cache_invalidation import CatalogueWatcher, InvalidationBus
+
+
+@pytest.fixture
+def bus():
+    return InvalidationBus()
+
+
+@pytest.fixture
+def events(bus):
+    received = []
+    bus.subscribe(received.append)
+    return received
+
+
+def test_handle_change_publishes_event_and_records_lag(bus, events):
+    """CI-001: change stream 事件轉成失效通知並記錄延遲"""
+    watcher = CatalogueWatcher(bus)
+    video_id = ObjectId()
+    wall_time = datetime.datetime.utcnow() - datetime.timedelta(seconds=2)
+
+    watcher.handle_change("videos", {
+        "operationType": "update",
+        "documentKey": {"_id": video_id},
+        "updateDescription": {"updatedFields": {"views": 5}},
+        "wallTime": wall_time,
+    })
+
+    assert events == [{
+        "collection": "videos",
+        "operation": "update",
+        "document_id": str(video_id),
+        "fields": {"views": 5},
+    }]
+    stats = watcher.stats()
+    assert stats["events"] == 1
+    assert 1.5 < stats["lag_last_seconds"] < 5
+
+
+def test_failing_subscriber_does_not_block_others(bus, events):
+    """CI-002: 單一訂閱者出錯不影響其他訂閱者"""
+    bus.subscribe(mock.Mock(side_effect=Exception("boom")))
+    bus.subscribe(events.append)
+
+    bus.publish({"collection": "users", "operation": "delete"})
+
+    assert len(events) == 2
+
+
+@pytest.mark.asyncio
+async def test_polling_fallback_detects_changes(bus, events):
+    """CI-003: 輪詢模式下指紋改變時發布失效通知"""
+    watcher = CatalogueWatcher(bus, collections=("videos",), poll_interval=0.01)
+    fingerprints = [
+        {"count": 1, "views": 0},
+        {"count": 1, "views": 0},
+        {"count": 1, "views": 3},
+    ]
+
+    async def fake_fingerprint(db, name):
+        return fingerprints.pop(0) if fingerprints else {"count": 1, "views": 3}
+
+    watcher._fingerprint = fake_fingerprint
+    task = asyncio.create_task(watcher._poll(mock.MagicMock()))
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    assert events == [{"collection": "videos", "operation": "poll",
+                       "document_id": None, "fields": None}]
+    assert watcher.stats()["events"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_covers_tombstones_and_renames():
+    """CI-004: 輪詢指紋包含軟刪除數量與最大 updated_at, 軟刪除與改名也會使快取失效"""
+    db = mock.MagicMock()
+    db.__getitem__.return_value.aggregate.return_value.to_list = mock.AsyncMock(
+        return_value=[{"count": 2}]
+    )
+    watcher = CatalogueWatcher(InvalidationBus())
+
+    assert await watcher._fingerprint(db, "videos") == {"count": 2}
+
+    [pipeline] = db.__getitem__.return_value.aggregate.call_args[0]
+    group = pipeline[0]["$group"]
+    assert group["updated_at"] == {"$max": "$updated_at"}
+    assert group["deleted"] == {
+        "$sum": {"$cond": [{"$ifNull": ["$deleted_at", False]}, 1, 0]}
+    }
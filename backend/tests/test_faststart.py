@@ -0,0 +1,28 @@
+from faststart import faststart
+from media_probe import probe_file
+from tests.mp4_samples import build_mp4
+
+
+def test_faststart_moves_moov_and_shifts_offsets(tmp_path):
+    """FS-001: moov 移到 mdat 之前, stco offset 一併調整"""
+    path = tmp_path / "video.mp4"
+    path.write_bytes(build_mp4(mdat_size=50000))
+
+    assert faststart(str(path), buffer_size=4096) is True
+
+    assert path.read_bytes() == build_mp4(mdat_size=50000, moov_first=True)
+    assert probe_file(str(path))["duration"] == 10.0
+    assert not (tmp_path / "video.mp4.part").exists()
+
+
+def test_faststart_skips_files_already_in_layout(tmp_path):
+    """FS-002: 已是 faststart 佈局或不是 MP4 時不改寫"""
+    ready = tmp_path / "ready.mp4"
+    ready.write_bytes(build_mp4(moov_first=True))
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"not a video")
+    before = ready.stat().st_mtime_ns
+
+    assert faststart(str(ready)) is False
+    assert faststart(str(other)) is False
+    assert ready.stat().st_mtime_ns == before
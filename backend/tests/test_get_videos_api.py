@@ -1,9 +1,11 @@
+import logging
 from unittest import mock
 
 import pytest
 from aiohttp import web
 from bson import ObjectId
 
+from response_cache import ResponseCache, video_cache_key
 from rest_api import get_videos
 
 
@@ -58,6 +60,19 @@ async def cli(aiohttp_client, url):
     return await aiohttp_client(app)
 
 
+@pytest.fixture
+def video_cache():
+    return ResponseCache(ttl=60)
+
+
+@pytest.fixture
+async def cached_cli(aiohttp_client, url, video_cache):
+    app = web.Application()
+    app[video_cache_key] = video_cache
+    app.router.add_get(url, get_videos)
+    return await aiohttp_client(app)
+
+
 async def test_get_videos_success(cli, url, mock_db, test_video, test_user):
     """GV-001: 成功獲取影片列表"""
     # Arrange
@@ -118,9 +133,8 @@ async def test_get_empty_videos_list_success(cli, url, mock_db):
     assert len(videos) == 0
 
 
-@mock.patch("builtins.print")
 async def test_get_videos_with_invalid_data_success(
-    mock_print, cli, url, mock_db, test_video, test_user
+    caplog, cli, url, mock_db, test_video, test_user
 ):
     """GV-003: 影片資料欄位異常處理測試"""
     # Arrange
@@ -136,7 +150,8 @@ async def test_get_videos_with_invalid_data_success(
     mock_db.return_value.users.find_one.return_value = test_user
 
     # Act
-    res = await cli.get(url)
+    with caplog.at_level(logging.ERROR, logger="video_queries"):
+        res = await cli.get(url)
 
     # Assert
     assert res.status == 200
@@ -153,11 +168,75 @@ async def test_get_videos_with_invalid_data_success(
     assert mock_db.return_value.users.find_one.call_count == 1
 
     # 驗證錯誤日誌
-    mock_print.assert_any_call(mock.ANY)  # 至少被呼叫一次
-    # 確認錯誤訊息包含預期的文字
-    error_calls = [
-        call
-        for call in mock_print.call_args_list
-        if "Error processing video" in str(call)
+    error_records = [
+        record
+        for record in caplog.records
+        if "Error processing video" in record.getMessage()
     ]
-    assert len(error_calls) == 2  # 應該有兩個錯誤影片的日誌
+    assert len(error_records) == 2  # 應該有兩個錯誤影片的日誌
+
+
+async def test_get_videos_served_from_cache(
+    cached_cli, url, mock_db, test_video, test_user, video_cache
+):
+    """GV-004: 第二次請求由快取回應, 不再查詢資料庫"""
+    mock_db.return_value.videos.find.return_value.to_list.return_value = [test_video]
+    mock_db.return_value.users.find_one.return_value = test_user
+
+    first = await cached_cli.get(url)
+    second = await cached_cli.get(url)
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert await first.read() == await second.read()
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert mock_db.return_value.videos.find.call_count == 1
+    assert video_cache.stats()["hit_ratio"] == 0.5
+
+
+async def test_get_videos_if_none_match_returns_304(
+    cached_cli, url, mock_db, test_video, test_user
+):
+    """GV-005: If-None-Match 與 ETag 相同時回傳 304"""
+    mock_db.return_value.videos.find.return_value.to_list.return_value = [test_video]
+    mock_db.return_value.users.find_one.return_value = test_user
+
+    first = await cached_cli.get(url)
+    res = await cached_cli.get(url, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert res.status == 304
+    assert await res.read() == b""
+
+
+async def test_get_videos_cache_invalidated_by_version_bump(
+    cached_cli, url, mock_db, test_video, test_user, video_cache
+):
+    """GV-006: 目錄版本改變後重新查詢並產生新的 ETag"""
+    mock_db.return_value.videos.find.return_value.to_list.return_value = [test_video]
+    mock_db.return_value.users.find_one.return_value = test_user
+
+    first = await cached_cli.get(url)
+    video_cache.bump()
+    res = await cached_cli.get(url, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert res.status == 200
+    assert res.headers["X-Cache"] == "MISS"
+    assert res.headers["ETag"] != first.headers["ETag"]
+    assert mock_db.return_value.videos.find.call_count == 2
+
+
+async def test_get_videos_uses_denormalized_uploader(cli, url, mock_db, test_video):
+    """GV-007: 影片文件已有 uploader_username 時不再查詢 users"""
+    video = test_video.copy()
+    video["uploader_username"] = "root"
+    orphan = test_video.copy()
+    orphan["_id"] = ObjectId()
+    orphan["uploader_username"] = None
+    mock_db.return_value.videos.find.return_value.to_list.return_value = [video, orphan]
+
+    res = await cli.get(url)
+
+    assert res.status == 200
+    videos = await res.json()
+    assert [v["uploader"] for v in videos] == ["root", "Unknown"]
+    assert mock_db.return_value.users.find_one.call_count == 0
@@ -0,0 +1,198 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import grpc
+import pytest
+from bson import ObjectId
+
+import video_service_pb2
+from grpc_server import ChunkSizer, VideoService
+from tests.mp4_samples import build_mp4
+
+
+class AbortError(Exception):
+    pass
+
+
+def _context():
+    context = MagicMock()
+    context.abort = AsyncMock(side_effect=AbortError)
+    context.send_initial_metadata = AsyncMock()
+    return context
+
+
+async def _chunks(video_id, payloads):
+    for payload in payloads:
+        yield video_service_pb2.VideoChunk(video_id=video_id, content=payload)
+
+
+@pytest.mark.asyncio
+async def test_upload_video_rejects_non_video(monkeypatch, tmp_path):
+    """GR-001: UploadVideo 依檔頭判斷格式, 不是影片時回傳 INVALID_ARGUMENT 且不寫檔"""
+    monkeypatch.chdir(tmp_path)
+    service = VideoService()
+    context = _context()
+
+    with pytest.raises(AbortError):
+        await service.UploadVideo(_chunks("v1", [b"%PDF-1.7\n" + bytes(1024)]), context)
+
+    assert context.abort.await_args.args[0] == grpc.StatusCode.INVALID_ARGUMENT
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_video_accepts_mp4(monkeypatch, tmp_path):
+    """GR-002: MP4 上傳成功寫入 uploads/"""
+    monkeypatch.chdir(tmp_path)
+    data = build_mp4()
+    response = await VideoService().UploadVideo(
+        _chunks("v1", [data[:100], data[100:]]), _context()
+    )
+
+    assert response.success is True
+    assert (tmp_path / "uploads" / "v1.mp4").read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_get_video_not_found_aborts(monkeypatch, tmp_path):
+    """GR-003: GetVideo (StreamVideo) 影片不存在時 await context.abort, 不會繼續串流"""
+    monkeypatch.chdir(tmp_path)
+    context = _context()
+    chunks = []
+
+    with pytest.raises(AbortError):
+        async for chunk in VideoService().StreamVideo(
+            video_service_pb2.VideoRequest(video_id="missing"), context
+        ):
+            chunks.append(chunk)
+
+    assert chunks == []
+    assert context.abort.await_args.args[0] == grpc.StatusCode.NOT_FOUND
+    context.send_initial_metadata.assert_not_awaited()
+
+
+def test_server_options_follow_settings(monkeypatch):
+    """GR-004: gRPC server options 由 Settings 產生"""
+    from config import settings
+    from grpc_server import create_server, server_options
+
+    monkeypatch.setattr(settings, "grpc_max_concurrent_streams", 32)
+    monkeypatch.setattr(settings, "grpc_lookahead_bytes", 65536)
+    options = dict(server_options())
+
+    assert options["grpc.max_concurrent_streams"] == 32
+    assert options["grpc.http2.lookahead_bytes"] == 65536
+    assert options["grpc.max_receive_message_length"] == settings.grpc_max_message_bytes
+
+    monkeypatch.setattr(settings, "grpc_compression", "brotli")
+    with pytest.raises(ValueError):
+        create_server()
+
+
+def _video(views=0):
+    return {"_id": ObjectId(), "title": "t", "file_path": "a.mp4",
+            "uploader_id": "u1", "uploader_username": "root", "views": views}
+
+
+async def _batches(*batches):
+    for ids in batches:
+        yield video_service_pb2.ViewBatch(video_ids=ids)
+
+
+@pytest.mark.asyncio
+async def test_list_videos_streams_keyset_pages(mocker, monkeypatch, tmp_path):
+    """GR-005: ListVideos 以 _id keyset 分頁串流, 與 REST 共用查詢"""
+    monkeypatch.chdir(tmp_path)
+    videos = [_video() for _ in range(3)]
+    db = MagicMock()
+    db.videos.find.return_value.sort.return_value.to_list = AsyncMock(
+        side_effect=[videos[:2], videos[2:]]
+    )
+    mocker.patch("grpc_server.get_database", return_value=db)
+
+    pages = [page async for page in VideoService().ListVideos(
+        video_service_pb2.ListVideosRequest(page_size=2), _context()
+    )]
+
+    assert [len(page.videos) for page in pages] == [2, 1]
+    assert pages[0].videos[0].uploader == "root"
+    assert pages[0].next_page_token == str(videos[1]["_id"])
+    assert pages[1].next_page_token == ""
+    second_query = db.videos.find.call_args_list[1].args[0]
+    assert second_query["_id"] == {"$gt": videos[1]["_id"]}
+
+
+@pytest.mark.asyncio
+async def test_increment_views_merges_batches(mocker, monkeypatch, tmp_path):
+    """GR-006: IncrementViews 每個批次合併成一次 bulk_write, 只對存在的影片發布 views_updated"""
+    monkeypatch.chdir(tmp_path)
+    first, second = str(ObjectId()), str(ObjectId())
+    db = MagicMock()
+    # second 不存在 (或已軟刪除)
+    db.videos.find.return_value.to_list = AsyncMock(return_value=[{"_id": ObjectId(first)}])
+    db.videos.bulk_write = AsyncMock(return_value=MagicMock(matched_count=1))
+    mocker.patch("grpc_server.get_database", return_value=db)
+    ws_server = MagicMock()
+    mocker.patch("grpc_server.get_websocket_server", return_value=ws_server)
+
+    response = await VideoService().IncrementViews(
+        _batches([first, first, second, "bad"], [first], [second]), _context()
+    )
+
+    assert response.accepted == 3
+    assert response.updated == 2
+    assert db.videos.bulk_write.await_count == 2
+    operations = db.videos.bulk_write.await_args_list[0].args[0]
+    assert [op._doc["$inc"]["views"] for op in operations] == [2]
+    assert [c.args for c in ws_server.publish_view.call_args_list] == [(first, 2), (first, 1)]
+
+
+@pytest.mark.asyncio
+async def test_stream_video_sends_pre_encoded_chunks(monkeypatch, tmp_path):
+    """GR-007: StreamVideo 送出可解碼的 VideoChunk, video_id 只在 metadata 與第一個 chunk"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("config.settings.grpc_chunk_min_bytes", 1000)
+    service = VideoService()
+    data = bytes(range(256)) * 20
+    (tmp_path / "uploads" / "v1.mp4").write_bytes(data)
+    context = _context()
+
+    frames = [frame async for frame in service.StreamVideo(
+        video_service_pb2.VideoRequest(video_id="v1"), context
+    )]
+    chunks = [video_service_pb2.VideoChunk.FromString(frame) for frame in frames]
+
+    assert b"".join(chunk.content for chunk in chunks) == data
+    assert [chunk.video_id for chunk in chunks] == ["v1"] + [""] * (len(chunks) - 1)
+    context.send_initial_metadata.assert_awaited_once_with((("x-video-id", "v1"),))
+
+
+def test_chunk_sizer_follows_send_latency():
+    """GR-008: 送出快時 chunk 加倍, 超過 target 時減半, 並維持在上下限內"""
+    sizer = ChunkSizer(minimum=1024, maximum=8192, target=0.02)
+
+    for _ in range(5):
+        sizer.observe(0.001)
+    assert sizer.size == 8192
+    sizer.observe(0.05)
+    assert sizer.size == 4096
+    for _ in range(5):
+        sizer.observe(0.05)
+    assert sizer.size == 1024
+
+
+@pytest.mark.asyncio
+async def test_generated_get_video_delegates_to_stream_video(monkeypatch, tmp_path):
+    """GR-009: 以產生的 servicer 註冊時 GetVideo 回傳 StreamVideo 解碼後的 VideoChunk"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("config.settings.grpc_chunk_min_bytes", 1000)
+    service = VideoService()
+    data = bytes(range(256)) * 20
+    (tmp_path / "uploads" / "v1.mp4").write_bytes(data)
+
+    chunks = [chunk async for chunk in service.GetVideo(
+        video_service_pb2.VideoRequest(video_id="v1"), _context()
+    )]
+
+    assert all(isinstance(chunk, video_service_pb2.VideoChunk) for chunk in chunks)
+    assert b"".join(chunk.content for chunk in chunks) == data
+    assert chunks[0].video_id == "v1"
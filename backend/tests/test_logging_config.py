@@ -0,0 +1,123 @@
+import json
+import logging
+
+import pytest
+from aiohttp import web
+
+from config import settings
+from logging_config import (
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    request_id_middleware,
+    setup_logging,
+    stop_logging,
+)
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO, name="video_queries", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    """LG-001: JSON 輸出包含訊息、level 與 extra 欄位"""
+    entry = json.loads(JsonFormatter().format(_record(video_id="abc")))
+
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "video_queries"
+    assert entry["video_id"] == "abc"
+
+
+def test_sampling_filter_keeps_one_in_n():
+    """LG-002: sample_rate 只保留部分事件, WARNING 以上全數保留"""
+    sampling = SamplingFilter()
+
+    kept = sum(sampling.filter(_record(sample_rate=0.1)) for _ in range(100))
+    warnings = sum(
+        sampling.filter(_record(level=logging.WARNING, sample_rate=0.1)) for _ in range(10)
+    )
+
+    assert kept == 10
+    assert warnings == 10
+    assert sampling.filter(_record())
+
+
+def test_sampling_filter_uses_per_logger_rates():
+    """LG-004: 依 logger 名稱設定的比例取樣 access log, 5xx 一律保留; 同一個 trace 的 span 一起保留"""
+    sampling = SamplingFilter({"aiohttp.access": 0.1, "tracing": 0.1})
+
+    access = [
+        _record(f"GET /api/videos/{i} 200", (), name="aiohttp.access", response_status=200)
+        for i in range(100)
+    ]
+    errors = [
+        _record("GET /api/videos 500", (), name="aiohttp.access", response_status=500)
+        for _ in range(10)
+    ]
+    spans = [
+        _record("span %s", (str(i),), name="tracing", sample_key=f"{trace:032x}")
+        for trace in range(50) for i in range(3)
+    ]
+
+    assert sum(map(sampling.filter, access)) == 10
+    assert sum(map(sampling.filter, errors)) == 10
+    kept = {record.sample_key for record in spans if sampling.filter(record)}
+    assert 0 < len(kept) < 50
+    assert all(sampling.filter(record) for record in spans if record.sample_key in kept)
+    assert sampling.filter(_record())
+
+
+def test_setup_logging_keeps_exception_separate(capsys, monkeypatch):
+    """LG-005: 經過 queue 的例外 log 在 JSON 的 exc 欄位輸出 traceback, 不併入 msg"""
+    monkeypatch.setattr(settings, "log_format", "json")
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stop_logging()
+    setup_logging("INFO")
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("ingest").exception("failed to process %s", "abc")
+    finally:
+        stop_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+
+    entry = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+
+    assert entry["msg"] == "failed to process abc"
+    assert entry["level"] == "ERROR"
+    assert entry["exc"].startswith("Traceback")
+    assert "ValueError: boom" in entry["exc"]
+
+
+@pytest.mark.asyncio
+async def test_request_id_propagates_to_logs(aiohttp_client):
+    """LG-003: request id 來自 X-Request-ID 或自動產生, 並附加到處理中的 log"""
+    records = []
+
+    async def handler(request):
+        record = _record()
+        ContextFilter().filter(record)
+        records.append(record)
+        return web.Response(text="ok")
+
+    app = web.Application(middlewares=[request_id_middleware])
+    app.router.add_get("/ping", handler)
+    client = await aiohttp_client(app)
+
+    res = await client.get("/ping", headers={"X-Request-ID": "req-1"})
+    generated = await client.get("/ping")
+
+    assert res.headers["X-Request-ID"] == "req-1"
+    assert records[0].request_id == "req-1"
+    assert generated.headers["X-Request-ID"] == records[1].request_id
+    assert len(records[1].request_id) == 32
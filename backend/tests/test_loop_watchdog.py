@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from loop_watchdog import LoopWatchdog
+from metrics import EVENT_LOOP_BLOCKED
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_reports_blocking_stack(caplog):
+    """LW-001: event loop 被同步呼叫阻塞時, 回報 stack 與呼叫位置"""
+    site = "test_loop_watchdog.py:blocking_handler"
+    before = EVENT_LOOP_BLOCKED.value(site)
+    watchdog = LoopWatchdog(threshold=0.05)
+    await watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="loop_watchdog"):
+            blocking_handler()
+            await asyncio.sleep(0.05)
+    finally:
+        await watchdog.stop()
+
+    assert len(watchdog.reports) == 1
+    report = watchdog.reports[0]
+    assert report["site"] == site
+    assert "blocking_handler" in report["stack"]
+    assert EVENT_LOOP_BLOCKED.value(site) == before + 1
+    assert any("Event loop blocked" in record.getMessage() for record in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_quiet_when_loop_is_responsive():
+    """LW-002: loop 正常運作時不產生回報"""
+    watchdog = LoopWatchdog(threshold=0.05)
+    await watchdog.start()
+    try:
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+    finally:
+        await watchdog.stop()
+
+    assert not watchdog.reports
@@ -0,0 +1,117 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from ingest import IngestPipeline
+from media_probe import probe_file, sniff_container
+from tests.mp4_samples import box, build_mp4
+
+
+def test_probe_reads_moov_at_end(tmp_path):
+    """MP-001: moov 在檔尾時只讀取標頭與 moov 即可取得 metadata"""
+    path = tmp_path / "video.mp4"
+    data = build_mp4(seconds=10, width=1280, height=720, fps=25, mdat_size=100000)
+    path.write_bytes(data)
+
+    metadata = probe_file(str(path))
+
+    assert metadata == {
+        "container": "mp4",
+        "duration": 10.0,
+        "video_codec": "avc1",
+        "width": 1280,
+        "height": 720,
+        "frame_rate": 25.0,
+        "audio_codec": "mp4a",
+        "bitrate": len(data) * 8 // 10,
+    }
+
+
+def test_probe_handles_moov_first_and_non_mp4(tmp_path):
+    """MP-002: 支援 faststart 檔案與 MOV, 非 MP4 檔案回傳 None"""
+    mov = tmp_path / "video.mov"
+    mov.write_bytes(build_mp4(moov_first=True, brand=b"qt  "))
+    other = tmp_path / "video.webm"
+    other.write_bytes(b"\x1a\x45\xdf\xa3" + bytes(100))
+
+    metadata = probe_file(str(mov))
+
+    assert metadata["container"] == "mov"
+    assert metadata["duration"] == 10.0
+    assert probe_file(str(other)) is None
+
+
+@pytest.mark.asyncio
+async def test_ingest_pipeline_stores_metadata(mocker, tmp_path):
+    """MP-003: ingest pipeline 將 metadata 寫回影片文件並讓快取失效"""
+    (tmp_path / "a.mp4").write_bytes(build_mp4(seconds=4))
+    db = MagicMock()
+    db.videos.update_one = AsyncMock()
+    mocker.patch("ingest.get_database", return_value=db)
+    bus = MagicMock()
+    video_id = ObjectId()
+
+    pipeline = IngestPipeline(upload_dir=str(tmp_path), bus=bus)
+    pipeline.submit(video_id, "a.mp4")
+    await pipeline.drain()
+
+    query, update = db.videos.update_one.await_args.args
+    assert query == {"_id": video_id}
+    assert update["$set"]["metadata"]["duration"] == 4.0
+    bus.publish.assert_called_once()
+
+
+def test_sniff_container_by_magic_bytes():
+    """MP-004: 依 magic bytes 判斷容器格式, 與副檔名無關"""
+    assert sniff_container(build_mp4()[:512]) == "mp4"
+    assert sniff_container(build_mp4(brand=b"qt  ")[:512]) == "mov"
+    assert sniff_container(b"\x1a\x45\xdf\xa3\x9f\x42\x82\x84webm") == "webm"
+    assert sniff_container(b"RIFF\x00\x00\x00\x00AVI LIST") == "avi"
+    assert sniff_container((b"\x47" + bytes(187)) * 2) == "ts"
+    assert sniff_container(b"%PDF-1.7\n") is None
+    assert sniff_container(b"") is None
+
+
+def test_sniff_container_checks_bmff_brands():
+    """MP-005: ISO BMFF 只有 ftyp brand 屬於影片時才視為 mp4/mov"""
+    def ftyp(major, *compatible):
+        return box(b"ftyp", major + bytes(4) + b"".join(compatible)) + box(b"mdat")
+
+    assert sniff_container(ftyp(b"3gp5", b"3gp5")) == "mp4"
+    assert sniff_container(ftyp(b"M4V ", b"M4V ", b"mp42")) == "mp4"
+    assert sniff_container(ftyp(b"MSNV", b"MSNV", b"isom")) == "mp4"
+    # HEIC / AVIF 圖片與 M4A 音訊
+    assert sniff_container(ftyp(b"heic", b"mif1", b"heic")) is None
+    assert sniff_container(ftyp(b"avif", b"avif", b"mif1", b"miaf")) is None
+    assert sniff_container(ftyp(b"M4A ", b"M4A ", b"mp42", b"isom")) is None
+    assert sniff_container(ftyp(b"abcd", b"mif1")) is None
+    # 沒有 ftyp 的 box 開頭
+    assert sniff_container(box(b"free", bytes(8)) + box(b"mdat")) is None
+    assert sniff_container(box(b"wide") + box(b"mdat", bytes(8))) is None
+
+
+@pytest.mark.asyncio
+async def test_probe_rejects_non_video_bmff(mocker, tmp_path):
+    """MP-006: 沒有影片 ftyp 的檔案不解析 moov, ingest 將影片標記為處理失敗"""
+    data = build_mp4(seconds=4)
+    # 換成 HEIC brand 與沒有 ftyp 開頭的檔案, moov 仍可被解析
+    (tmp_path / "photo.mp4").write_bytes(data.replace(b"isom", b"heic", 1))
+    (tmp_path / "free.mp4").write_bytes(box(b"free", bytes(8)) + data[data.index(b"moov") - 4:])
+    db = MagicMock()
+    db.videos.update_one = AsyncMock()
+    mocker.patch("ingest.get_database", return_value=db)
+    video_id = ObjectId()
+
+    for name in ("photo.mp4", "free.mp4"):
+        with pytest.raises(ValueError, match="Unsupported video format"):
+            probe_file(str(tmp_path / name))
+
+    pipeline = IngestPipeline(upload_dir=str(tmp_path), bus=MagicMock())
+    updates = await pipeline.process(video_id, "photo.mp4")
+
+    assert "metadata" not in updates
+    assert updates["ingest_errors"]["probe_stage"] == "Unsupported video format"
+    query, update = db.videos.update_one.await_args.args
+    assert query == {"_id": video_id}
+    assert "ingest_errors" in update["$set"]
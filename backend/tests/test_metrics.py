@@ -0,0 +1,78 @@
+import grpc
+import pytest
+from aiohttp import web
+
+import video_service_pb2
+import video_service_pb2_grpc
+from grpc_server import VideoService, add_video_service
+from metrics import (
+    GRPC_HANDLING_DURATION,
+    HTTP_REQUEST_DURATION,
+    MetricsInterceptor,
+    Registry,
+    metrics_middleware,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    """MT-001: histogram 以 Prometheus 文字格式輸出累計 bucket、sum 與 count"""
+    registry = Registry()
+    histogram = registry.histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+    counter = registry.counter("demo_total", "Demo counter", ("kind",))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    counter.inc(3, 'say "hi"')
+
+    text = registry.render()
+
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+    assert 'demo_total{kind="say \\"hi\\""} 3' in text
+    assert "# TYPE demo_seconds histogram" in text
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_template(aiohttp_client):
+    """MT-002: REST 延遲以路由樣板與狀態碼為 label"""
+    async def handler(request):
+        if request.match_info["video_id"] == "missing":
+            raise web.HTTPNotFound()
+        return web.Response(text="ok")
+
+    app = web.Application(middlewares=[metrics_middleware])
+    app.router.add_get("/demo/{video_id}", handler)
+    client = await aiohttp_client(app)
+    before_ok = HTTP_REQUEST_DURATION.count("GET", "/demo/{video_id}", "200")
+    before_404 = HTTP_REQUEST_DURATION.count("GET", "/demo/{video_id}", "404")
+
+    await client.get("/demo/a")
+    await client.get("/demo/b")
+    await client.get("/demo/missing")
+
+    assert HTTP_REQUEST_DURATION.count("GET", "/demo/{video_id}", "200") == before_ok + 2
+    assert HTTP_REQUEST_DURATION.count("GET", "/demo/{video_id}", "404") == before_404 + 1
+
+
+@pytest.mark.asyncio
+async def test_grpc_interceptor_records_status(monkeypatch, tmp_path):
+    """MT-003: gRPC interceptor 記錄 method 與狀態碼"""
+    monkeypatch.chdir(tmp_path)
+    server = grpc.aio.server(interceptors=[MetricsInterceptor()])
+    add_video_service(VideoService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    before = GRPC_HANDLING_DURATION.count("GetVideo", "NOT_FOUND")
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = video_service_pb2_grpc.VideoServiceStub(channel)
+            with pytest.raises(grpc.aio.AioRpcError) as error:
+                async for _ in stub.GetVideo(video_service_pb2.VideoRequest(video_id="nope")):
+                    pass
+    finally:
+        await server.stop(grace=None)
+
+    assert error.value.code() == grpc.StatusCode.NOT_FOUND
+    assert GRPC_HANDLING_DURATION.count("GetVideo", "NOT_FOUND") == before + 1
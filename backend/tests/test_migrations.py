@@ -0,0 +1,35 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from migrations import backfill_uploader_usernames
+
+
+@pytest.mark.asyncio
+async def test_backfill_uploader_usernames_in_batches():
+    """MG-001: 依批次補上 uploader_username, 每批只查詢一次 users"""
+    user_ids = [ObjectId() for _ in range(3)]
+    db = MagicMock()
+    db.videos.distinct = AsyncMock(
+        return_value=[str(uid) for uid in user_ids] + ["default_user_id"]
+    )
+    db.users.find.return_value.to_list = AsyncMock(
+        side_effect=[
+            [{"_id": user_ids[0], "username": "alice"},
+             {"_id": user_ids[1], "username": "bob"}],
+            [],
+        ]
+    )
+    db.videos.bulk_write = AsyncMock(return_value=MagicMock(modified_count=2))
+
+    updated = await backfill_uploader_usernames(db, batch_size=2)
+
+    assert updated == 4
+    assert db.users.find.call_count == 2
+    assert db.videos.bulk_write.await_count == 2
+
+    first_batch = db.videos.bulk_write.await_args_list[0].args[0]
+    assert [op._doc["$set"]["uploader_username"] for op in first_batch] == ["alice", "bob"]
+    second_batch = db.videos.bulk_write.await_args_list[1].args[0]
+    assert [op._doc["$set"]["uploader_username"] for op in second_batch] == [None, None]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from models import UserDocument, UserModel, VideoDocument, VideoModel
+
+
+def test_documents_get_per_instance_timestamps():
+    """MD-001: 每份文件在建立時才取得 created_at"""
+    first = VideoDocument(title="a", file_path="a.mp4", uploader_id="u1")
+    time.sleep(0.001)
+    second = VideoDocument(title="b", file_path="b.mp4", uploader_id="u1")
+
+    assert second.created_at > first.created_at
+
+
+def test_pydantic_models_no_longer_share_import_time_timestamp():
+    """MD-002: Pydantic model 的 created_at 不再是 import 時的固定值"""
+    first = VideoModel(title="a", file_path="a.mp4", uploader_id="u1")
+    time.sleep(0.001)
+    second = UserModel(username="u", email="u@example.com", password="x")
+
+    assert second.created_at > first.created_at
+
+
+def test_video_document_to_document():
+    """MD-003: to_document 產生與原本 model_dump 相同的欄位"""
+    video = VideoDocument(title="t", file_path="t.mp4", uploader_id="u1",
+                          uploader_username="root")
+
+    document = video.to_document()
+    legacy = VideoModel(title="t", file_path="t.mp4", uploader_id="u1",
+                        uploader_username="root").dict(exclude={"id"})
+
+    assert document.keys() == legacy.keys()
+    assert document["uploader_username"] == "root"
+    assert document["views"] == 0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"username": "", "email": "u@example.com", "password": "x"},
+        {"username": "u", "email": "not-an-email", "password": "x"},
+        {"username": "u", "email": "u@example.com", "password": None},
+    ],
+)
+def test_user_document_validation(kwargs):
+    """MD-004: 欄位不合法時拋出 ValueError"""
+    with pytest.raises(ValueError):
+        UserDocument(**kwargs)
+
+
+def test_video_document_rejects_negative_views():
+    """MD-005: views 必須為非負整數"""
+    with pytest.raises(ValueError):
+        VideoDocument(title="t", file_path="t.mp4", uploader_id="u1", views=-1)
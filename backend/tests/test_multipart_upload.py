@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+
+import grpc
+import pytest
+
+import video_service_pb2
+import video_service_pb2_grpc
+from grpc_server import VideoService, add_video_service
+from multipart_upload import MultipartUploadError, MultipartUploadManager
+from tests.mp4_samples import build_mp4
+
+
+async def _one(data: bytes):
+    yield data
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    monkeypatch.setattr("config.settings.multipart_min_part_bytes", 1024)
+
+
+@pytest.mark.asyncio
+async def test_parallel_parts_over_grpc(monkeypatch, tmp_path, small_parts):
+    """MU-001: 各 part 以不同 stream 並行上傳, 完成後組成完整檔案"""
+    monkeypatch.chdir(tmp_path)
+    data = build_mp4(mdat_size=10000)
+    server = grpc.aio.server()
+    add_video_service(VideoService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = video_service_pb2_grpc.VideoServiceStub(channel)
+            created = await stub.CreateMultipartUpload(
+                video_service_pb2.CreateMultipartUploadRequest(
+                    video_id="v1", total_size=len(data), part_size=4096
+                )
+            )
+            assert created.part_count == 3
+
+            async def send(number):
+                part = data[(number - 1) * 4096:number * 4096]
+
+                async def messages():
+                    yield video_service_pb2.PartChunk(
+                        upload_id=created.upload_id, part_number=number, content=part[:1000]
+                    )
+                    yield video_service_pb2.PartChunk(content=part[1000:])
+
+                return await stub.UploadPart(messages())
+
+            responses = await asyncio.gather(*[send(n) for n in (3, 1, 2)])
+            parts = [video_service_pb2.CompletedPart(part_number=r.part_number, sha256=r.sha256)
+                     for r in responses]
+            result = await stub.CompleteMultipartUpload(
+                video_service_pb2.CompleteMultipartUploadRequest(
+                    upload_id=created.upload_id, parts=parts
+                )
+            )
+    finally:
+        await server.stop(grace=None)
+
+    assert result.success is True
+    assert (tmp_path / "uploads" / "v1.mp4").read_bytes() == data
+    assert sorted(p.name for p in (tmp_path / "uploads").iterdir()) == ["v1.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_complete_verifies_checksums(tmp_path, small_parts):
+    """MU-002: checksum 不符或缺少 part 時不產生檔案"""
+    manager = MultipartUploadManager(str(tmp_path))
+    data = build_mp4(mdat_size=3000)
+    upload = manager.create("v2", len(data), 2048)
+    pieces = [data[i:i + 2048] for i in range(0, len(data), 2048)]
+    checksums = []
+    for number, piece in enumerate(pieces[:-1], start=1):
+        checksum, _ = await manager.write_part(upload.upload_id, number, _one(piece))
+        checksums.append((number, checksum))
+
+    with pytest.raises(MultipartUploadError) as missing:
+        await manager.complete(upload.upload_id, checksums)
+    assert missing.value.code == grpc.StatusCode.FAILED_PRECONDITION
+
+    await manager.write_part(upload.upload_id, len(pieces), _one(pieces[-1]))
+    checksums.append((len(pieces), hashlib.sha256(b"x").hexdigest()))
+    with pytest.raises(MultipartUploadError, match="Checksum mismatch"):
+        await manager.complete(upload.upload_id, checksums)
+    assert not (tmp_path / "v2.mp4").exists()
+
+
+@pytest.mark.asyncio
+async def test_first_part_must_be_video(tmp_path, small_parts):
+    """MU-003: 第一個 part 不是影片格式時中止上傳並刪除暫存檔"""
+    manager = MultipartUploadManager(str(tmp_path))
+    upload = manager.create("v3", 4096, 2048)
+
+    with pytest.raises(MultipartUploadError, match="Unsupported video format"):
+        await manager.write_part(upload.upload_id, 1, _one(b"%PDF" + bytes(2044)))
+
+    assert list(tmp_path.iterdir()) == []
+    assert upload.upload_id not in manager.uploads
+
+
+@pytest.mark.asyncio
+async def test_abort_waits_for_in_flight_parts(tmp_path, small_parts):
+    """MU-004: part 串流途中中止時, fd 在該 part 結束後才關閉, 暫存檔也在那時刪除"""
+    manager = MultipartUploadManager(str(tmp_path))
+    data = build_mp4(mdat_size=3000)
+    upload = manager.create("v4", len(data), 2048)
+    resume = asyncio.Event()
+
+    async def slow_part():
+        yield data[:1024]
+        await resume.wait()
+        yield data[1024:2048]
+
+    writer = asyncio.create_task(manager.write_part(upload.upload_id, 1, slow_part()))
+    while upload.writers == 0:
+        await asyncio.sleep(0.01)
+
+    # 仍有 part 在寫入時不能完成上傳
+    with pytest.raises(MultipartUploadError) as busy:
+        await manager.complete(upload.upload_id, [(1, "0" * 64), (2, "0" * 64)])
+    assert busy.value.code == grpc.StatusCode.FAILED_PRECONDITION
+
+    await manager.abort(upload.upload_id)
+    assert upload.fd is not None
+    assert os.path.exists(upload.path)
+    resume.set()
+    with pytest.raises(MultipartUploadError) as aborted:
+        await writer
+
+    assert aborted.value.code == grpc.StatusCode.ABORTED
+    assert upload.fd is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_complete_discards_upload_when_storing_fails(monkeypatch, tmp_path, small_parts):
+    """MU-005: fsync 或 os.replace 失敗時刪除暫存檔並回傳 INTERNAL"""
+    manager = MultipartUploadManager(str(tmp_path))
+    data = build_mp4(mdat_size=1000)
+    upload = manager.create("v5", len(data), len(data))
+    checksum, _ = await manager.write_part(upload.upload_id, 1, _one(data))
+
+    def replace(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("multipart_upload.os.replace", replace)
+    with pytest.raises(MultipartUploadError) as error:
+        await manager.complete(upload.upload_id, [(1, checksum)])
+
+    assert error.value.code == grpc.StatusCode.INTERNAL
+    assert upload.fd is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_multipart_refused_with_multiple_workers(tmp_path, monkeypatch):
+    """MU-006: multi-worker 模式下分段上傳回傳 UNIMPLEMENTED, 不會建立只存在單一 worker 的上傳"""
+    monkeypatch.chdir(tmp_path)
+    service = VideoService(multipart_enabled=False)
+    server = grpc.aio.server()
+    add_video_service(service, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = video_service_pb2_grpc.VideoServiceStub(channel)
+            with pytest.raises(grpc.aio.AioRpcError) as error:
+                await stub.CreateMultipartUpload(
+                    video_service_pb2.CreateMultipartUploadRequest(
+                        video_id="v1", total_size=4096
+                    )
+                )
+    finally:
+        await server.stop(grace=None)
+
+    assert error.value.code() == grpc.StatusCode.UNIMPLEMENTED
+    assert service.multipart.uploads == {}
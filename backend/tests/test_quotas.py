@@ -0,0 +1,119 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+from quotas import QuotaExceeded, UploadQuotas, storage_usage
+
+
+@pytest.fixture
+def collection():
+    return MagicMock()
+
+
+@pytest.fixture
+def db(collection):
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+    return db
+
+
+@pytest.mark.asyncio
+async def test_acquire_rejects_when_concurrency_exhausted(db, collection):
+    """QT-001: 並行上傳名額用完時回傳 429"""
+    collection.find_one_and_update = AsyncMock(side_effect=DuplicateKeyError("dup"))
+
+    with pytest.raises(QuotaExceeded) as exc:
+        await UploadQuotas(max_bytes=100, max_concurrent=1).acquire(db, "u1")
+
+    assert exc.value.status == 429
+
+
+@pytest.mark.asyncio
+async def test_consume_leases_space_in_chunks(mocker, db, collection):
+    """QT-002: 寫入時以 lease 為單位預留空間, 完成後歸還多餘的量"""
+    mocker.patch.object(settings, "upload_quota_lease_bytes", 10)
+    collection.find_one_and_update = AsyncMock(return_value={"bytes_used": 0})
+    quotas = UploadQuotas(max_bytes=1000, max_concurrent=2)
+
+    reservation = await quotas.acquire(db, "u1")
+    for _ in range(5):
+        await reservation.consume(4)
+    await reservation.commit()
+    await reservation.release()
+
+    calls = collection.find_one_and_update.await_args_list[1:]
+    assert [call.args[1]["$inc"] for call in calls[:2]] == [{"bytes_used": 10}] * 2
+    # 預留空間時延長自己名額的到期時間
+    assert "slots.$[slot].expires_at" in calls[0].args[1]["$set"]
+    assert calls[0].kwargs["array_filters"] == [{"slot.id": reservation.slot_id}]
+    # 20 bytes 只用了兩個 lease; 結束時歸還 0 並釋放名額, release 不會重複釋放
+    assert [call.args[1] for call in calls[2:]] == [
+        {"$inc": {"bytes_used": 0}, "$pull": {"slots": {"id": reservation.slot_id}}}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_consume_raises_when_quota_exhausted(mocker, db, collection):
+    """QT-003: 空間不足時在串流途中拋出 QuotaExceeded"""
+    mocker.patch.object(settings, "upload_quota_lease_bytes", 10)
+    collection.find_one_and_update = AsyncMock(
+        side_effect=[{"bytes_used": 95}, None, None, {"bytes_used": 95}]
+    )
+    quotas = UploadQuotas(max_bytes=100, max_concurrent=2)
+    reservation = await quotas.acquire(db, "u1")
+
+    with pytest.raises(QuotaExceeded) as exc:
+        await reservation.consume(8)
+    await reservation.release()
+
+    assert exc.value.status == 413
+    assert collection.find_one_and_update.await_args.args[1] == {
+        "$inc": {"bytes_used": 0}, "$pull": {"slots": {"id": reservation.slot_id}}
+    }
+
+
+def test_precheck_uses_cached_usage():
+    """QT-004: 快取的用量足以判斷時不查資料庫直接拒絕"""
+    quotas = UploadQuotas(max_bytes=1000, max_concurrent=1)
+    quotas.remember("u1", 900)
+
+    with pytest.raises(QuotaExceeded):
+        quotas.precheck("u1", 500 + settings.upload_form_overhead_bytes)
+    quotas.precheck("u1", 50 + settings.upload_form_overhead_bytes)
+    quotas.precheck("u2", 10 ** 9)
+
+
+def test_storage_usage_groups_by_uploader():
+    """QT-005: 依上傳者加總影片大小, 略過沒有 size 的舊文件"""
+    videos = [
+        {"uploader_id": "a", "size": 10},
+        {"uploader_id": "a", "size": 5},
+        {"uploader_id": "b", "size": 7},
+        {"uploader_id": "b"},
+    ]
+
+    assert storage_usage(videos) == {"a": 15, "b": 7}
+
+
+@pytest.mark.asyncio
+async def test_acquire_tracks_slots_per_reservation(db, collection):
+    """QT-006: 每次上傳各自的名額; 只有過期的名額會被清除, 釋放時只移除自己的名額"""
+    collection.find_one_and_update = AsyncMock(return_value={"bytes_used": 0})
+    quotas = UploadQuotas(max_bytes=1000, max_concurrent=2)
+
+    first = await quotas.acquire(db, "u1")
+    second = await quotas.acquire(db, "u1")
+    await first.release()
+
+    assert first.slot_id != second.slot_id
+    acquire = collection.find_one_and_update.await_args_list[1]
+    [stage] = acquire.args[1]
+    live = stage["$set"]["slots"]["$concatArrays"][0]["$filter"]
+    assert live["cond"]["$gt"][0] == "$$this.expires_at"
+    assert acquire.args[0]["$expr"] == {"$lt": [{"$size": {"$filter": live}}, 2]}
+    assert stage["$set"]["slots"]["$concatArrays"][1][0]["id"] == second.slot_id
+    assert collection.find_one_and_update.await_args.args[1]["$pull"] == {
+        "slots": {"id": first.slot_id}
+    }
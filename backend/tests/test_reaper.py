@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from reaper import BlobReaper, new_blob_name
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    return tmp_path
+
+
+@pytest.fixture
+def mock_db(mocker):
+    db = MagicMock()
+    mocker.patch("reaper.get_database", return_value=db)
+    return db
+
+
+def _old_file(directory, name):
+    path = directory / name
+    path.write_bytes(b"x")
+    old = time.time() - 2 * 86400
+    os.utime(path, (old, old))
+    return path
+
+
+@pytest.mark.asyncio
+async def test_reap_tombstones_removes_files_then_records(mock_db, upload_dir):
+    """RP-001: 刪除軟刪除影片的檔案後以單一 delete_many 移除紀錄"""
+    videos = [{"_id": ObjectId(), "file_path": f"v{i}.mp4"} for i in range(3)]
+    for video in videos[:2]:
+        (upload_dir / video["file_path"]).write_bytes(b"x")
+    mock_db.videos.find.return_value.to_list = AsyncMock(return_value=videos)
+    mock_db.videos.delete_many = AsyncMock(return_value=MagicMock(deleted_count=3))
+
+    reaped = await BlobReaper(upload_dir=str(upload_dir)).reap_tombstones()
+
+    assert reaped == 3
+    assert list(upload_dir.iterdir()) == []
+    mock_db.videos.delete_many.assert_awaited_once()
+    query = mock_db.videos.delete_many.await_args.args[0]
+    assert query["_id"] == {"$in": [video["_id"] for video in videos]}
+
+
+@pytest.mark.asyncio
+async def test_collect_orphans_only_removes_unreferenced_old_files(mock_db, upload_dir):
+    """RP-002: 只回收沒有紀錄、超過寬限期且由本服務命名的檔案"""
+    old_stamp = datetime.utcnow() - timedelta(days=2)
+    referenced = _old_file(upload_dir, f"blob-{ObjectId.from_datetime(old_stamp)}.mp4")
+    orphan = _old_file(upload_dir, f"blob-{ObjectId.from_datetime(old_stamp + timedelta(seconds=1))}.mp4")
+    partial = _old_file(upload_dir, f"blob-{ObjectId.from_datetime(old_stamp + timedelta(seconds=2))}.mp4.part")
+    fresh = upload_dir / new_blob_name(".mp4")
+    fresh.write_bytes(b"x")
+    foreign = _old_file(upload_dir, "grpc-upload.mp4")
+    mock_db.videos.distinct = AsyncMock(return_value=[referenced.name])
+
+    removed = await BlobReaper(upload_dir=str(upload_dir)).collect_orphans()
+
+    assert removed == 2
+    assert sorted(p.name for p in upload_dir.iterdir()) == sorted(
+        [referenced.name, fresh.name, foreign.name]
+    )
+
+
+@pytest.mark.asyncio
+async def test_collect_orphans_keeps_grpc_uploads(mock_db, upload_dir):
+    """RP-003: gRPC 與 multipart 上傳以 video_id 命名的檔案沒有影片文件, 不會被當成孤兒"""
+    video_id = str(ObjectId.from_datetime(datetime.utcnow() - timedelta(days=2)))
+    uploaded = _old_file(upload_dir, f"{video_id}.mp4")
+    partial = _old_file(upload_dir, f"{video_id}.{ObjectId()}.part")
+    mock_db.videos.distinct = AsyncMock(return_value=[])
+
+    removed = await BlobReaper(upload_dir=str(upload_dir)).collect_orphans()
+
+    assert removed == 0
+    assert uploaded.exists() and partial.exists()
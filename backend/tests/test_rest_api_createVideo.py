@@ -6,6 +6,10 @@ from unittest.mock import AsyncMock, MagicMock, Mock
 import rest_api
 from config import settings
 from jose import jwt
+
+# 最小的 MP4 檔頭 (ftyp box), 讓上傳通過格式檢查
+MP4_HEAD = b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2"
+
 @pytest.fixture
 async def client(aiohttp_client):
     """建立 aiohttp 應用並註冊 API 路由"""
@@ -71,6 +75,25 @@ async def test_create_video_invalid_token(mocker, client):
         text = await resp.text()
         assert "Invalid token" in text
 
+# 測試 API /api/videos - token 的 sub 不是使用者 ObjectId 時，應回傳 401
+@pytest.mark.asyncio
+async def test_create_video_invalid_subject(mocker, client):
+    """測試 API /api/videos - 與其他 API 相同拒絕 sub 不是 ObjectId 的 Token"""
+    # Arrange
+    data = FormData()
+    data.add_field("title", "test.mp4")
+    data.add_field("file", io.BytesIO(MP4_HEAD),
+                   filename="test.mp4", content_type="video/mp4")
+    mocker.patch("jose.jwt.decode", return_value={"sub": "not-an-id"})
+    mock_db = mocker.patch("rest_api.get_database")
+    # Act
+    async with client.post("/api/videos", data=data,
+                           headers={"Authorization": "Bearer validtoken"}) as resp:
+        # Assert
+        assert resp.status == 401
+        assert "Invalid token" in await resp.text()
+    mock_db.assert_not_called()
+
 # 測試 API /api/videos - 當僅上傳 title 而未上傳 file 時，應回傳 500 (目前行為)
 @pytest.mark.asyncio
 async def test_create_video_no_video_file(mocker, client):
@@ -99,7 +122,7 @@ async def test_create_video_success(mocker, client, tmp_path):
     valid_payload = {"sub": "507f1f77bcf86cd799439012"}
     mocker.patch("jose.jwt.decode", return_value=valid_payload)
     # 建立包含 title 與 file 欄位的 multipart form-data
-    file_content = b"fake video data"
+    file_content = MP4_HEAD + b"fake video data"
     data = FormData()
     data.add_field("title", "test.mp4")
     data.add_field("file", io.BytesIO(file_content),
@@ -110,6 +133,7 @@ async def test_create_video_success(mocker, client, tmp_path):
     mock_insert_result = MagicMock()
     mock_insert_result.inserted_id = "67d42da7c69a91285466b1db"
     mock_db.videos.insert_one = AsyncMock(return_value=mock_insert_result)
+    mock_db.users.find_one = AsyncMock(return_value={"username": "root"})
     mocker.patch("rest_api.get_database", return_value=mock_db)
     # 為避免實際檔案寫入，模擬 os.makedirs 與 open
     mocker.patch("rest_api.os.makedirs")
@@ -126,4 +150,109 @@ async def test_create_video_success(mocker, client, tmp_path):
             # 注意: 回傳的 file_path 為檔案名稱，故只取最後一節
             "file_path": m_open.call_args[0][0].split(os.sep)[-1]
         }
-        assert json_response == expected
\ No newline at end of file
+        assert json_response == expected
+        # 上傳者名稱寫入影片文件
+        inserted = mock_db.videos.insert_one.await_args.args[0]
+        assert inserted["uploader_username"] == "root"
+
+
+# 測試 API /api/videos - 超過上傳配額時，應在串流途中中止並回傳 413
+@pytest.mark.asyncio
+async def test_create_video_quota_exceeded_aborts_stream(mocker, aiohttp_client, tmp_path, monkeypatch):
+    """測試 API /api/videos - 超過配額時中止寫入並刪除部分檔案"""
+    from quotas import QuotaExceeded, upload_quotas_key
+
+    monkeypatch.chdir(tmp_path)
+    reservation = MagicMock()
+    reservation.consume = AsyncMock(side_effect=[None, QuotaExceeded("Storage quota exceeded")])
+    reservation.release = AsyncMock()
+    quotas = MagicMock()
+    quotas.acquire = AsyncMock(return_value=reservation)
+
+    app = web.Application()
+    app[upload_quotas_key] = quotas
+    app.router.add_post("/api/videos", rest_api.create_video)
+    client = await aiohttp_client(app)
+
+    mocker.patch("jose.jwt.decode", return_value={"sub": "507f1f77bcf86cd799439012"})
+    mock_db = AsyncMock()
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    data = FormData()
+    data.add_field("title", "big.mp4")
+    data.add_field("file", io.BytesIO(MP4_HEAD + b"x" * 300000),
+                   filename="big.mp4", content_type="video/mp4")
+
+    async with client.post("/api/videos", data=data,
+                           headers={"Authorization": "Bearer validtoken"}) as resp:
+        assert resp.status == 413
+        assert "Storage quota exceeded" in await resp.text()
+
+    assert list((tmp_path / "uploads").iterdir()) == []
+    reservation.release.assert_awaited_once()
+    mock_db.videos.insert_one.assert_not_awaited()
+
+
+# 測試 API /api/videos - 上傳成功時，已用空間應等於實際寫入的 bytes
+@pytest.mark.asyncio
+async def test_create_video_commits_written_bytes(mocker, aiohttp_client, tmp_path, monkeypatch):
+    """測試 API /api/videos - lease 多預留的空間在 commit 時歸還, 只計入寫入的檔案大小"""
+    from quotas import UploadQuotas, upload_quotas_key
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "upload_quota_lease_bytes", 64 * 1024)
+    usage = {"bytes_used": 0}
+
+    async def find_one_and_update(query, update, **kwargs):
+        if isinstance(update, dict):
+            usage["bytes_used"] += update["$inc"]["bytes_used"]
+        return dict(usage)
+
+    mock_db = MagicMock()
+    mock_db.__getitem__.return_value.find_one_and_update = AsyncMock(
+        side_effect=find_one_and_update
+    )
+    mock_db.users.find_one = AsyncMock(return_value=None)
+    mock_db.videos.insert_one = AsyncMock(return_value=MagicMock(inserted_id="vid"))
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    mocker.patch("jose.jwt.decode", return_value={"sub": "507f1f77bcf86cd799439012"})
+
+    app = web.Application()
+    app[upload_quotas_key] = UploadQuotas(max_bytes=10 ** 9, max_concurrent=2)
+    app.router.add_post("/api/videos", rest_api.create_video)
+    client = await aiohttp_client(app)
+    content = MP4_HEAD + b"x" * 100000
+    data = FormData()
+    data.add_field("title", "clip.mp4")
+    data.add_field("file", io.BytesIO(content), filename="clip.mp4", content_type="video/mp4")
+
+    async with client.post("/api/videos", data=data,
+                           headers={"Authorization": "Bearer validtoken"}) as resp:
+        assert resp.status == 200
+        file_path = (await resp.json())["file_path"]
+
+    assert (tmp_path / "uploads" / file_path).stat().st_size == len(content)
+    assert usage["bytes_used"] == len(content)
+    assert mock_db.videos.insert_one.await_args.args[0]["size"] == len(content)
+
+
+# 測試 API /api/videos - 上傳的檔案不是影片時，應在寫入前回傳 415
+@pytest.mark.asyncio
+async def test_create_video_rejects_non_video_content(mocker, client):
+    """測試 API /api/videos - 依檔頭判斷格式, 副檔名為 .mp4 的 PDF 也會被拒絕"""
+    mocker.patch("jose.jwt.decode", return_value={"sub": "507f1f77bcf86cd799439012"})
+    mock_db = AsyncMock()
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    mocker.patch("rest_api.os.makedirs")
+    m_open = mocker.patch("rest_api.open", mocker.mock_open())
+    data = FormData()
+    data.add_field("title", "report.mp4")
+    data.add_field("file", io.BytesIO(b"%PDF-1.7\n" + b"x" * 100000),
+                   filename="report.mp4", content_type="video/mp4")
+
+    async with client.post("/api/videos", data=data,
+                           headers={"Authorization": "Bearer validtoken"}) as resp:
+        assert resp.status == 415
+        assert "Unsupported video format" in await resp.text()
+
+    m_open.assert_not_called()
+    mock_db.videos.insert_one.assert_not_awaited()
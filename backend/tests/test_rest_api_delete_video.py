@@ -3,6 +3,8 @@ from aiohttp import web
 from unittest.mock import AsyncMock, MagicMock, Mock
 import rest_api
 
+VIDEO = {"file_path": "blob-65d123456789abcd12345678.mp4"}
+
 @pytest.fixture
 async def client(aiohttp_client):
     """Fixture: 建立 aiohttp 應用程式並註冊路由"""
@@ -24,6 +26,7 @@ async def test_delete_video_not_found(mocker, client):
     """DV-002: 有效視頻ID但影片不存在資料庫測試"""
     mock_db = AsyncMock()
     mock_db.videos = AsyncMock()
+    mock_db.videos.find_one = AsyncMock(return_value=VIDEO)
     mock_db.videos.delete_one = AsyncMock(return_value=MagicMock(deleted_count=0))
     mocker.patch("rest_api.get_database", return_value=mock_db)
     """測試 API /api/videos/{video_id} 當影片不存在時，應回傳 404"""
@@ -37,6 +40,7 @@ async def test_delete_video_database_error(mocker, client):
     """DV-003: 資料庫紀錄刪除錯誤測試"""
     mock_db = AsyncMock()
     mock_db.videos = AsyncMock()
+    mock_db.videos.find_one = AsyncMock(return_value=VIDEO)
     mock_db.videos.delete_one = AsyncMock(side_effect=Exception("Database error"))
     mocker.patch("rest_api.get_database", return_value=mock_db)
     """測試 API /api/videos/{video_id} 當資料庫錯誤時，應回傳 500"""
@@ -50,6 +54,7 @@ async def test_delete_video_success(mocker, client):
     """DV-004: 視頻成功刪除測試"""
     mock_db = AsyncMock()
     mock_db.videos = AsyncMock()
+    mock_db.videos.find_one = AsyncMock(return_value=VIDEO)
     mock_db.videos.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
     mocker.patch("rest_api.get_database", return_value=mock_db)
     """測試 API /api/videos/{video_id} 成功刪除影片時，應回傳 200"""
@@ -57,3 +62,47 @@ async def test_delete_video_success(mocker, client):
     async with client.delete("/api/videos/65d123456789abcd12345678", headers=headers) as resp:
         assert resp.status == 200
         assert "Video deleted successfully" in await resp.text()
+
+
+@pytest.mark.asyncio
+async def test_delete_video_removes_file_after_record(mocker, client):
+    """DV-005: 先刪除資料庫紀錄, 再於背景刪除檔案"""
+    mock_db = AsyncMock()
+    mock_db.videos = AsyncMock()
+    mock_db.videos.find_one = AsyncMock(return_value={"file_path": "abc.mp4"})
+    mock_db.videos.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    mock_remove = mocker.patch("rest_api.schedule_blob_removal")
+    mocker.patch("rest_api.os.remove", side_effect=AssertionError("blocking os.remove"))
+
+    headers = {"Authorization": "Bearer test_token"}
+    async with client.delete("/api/videos/65d123456789abcd12345678", headers=headers) as resp:
+        assert resp.status == 200
+
+    mock_remove.assert_called_once_with("abc.mp4")
+
+
+@pytest.mark.asyncio
+async def test_delete_video_already_tombstoned(mocker, client):
+    """DV-006: 已軟刪除的影片回傳 404, 不會再次刪除、歸還空間或發布事件"""
+    mock_db = AsyncMock()
+    mock_db.videos = AsyncMock()
+    # 軟刪除的影片只有在查詢不排除 deleted_at 時才找得到
+    mock_db.videos.find_one = AsyncMock(
+        side_effect=lambda query, *args: None if "deleted_at" in query else dict(VIDEO)
+    )
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    mock_adjust = mocker.patch("rest_api.adjust_storage", new_callable=AsyncMock)
+    mock_remove = mocker.patch("rest_api.schedule_blob_removal")
+    ws_server = Mock()
+    mocker.patch("rest_api.get_websocket_server", return_value=ws_server)
+
+    headers = {"Authorization": "Bearer test_token"}
+    async with client.delete("/api/videos/65d123456789abcd12345678", headers=headers) as resp:
+        assert resp.status == 404
+        assert "Video not found" in await resp.text()
+
+    mock_db.videos.delete_one.assert_not_awaited()
+    mock_adjust.assert_not_awaited()
+    mock_remove.assert_not_called()
+    ws_server.publish_video_deleted.assert_not_called()
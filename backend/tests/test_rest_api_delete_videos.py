@@ -0,0 +1,60 @@
+import pytest
+from aiohttp import web
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+
+import rest_api
+from auth import create_access_token
+
+
+@pytest.fixture
+async def client(aiohttp_client):
+    app = web.Application()
+    app.router.add_delete("/api/videos", rest_api.delete_videos)
+    return await aiohttp_client(app)
+
+
+@pytest.fixture
+def headers():
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(ObjectId())})}"}
+
+
+@pytest.mark.asyncio
+async def test_delete_videos_invalid_ids(client, headers):
+    """BD-001: ids 含有無效格式時回傳 400"""
+    async with client.delete("/api/videos", json={"ids": ["bad"]}, headers=headers) as resp:
+        assert resp.status == 400
+        assert "Invalid video ID format" in await resp.text()
+
+
+@pytest.mark.asyncio
+async def test_delete_videos_missing_token(client):
+    """BD-002: 缺少授權標頭時回傳 401"""
+    async with client.delete("/api/videos", json={"ids": [str(ObjectId())]}) as resp:
+        assert resp.status == 401
+
+
+@pytest.mark.asyncio
+async def test_delete_videos_marks_tombstones(mocker, client, headers):
+    """BD-003: 以單一 update_many 標記軟刪除, 不直接刪除檔案"""
+    live_id, gone_id = ObjectId(), ObjectId()
+    mock_db = MagicMock()
+    mock_db.videos.find.return_value.to_list = AsyncMock(return_value=[{"_id": live_id}])
+    mock_db.videos.update_many = AsyncMock()
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    mock_remove = mocker.patch("rest_api.os.remove")
+
+    body = {"ids": [str(live_id), str(gone_id)]}
+    async with client.delete("/api/videos", json=body, headers=headers) as resp:
+        assert resp.status == 200
+        assert await resp.json() == {
+            "message": "Videos deleted successfully",
+            "deleted": 1,
+            "video_ids": [str(live_id)],
+        }
+
+    mock_db.videos.update_many.assert_awaited_once()
+    query, update = mock_db.videos.update_many.await_args.args
+    assert query["_id"] == {"$in": [live_id]}
+    assert "deleted_at" in update["$set"]
+    mock_remove.assert_not_called()
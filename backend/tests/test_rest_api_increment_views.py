@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime
 from unittest import mock
 from aiohttp import web
 from bson import ObjectId
@@ -49,7 +50,7 @@ async def test_increment_views_success(cli, mock_db):
 
     # 確認 update_one 被呼叫
     mock_db.return_value.videos.update_one.assert_awaited_once_with(
-        {"_id": ObjectId(video_id)},
+        {"_id": ObjectId(video_id), "deleted_at": {"$exists": False}},
         {"$inc": {"views": 1}}
     )
 
@@ -70,7 +71,7 @@ async def test_increment_views_video_not_found(cli, mock_db):
 
     # 確認 update_one 被呼叫
     mock_db.return_value.videos.update_one.assert_awaited_once_with(
-        {"_id": ObjectId(video_id)},
+        {"_id": ObjectId(video_id), "deleted_at": {"$exists": False}},
         {"$inc": {"views": 1}}
     )
 
@@ -99,3 +100,41 @@ async def test_increment_views_invalid_but_valid_format(cli, mock_db):
     assert res.status == 500
     text = await res.text()
     assert "InvalidId" in text
+
+
+@pytest.mark.asyncio
+async def test_increment_views_publishes_view_event(cli, mock_db):
+    """IV-006: 更新成功後透過 WebSocketServer 發布觀看事件"""
+    video_id = "507f1f77bcf86cd799439015"
+    mock_result = mock.MagicMock()
+    mock_result.modified_count = 1
+    mock_db.return_value.videos.update_one.return_value = mock_result
+
+    ws_server = mock.MagicMock()
+    with mock.patch("rest_api.get_websocket_server", return_value=ws_server):
+        res = await cli.post(f"/api/videos/{video_id}/view")
+
+    assert res.status == 200
+    ws_server.publish_view.assert_called_once_with(video_id)
+
+
+@pytest.mark.asyncio
+async def test_increment_views_skips_tombstoned_video(cli, mock_db):
+    """IV-007: 已軟刪除的影片回傳 404, 觀看次數不變"""
+    video_id = "507f1f77bcf86cd799439016"
+    video = {"_id": ObjectId(video_id), "views": 3, "deleted_at": datetime.utcnow()}
+
+    async def update_one(query, update):
+        matched = query["_id"] == video["_id"] and not (
+            "deleted_at" in video and query.get("deleted_at") == {"$exists": False}
+        )
+        if matched:
+            video["views"] += update["$inc"]["views"]
+        return mock.MagicMock(modified_count=int(matched))
+
+    mock_db.return_value.videos.update_one.side_effect = update_one
+
+    res = await cli.post(f"/api/videos/{video_id}/view")
+
+    assert res.status == 404
+    assert video["views"] == 3
@@ -0,0 +1,55 @@
+import pytest
+from aiohttp import web
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+
+import rest_api
+from auth import create_access_token
+
+
+@pytest.fixture
+async def client(aiohttp_client):
+    app = web.Application()
+    app.router.add_put("/api/users/me", rest_api.update_username)
+    return await aiohttp_client(app)
+
+
+@pytest.mark.asyncio
+async def test_update_username_missing_token(client):
+    """UU-001: 缺少授權標頭時回傳 401"""
+    async with client.put("/api/users/me", json={"username": "new"}) as resp:
+        assert resp.status == 401
+
+
+@pytest.mark.asyncio
+async def test_update_username_fans_out_to_videos(mocker, client):
+    """UU-002: 改名後以 update_many 同步影片中的 uploader_username"""
+    user_id = str(ObjectId())
+    mock_db = MagicMock()
+    mock_db.users.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    mock_db.videos.update_many = AsyncMock(return_value=MagicMock(modified_count=3))
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+
+    async with client.put("/api/users/me", json={"username": "new"}, headers=headers) as resp:
+        assert resp.status == 200
+        assert await resp.json() == {"id": user_id, "username": "new", "videos_updated": 3}
+
+    [(filter_, update), _] = mock_db.videos.update_many.await_args
+    assert filter_ == {"uploader_id": user_id}
+    assert update["$set"]["uploader_username"] == "new"
+    # 輪詢模式以 updated_at 偵測改名
+    assert update["$set"]["updated_at"] == mock_db.users.update_one.await_args[0][1]["$set"]["updated_at"]
+
+
+@pytest.mark.asyncio
+async def test_update_username_invalid_subject(mocker, client):
+    """UU-003: token 的 sub 不是有效的 ObjectId 時回傳 401"""
+    mock_db = MagicMock()
+    mocker.patch("rest_api.get_database", return_value=mock_db)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'not-an-id'})}"}
+
+    async with client.put("/api/users/me", json={"username": "new"}, headers=headers) as resp:
+        assert resp.status == 401
+
+    mock_db.users.update_one.assert_not_called()
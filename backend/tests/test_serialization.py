@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import serialization
+
+
+@pytest.fixture(params=sorted(serialization.BACKENDS))
+def backend(request):
+    previous = serialization.backend
+    serialization.set_backend(request.param)
+    yield request.param
+    serialization.set_backend(previous)
+
+
+def test_dumps_handles_objectid_and_datetime(backend):
+    """SE-001: 各後端都能直接序列化 ObjectId 與 datetime"""
+    video_id = ObjectId()
+    created_at = datetime(2024, 5, 1, 12, 30, 0)
+
+    data = json.loads(serialization.dumps({"id": video_id, "created_at": created_at, "title": "影片"}))
+
+    assert data == {"id": str(video_id), "created_at": "2024-05-01T12:30:00", "title": "影片"}
+
+
+def test_dumps_rejects_unknown_types(backend):
+    """SE-002: 不支援的型別仍拋出 TypeError"""
+    with pytest.raises(TypeError):
+        serialization.dumps({"value": object()})
+
+
+def test_json_response_content_type(backend):
+    """SE-003: json_response 回傳 application/json"""
+    res = serialization.json_response({"ok": True}, status=201)
+
+    assert res.status == 201
+    assert res.content_type == "application/json"
+    assert json.loads(res.body) == {"ok": True}
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+
+import aiohttp
+import grpc
+import pytest
+import websockets
+from aiohttp import web
+
+from chat_history import ChatHistory
+from config import settings
+from ingest import IngestPipeline
+from main import _drain, request_drain_seconds, shutdown_services
+from websocket_server import WebSocketServer
+
+
+@pytest.mark.asyncio
+async def test_websocket_shutdown_flushes_then_goes_away():
+    """SD-001: 關閉時先送出累積的觀看次數事件, 再以 1001 關閉連線並停止接受新連線"""
+    ws_server = WebSocketServer(history=ChatHistory(persist=False))
+    registered = asyncio.Event()
+
+    async def handler(websocket, path):
+        ws_server.connections.add(websocket)
+        registered.set()
+        await websocket.wait_closed()
+
+    ws_server.serving = await websockets.serve(handler, "127.0.0.1", 0)
+    port = ws_server.serving.sockets[0].getsockname()[1]
+    async with websockets.connect(f"ws://127.0.0.1:{port}") as client:
+        await registered.wait()
+        ws_server.publish_view("abc", 2)
+        await ws_server.shutdown()
+
+        message = json.loads(await client.recv())
+        with pytest.raises(websockets.ConnectionClosed):
+            await client.recv()
+
+    assert message == {"type": "views_updated", "views": {"abc": 2}}
+    assert client.close_code == 1001
+    with pytest.raises(OSError):
+        await websockets.connect(f"ws://127.0.0.1:{port}")
+
+
+@pytest.mark.asyncio
+async def test_drain_gives_up_at_deadline(caplog):
+    """SD-002: 超過關閉期限的步驟會被放棄並記錄警告"""
+    loop = asyncio.get_running_loop()
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        finished.append(True)
+
+    with caplog.at_level(logging.WARNING, logger="main"):
+        await _drain(slow(), loop.time() + 0.05, "slow step")
+        await _drain(fast(), loop.time() + 1, "fast step")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("slow step" in message for message in messages)
+    assert not any("fast step" in message for message in messages)
+    assert finished == [True]
+
+
+@pytest.mark.asyncio
+async def test_in_flight_request_leaves_time_for_websocket_close(monkeypatch):
+    """SD-003: 進行中的請求最多等到期限前保留的時間, websocket 仍能送出事件並以 1001 關閉"""
+    monkeypatch.setattr(settings, "shutdown_timeout_seconds", 1)
+    monkeypatch.setattr(settings, "shutdown_reserve_seconds", 0.5)
+    monkeypatch.setattr(settings, "shutdown_websocket_seconds", 1)
+    started = asyncio.Event()
+
+    async def upload(request):
+        started.set()
+        await asyncio.sleep(30)
+        return web.Response(text="done")
+
+    app = web.Application()
+    app.router.add_post("/upload", upload)
+    runner = web.AppRunner(app, shutdown_timeout=request_drain_seconds())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    api_port = runner.addresses[0][1]
+    grpc_server = grpc.aio.server()
+    grpc_server.add_insecure_port("127.0.0.1:0")
+    await grpc_server.start()
+
+    ws_server = WebSocketServer(history=ChatHistory(persist=False))
+    registered = asyncio.Event()
+
+    async def handler(websocket, path):
+        ws_server.connections.add(websocket)
+        registered.set()
+        await websocket.wait_closed()
+
+    ws_server.serving = await websockets.serve(handler, "127.0.0.1", 0)
+    ws_port = ws_server.serving.sockets[0].getsockname()[1]
+
+    loop = asyncio.get_running_loop()
+    async with aiohttp.ClientSession() as session, \
+            websockets.connect(f"ws://127.0.0.1:{ws_port}") as client:
+        request = asyncio.create_task(session.post(f"http://127.0.0.1:{api_port}/upload"))
+        await started.wait()
+        await registered.wait()
+        ws_server.publish_view("abc", 1)
+
+        start = loop.time()
+        await shutdown_services(runner, grpc_server, IngestPipeline(), [], ws_server)
+        elapsed = loop.time() - start
+
+        message = json.loads(await client.recv())
+        with pytest.raises(websockets.ConnectionClosed):
+            await client.recv()
+        with pytest.raises(aiohttp.ClientError):
+            await request
+
+    assert elapsed < 1.5
+    assert message == {"type": "views_updated", "views": {"abc": 1}}
+    assert client.close_code == 1001
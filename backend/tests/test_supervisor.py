@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from aiohttp import web
+
+from config import settings
+from grpc_server import server_options
+from supervisor import Supervisor, WorkerProcess
+from websocket_server import WebSocketRelay, WebSocketServer
+
+
+class FakeProcess:
+    def __init__(self, pid, alive=True, exitcode=None):
+        self.pid = pid
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.alive
+
+    def kill(self):
+        self.alive = False
+
+    def join(self, timeout=None):
+        self.joined_in = threading.current_thread()
+
+
+@pytest.mark.asyncio
+async def test_relay_forwards_worker_events():
+    """SV-001: worker 發布的 websocket 事件經 queue 轉送給 supervisor 的 WebSocketServer"""
+    queue = []
+    relay = WebSocketRelay(type("Queue", (), {"put": staticmethod(queue.append)}))
+    relay.publish_video_deleted("abc")
+    relay.publish_view("abc", 3)
+
+    ws_server = WebSocketServer()
+    sent = []
+
+    class Connection:
+        async def send(self, data):
+            sent.append(json.loads(data))
+
+    ws_server.connections.add(Connection())
+    for message in queue:
+        ws_server.handle_relayed(message)
+    await asyncio.gather(*ws_server._event_tasks)
+    # flush 會取消排程中的 _flush_views_later 並立即送出觀看次數
+    await ws_server.flush()
+
+    assert sent == [
+        {"type": "video_deleted", "video_id": "abc"},
+        {"type": "views_updated", "views": {"abc": 3}},
+    ]
+
+
+def test_check_workers_detects_failures(monkeypatch):
+    """SV-002: 結束、啟動逾時與心跳逾時的 worker 會被重新啟動, 正常回報心跳的不會"""
+    monkeypatch.setattr(settings, "worker_startup_timeout_seconds", 30)
+    monkeypatch.setattr(settings, "worker_heartbeat_timeout_ms", 5000)
+    supervisor = Supervisor(4)
+    workers = {
+        0: WorkerProcess(0, FakeProcess(100)),
+        1: WorkerProcess(1, FakeProcess(101, alive=False, exitcode=1)),
+        2: WorkerProcess(2, FakeProcess(102)),
+        3: WorkerProcess(3, FakeProcess(103)),
+    }
+    for worker in workers.values():
+        supervisor.slots[worker.slot] = worker
+        supervisor._by_pid[worker.pid] = worker
+    supervisor.handle_message(("ready", 100))
+    supervisor.handle_message(("ready", 103))
+    supervisor.handle_message(("heartbeat", 100, 0.002))
+    now = workers[0].last_heartbeat
+
+    assert supervisor.check_workers(now + 1) == [1]
+    assert workers[0].lag == 0.002
+    # worker 2 一直沒有 ready, worker 3 ready 之後沒有心跳
+    workers[3].last_heartbeat = now - 10
+    assert supervisor.check_workers(now + 4) == [1, 3]
+    workers[2].started_at = now - 60
+    assert supervisor.check_workers(now + 4) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_restart_joins_workers_off_the_event_loop(monkeypatch):
+    """SV-004: 重新啟動 worker 時在 executor 中等待舊 process 結束, 不阻塞 supervisor 的 event loop"""
+    supervisor = Supervisor(1)
+    old = WorkerProcess(0, FakeProcess(100))
+    supervisor.slots[0] = old
+    supervisor._by_pid[old.pid] = old
+    replacement = WorkerProcess(0, FakeProcess(101))
+    monkeypatch.setattr(supervisor, "spawn", lambda slot: replacement)
+
+    await supervisor.restart(0)
+
+    assert not old.process.alive
+    assert old.process.joined_in is not threading.main_thread()
+    assert supervisor.slots[0] is replacement
+    assert 100 not in supervisor._by_pid
+
+
+@pytest.mark.asyncio
+async def test_workers_share_ports():
+    """SV-003: multi-worker 模式下 REST 與 gRPC 以 SO_REUSEPORT 共用 port"""
+    runners = []
+    port = 0
+    try:
+        for _ in range(2):
+            runner = web.AppRunner(web.Application())
+            await runner.setup()
+            runners.append(runner)
+            site = web.TCPSite(runner, "127.0.0.1", port, reuse_port=True)
+            await site.start()
+            port = runner.addresses[0][1]
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+    assert len(runners) == 2
+    assert ("grpc.so_reuseport", 1) in server_options(reuse_port=True)
+    assert ("grpc.so_reuseport", 0) in server_options()
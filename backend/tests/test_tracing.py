@@ -0,0 +1,140 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import grpc
+import pytest
+from aiohttp import web
+
+import video_service_pb2
+import video_service_pb2_grpc
+from grpc_server import VideoService, add_video_service
+from tracing import (
+    TRACER,
+    InMemoryExporter,
+    MongoCommandTracer,
+    TracingInterceptor,
+    parse_traceparent,
+    tracing_middleware,
+)
+from websocket_server import WebSocketServer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemoryExporter()
+    TRACER.configure(exporter)
+    yield exporter
+    TRACER.configure(None)
+
+
+def test_parse_traceparent():
+    """TR-001: 解析 W3C traceparent, 格式錯誤或全為 0 時忽略"""
+    context = parse_traceparent(PARENT)
+
+    assert context.trace_id == TRACE_ID
+    assert context.span_id == "00f067aa0ba902b7"
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+    assert parse_traceparent(None) is None
+
+
+@pytest.mark.asyncio
+async def test_middleware_continues_incoming_trace(aiohttp_client, exporter):
+    """TR-002: REST 請求延續 traceparent, 子 span 與 MongoDB 指令掛在請求之下"""
+    listener = MongoCommandTracer()
+
+    async def handler(request):
+        if request.match_info["video_id"] == "missing":
+            raise web.HTTPNotFound()
+        with TRACER.span("videos.serialize"):
+            event = SimpleNamespace(request_id=1, command_name="find",
+                                    database_name="video_platform",
+                                    command={"find": "videos"})
+            listener.started(event)
+            listener.succeeded(event)
+        return web.Response(text="ok")
+
+    app = web.Application(middlewares=[tracing_middleware])
+    app.router.add_get("/demo/{video_id}", handler)
+    client = await aiohttp_client(app)
+
+    res = await client.get("/demo/a", headers={"traceparent": PARENT})
+    missing = await client.get("/demo/missing")
+
+    [server, other] = exporter.by_name("GET /demo/{video_id}")
+    [serialize] = exporter.by_name("videos.serialize")
+    [find] = exporter.by_name("mongodb.find")
+    assert server.trace_id == TRACE_ID
+    assert server.parent_id == "00f067aa0ba902b7"
+    assert server.kind == "SERVER"
+    assert serialize.parent_id == server.span_id
+    assert find.parent_id == serialize.span_id
+    assert find.attributes["db.mongodb.collection"] == "videos"
+    assert res.headers["traceparent"] == server.traceparent()
+    # 404 是正常回應, 新的 trace 且不標記為錯誤
+    assert missing.status == 404
+    assert other.trace_id != TRACE_ID
+    assert other.attributes["http.status_code"] == 404
+    assert other.status == "UNSET"
+
+
+def test_spans_need_a_parent_outside_requests(exporter):
+    """TR-003: 沒有上層 span 的背景工作不產生 span"""
+    listener = MongoCommandTracer()
+    event = SimpleNamespace(request_id=2, command_name="getMore",
+                            database_name="video_platform", command={"getMore": 1})
+
+    listener.started(event)
+    listener.succeeded(event)
+    with TRACER.span("storage.write") as span:
+        pass
+
+    assert not span.recording
+    assert exporter.spans == []
+
+
+@pytest.mark.asyncio
+async def test_grpc_and_websocket_propagation(monkeypatch, tmp_path, exporter):
+    """TR-004: gRPC 呼叫延續 traceparent metadata, websocket 事件帶有請求的 trace"""
+    monkeypatch.chdir(tmp_path)
+    server = grpc.aio.server(interceptors=[TracingInterceptor()])
+    add_video_service(VideoService(), server)
+    (tmp_path / "uploads" / "demo.mp4").write_bytes(b"x" * 1000)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+            stub = video_service_pb2_grpc.VideoServiceStub(channel)
+            call = stub.GetVideo(video_service_pb2.VideoRequest(video_id="demo"),
+                                 metadata=(("traceparent", PARENT),))
+            async for _ in call:
+                pass
+    finally:
+        await server.stop(grace=None)
+
+    [rpc] = exporter.by_name("video.VideoService/GetVideo")
+    [read] = exporter.by_name("storage.read")
+    assert rpc.trace_id == TRACE_ID
+    assert rpc.attributes["rpc.grpc.status_code"] == "OK"
+    assert read.parent_id == rpc.span_id
+    assert read.attributes["file.bytes"] == 1000
+
+    ws_server = WebSocketServer()
+    sent = []
+
+    class Connection:
+        async def send(self, data):
+            sent.append(json.loads(data))
+
+    ws_server.connections.add(Connection())
+    with TRACER.span("POST /api/videos", "SERVER") as request_span:
+        ws_server.publish_video_deleted("abc")
+    await asyncio.gather(*ws_server._event_tasks)
+
+    assert sent[0]["traceparent"] == request_span.traceparent()
+    [send] = exporter.by_name("websocket.send")
+    assert send.parent_id == request_span.span_id
@@ -0,0 +1,232 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+
+import auth
+from auth import create_access_token
+from chat_history import ChatHistory
+from config import settings
+from websocket_server import WebSocketServer
+
+
+class FakeWebSocket:
+    """模擬 websockets 連線, 記錄送出的 frame"""
+
+    def __init__(self, incoming=None):
+        self.sent = []
+        self.closed = None
+        self.request_headers = {}
+        self._incoming = list(incoming or [])
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=""):
+        self.closed = (code, reason)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._incoming:
+            raise StopAsyncIteration
+        return self._incoming.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_to_room_without_batching():
+    """WS-001: 預設模式下每則訊息各送出一個 frame"""
+    server = WebSocketServer(batch_interval=0)
+    ws = FakeWebSocket()
+    await server.register(ws, "u1", "room-a")
+
+    await server.broadcast_to_room("room-a", {"type": "chat", "message": "1"})
+    await server.broadcast_to_room("room-a", {"type": "chat", "message": "2"})
+
+    assert [json.loads(f)["message"] for f in ws.sent] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_to_room_with_batching():
+    """WS-002: 批次模式下同一個 tick 內的訊息合併為單一 JSON 陣列"""
+    server = WebSocketServer(batch_interval=0.01)
+    ws_a = FakeWebSocket()
+    ws_b = FakeWebSocket()
+    await server.register(ws_a, "u1", "room-a")
+    await server.register(ws_b, "u2", "room-b")
+
+    for i in range(3):
+        await server.broadcast_to_room("room-a", {"type": "chat", "message": str(i)})
+    assert ws_a.sent == []
+
+    await asyncio.sleep(0.05)
+
+    assert len(ws_a.sent) == 1
+    assert [m["message"] for m in json.loads(ws_a.sent[0])] == ["0", "1", "2"]
+    assert ws_b.sent == []
+
+
+@pytest.mark.asyncio
+async def test_flush_sends_pending_batches():
+    """WS-003: flush 立即送出尚未到期的批次"""
+    server = WebSocketServer(batch_interval=10)
+    ws = FakeWebSocket()
+    await server.register(ws, "u1", "room-a")
+
+    await server.broadcast_to_room("room-a", {"type": "chat", "message": "x"})
+    await server.flush()
+
+    assert len(ws.sent) == 1
+    assert json.loads(ws.sent[0]) == [{"type": "chat", "message": "x"}]
+
+
+@pytest.mark.asyncio
+async def test_handler_chat_goes_to_room():
+    """WS-004: handler 依 room 參數轉發聊天訊息"""
+    server = WebSocketServer(batch_interval=0)
+    listener = FakeWebSocket()
+    await server.register(listener, "u2", "premiere")
+    sender = FakeWebSocket([json.dumps({"type": "chat", "message": "hi"})])
+
+    token = create_access_token({"sub": "u1"})
+    await server.handler(sender, f"/ws?room=premiere&token={token}")
+
+    frames = [json.loads(f) for f in listener.sent]
+    assert frames[-1]["message"] == "hi"
+    assert frames[-1]["user_id"] == "u1"
+    assert sender not in server.connections
+
+
+@pytest.mark.asyncio
+async def test_handler_sends_chat_history_on_connect():
+    """WS-005: 新連線加入時先收到房間最近的聊天紀錄"""
+    server = WebSocketServer(batch_interval=0, history=ChatHistory(size=2, persist=False))
+    for i in range(3):
+        server.history.append("premiere", {"type": "chat", "message": str(i)})
+    viewer = FakeWebSocket()
+
+    token = create_access_token({"sub": "u3"})
+    await server.handler(viewer, f"/ws?room=premiere&token={token}")
+
+    backlog = json.loads(viewer.sent[0])
+    assert backlog["type"] == "chat_history"
+    assert [m["message"] for m in backlog["messages"]] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_chat_history_persists_in_batches():
+    """WS-006: 聊天紀錄以 insert_many 批次寫入, 不會每則訊息各寫一次"""
+    history = ChatHistory(size=10, persist=True)
+    with mock.patch("chat_history.get_database") as mock_db:
+        collection = mock_db.return_value.__getitem__.return_value
+        collection.insert_many = mock.AsyncMock()
+
+        for i in range(5):
+            history.append("premiere", {"type": "chat", "message": str(i)})
+        await history.flush()
+
+        collection.insert_many.assert_awaited_once()
+        batch = collection.insert_many.await_args.args[0]
+        assert [m["message"] for m in batch] == ["0", "1", "2", "3", "4"]
+        assert all(m["room"] == "premiere" for m in batch)
+        assert "room" not in history.recent("premiere")[0]
+
+
+@pytest.mark.asyncio
+async def test_handler_rejects_missing_token():
+    """WS-007: 沒有 token 時關閉連線, 不信任 URL 中的 user_id"""
+    server = WebSocketServer(batch_interval=0)
+    ws = FakeWebSocket([json.dumps({"type": "chat", "message": "hi"})])
+
+    await server.handler(ws, "/ws/someone-else")
+
+    assert ws.closed[0] == 1008
+    assert "someone-else" not in server.users
+    assert ws not in server.connections
+
+
+@pytest.mark.asyncio
+async def test_process_request_enforces_token_and_connection_cap():
+    """WS-008: 握手時驗證 JWT 並限制每位使用者的連線數"""
+    server = WebSocketServer(batch_interval=0)
+    token = create_access_token({"sub": "u1"})
+
+    status, _, _ = await server.process_request("/ws?token=bad", {})
+    assert status == 401
+
+    assert await server.process_request(f"/ws?token={token}", {}) is None
+    assert await server.process_request(
+        "/ws", {"Authorization": f"Bearer {token}"}
+    ) is None
+
+    for i in range(settings.websocket_max_connections_per_user):
+        await server.register(FakeWebSocket(), "u1")
+    status, _, _ = await server.process_request(f"/ws?token={token}", {})
+    assert status == 429
+
+
+def test_decode_access_token_uses_claims_cache(mocker):
+    """WS-009: 同一個 token 重複連線時不重新驗證簽章"""
+    token = create_access_token({"sub": "u-cache"})
+    auth._claims_cache.pop(token, None)
+    spy = mocker.spy(auth.jwt, "decode")
+
+    for _ in range(3):
+        assert auth.decode_access_token(token)["sub"] == "u-cache"
+
+    assert spy.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_view_events_are_coalesced(mocker):
+    """WS-010: 同一段時間內的觀看次數合併為一個 views_updated 事件"""
+    mocker.patch.object(settings, "view_event_interval_ms", 10)
+    server = WebSocketServer(batch_interval=0)
+    ws = FakeWebSocket()
+    await server.register(ws, "u1")
+
+    for video_id in ["a", "a", "b", "a"]:
+        server.publish_view(video_id)
+    await asyncio.sleep(0.05)
+
+    assert len(ws.sent) == 1
+    assert json.loads(ws.sent[0]) == {"type": "views_updated", "views": {"a": 3, "b": 1}}
+
+    # 不留下尚未結束的 _flush_views_later task
+    await server.flush()
+    assert server._view_flush_task is None
+
+
+@pytest.mark.asyncio
+async def test_chat_history_load_is_shared_and_retried():
+    """WS-011: 同時加入的連線等待同一次讀取; 讀取失敗時不標記為已載入, 下次加入會重試"""
+    history = ChatHistory(size=10, persist=True)
+    release = asyncio.Event()
+    stored = [{"type": "chat", "message": "old"}]
+    calls = []
+
+    async def to_list(length):
+        calls.append(length)
+        if len(calls) == 1:
+            raise RuntimeError("connection reset")
+        await release.wait()
+        return list(stored)
+
+    with mock.patch("chat_history.get_database") as mock_db:
+        collection = mock_db.return_value.__getitem__.return_value
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = to_list
+
+        await history.load("premiere")
+        assert history.recent("premiere") == []
+
+        joiners = [asyncio.create_task(history.load("premiere")) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert not any(joiner.done() for joiner in joiners)
+        release.set()
+        await asyncio.gather(*joiners)
+        await history.load("premiere")
+
+    assert len(calls) == 2
+    assert [m["message"] for m in history.recent("premiere")] == ["old"]
@@ -0,0 +1,337 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import grpc
+from aiohttp import web
+from pymongo import monitoring
+
+from metrics import route_label, status_name
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    """與 OpenTelemetry 相同欄位的 span; 結束時交給 tracer 的 exporter"""
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 kind: str = "INTERNAL", attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message: Optional[str] = None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.set_status("ERROR", str(exc))
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            self.tracer.export(self)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class NonRecordingSpan(Span):
+    """tracing 關閉或沒有上層 span 時使用, 所有操作都不做事"""
+
+    recording = False
+
+    def __init__(self):
+        self.trace_id = self.span_id = ""
+        self.attributes = {}
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class InMemoryExporter:
+    """保留結束的 span, 供測試檢查"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def by_name(self, name: str) -> List[Span]:
+        with self._lock:
+            return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class LoggingExporter:
+    """每個 span 輸出一筆 log (JSON 格式時 span 欄位會完整保留)
+
+    依 trace id 取樣 (見 logging_config.SamplingFilter), 同一個 trace 的 span 一起保留或捨棄。
+    """
+
+    def export(self, span: Span):
+        logger.info("span %s %.3fms", span.name, span.duration * 1000,
+                    extra={"span": span.to_dict(), "sample_key": span.trace_id})
+
+
+EXPORTERS = {"log": LoggingExporter, "memory": InMemoryExporter}
+
+
+class Tracer:
+    """只有 SERVER span (REST / gRPC 請求) 會開始新的 trace, 其他 span 必須有上層 span;
+    背景工作 (change stream、reaper) 的 MongoDB 指令因此不會產生大量孤立的 trace。
+    """
+
+    def __init__(self):
+        self.exporter = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def configure(self, exporter):
+        self.exporter = exporter
+
+    def export(self, span: Span):
+        exporter = self.exporter
+        if exporter is not None:
+            try:
+                exporter.export(span)
+            except Exception:
+                logger.exception("Error exporting span")
+
+    def start_span(self, name: str, kind: str = "INTERNAL",
+                   attributes: Optional[Dict[str, Any]] = None,
+                   parent: Union[Span, SpanContext, None] = None) -> Span:
+        if not self.enabled:
+            return NON_RECORDING_SPAN
+        if parent is None:
+            parent = current_span.get()
+        if parent is not None and parent.trace_id:
+            return Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+        if kind != "SERVER":
+            return NON_RECORDING_SPAN
+        return Span(self, name, os.urandom(16).hex(), None, kind, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "INTERNAL",
+             attributes: Optional[Dict[str, Any]] = None,
+             parent: Union[Span, SpanContext, None] = None) -> Iterator[Span]:
+        span = self.start_span(name, kind, attributes, parent)
+        if not span.recording:
+            yield span
+            return
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            try:
+                current_span.reset(token)
+            except ValueError:
+                # async generator 可能在其他 context 中被關閉, 該 context 不受影響
+                pass
+            span.end()
+
+
+TRACER = Tracer()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """解析 W3C traceparent header, 格式不正確時回傳 None"""
+    match = _TRACEPARENT.match((header or "").strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, _ = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id)
+
+
+def current_traceparent() -> Optional[str]:
+    span = current_span.get()
+    return span.traceparent() if span is not None else None
+
+
+@web.middleware
+async def tracing_middleware(request: web.Request, handler):
+    parent = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+    name = f"{request.method} {route_label(request)}"
+    attributes = {"http.method": request.method, "http.target": request.path}
+    error = None
+    with TRACER.span(name, "SERVER", attributes, parent=parent) as span:
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            # 4xx 等 HTTP 例外是正常的回應, 不當成 span 的例外記錄
+            error = response = e
+        span.set_attribute("http.status_code", response.status)
+        if response.status >= 500:
+            span.set_status("ERROR")
+        if span.recording:
+            response.headers[TRACEPARENT_HEADER] = span.traceparent()
+    if error is not None:
+        raise error
+    return response
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """MongoDB 指令的 CLIENT span; Motor 在 executor 執行緒上呼叫時會帶著複製的 contextvars"""
+
+    def __init__(self):
+        self._spans: Dict[Tuple[int, str], Span] = {}
+
+    def started(self, event):
+        span = TRACER.start_span(f"mongodb.{event.command_name}", "CLIENT", {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+        })
+        if span.recording:
+            collection = event.command.get(event.command_name)
+            if isinstance(collection, str):
+                span.set_attribute("db.mongodb.collection", collection)
+            self._spans[(event.request_id, event.command_name)] = span
+
+    def succeeded(self, event):
+        span = self._spans.pop((event.request_id, event.command_name), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event):
+        span = self._spans.pop((event.request_id, event.command_name), None)
+        if span is not None:
+            span.set_status("ERROR", str(event.failure.get("errmsg", "")))
+            span.end()
+
+
+def _grpc_parent(handler_call_details) -> Optional[SpanContext]:
+    for key, value in handler_call_details.invocation_metadata or ():
+        if key == TRACEPARENT_HEADER:
+            return parse_traceparent(value)
+    return None
+
+
+class TracingInterceptor(grpc.aio.ServerInterceptor):
+    """每個 gRPC 呼叫一個 SERVER span, 上層 trace 取自 traceparent metadata"""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        attributes = {
+            "rpc.system": "grpc",
+            "rpc.service": method.strip("/").rsplit("/", 1)[0],
+            "rpc.method": method.rsplit("/", 1)[-1],
+        }
+
+        def start():
+            return TRACER.span(method.strip("/"), "SERVER", attributes,
+                               parent=_grpc_parent(handler_call_details))
+
+        def finish(span, context, failed):
+            code = status_name(context, failed)
+            span.set_attribute("rpc.grpc.status_code", code)
+            if code != "OK":
+                span.set_status("ERROR")
+
+        if handler.unary_unary or handler.stream_unary:
+            behavior = handler.unary_unary or handler.stream_unary
+
+            async def unary_response(request, context):
+                with start() as span:
+                    failed = True
+                    try:
+                        response = await behavior(request, context)
+                        failed = False
+                        return response
+                    finally:
+                        finish(span, context, failed)
+
+            field = "unary_unary" if handler.unary_unary else "stream_unary"
+            return handler._replace(**{field: unary_response})
+
+        behavior = handler.unary_stream or handler.stream_stream
+
+        async def stream_response(request, context):
+            with start() as span:
+                failed = True
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                    failed = False
+                finally:
+                    finish(span, context, failed)
+
+        field = "unary_stream" if handler.unary_stream else "stream_stream"
+        return handler._replace(**{field: stream_response})
@@ -0,0 +1,123 @@
+import logging
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from reaper import NOT_DELETED
+from tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+async def resolve_uploader(db, video: dict) -> Optional[str]:
+    if "uploader_username" in video:
+        # 新文件已存有上傳者名稱, 不需再查 users
+        return video["uploader_username"]
+
+    # 尚未執行 backfill 的舊文件
+    uploader = None
+    uploader_id = video["uploader_id"]
+
+    # 處理有效的 ObjectId
+    if isinstance(uploader_id, str) and uploader_id != "default_user_id":
+        try:
+            uploader = await db.users.find_one({"_id": ObjectId(uploader_id)})
+        except:
+            pass
+    return uploader["username"] if uploader else None
+
+
+async def summarize_video(db, video: dict) -> dict:
+    """REST 與 gRPC 共用的影片摘要格式"""
+    uploader_name = await resolve_uploader(db, video)
+    metadata = video.get("metadata") or {}
+    return {
+        "id": video["_id"],
+        "title": video["title"],
+        "description": video.get("description", ""),
+        "file_path": video["file_path"],
+        "uploader": uploader_name or "Unknown",
+        "views": video["views"],
+        "duration": metadata.get("duration"),
+    }
+
+
+async def summarize_videos(db, video_list: List[dict]) -> List[dict]:
+    videos = []
+    for video in video_list:
+        try:
+            videos.append(await summarize_video(db, video))
+        except Exception as e:
+            logger.error("Error processing video %s: %s", video.get("_id"), e)
+            continue
+    return videos
+
+
+async def list_videos(db) -> List[dict]:
+    video_list = await db.videos.find(NOT_DELETED).to_list(length=None)
+    # 上傳者名稱的 join (舊文件才會查 users)
+    with TRACER.span("videos.summarize", attributes={"videos.count": len(video_list)}):
+        return await summarize_videos(db, video_list)
+
+
+async def iter_video_pages(db, page_size: int,
+                           after: Optional[ObjectId] = None
+                           ) -> AsyncIterator[Tuple[List[dict], ObjectId]]:
+    """依 _id 以 keyset 分頁逐頁回傳 (影片, 下一頁的起點), 不使用 skip, 深層分頁也不會變慢"""
+    while True:
+        query = dict(NOT_DELETED)
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        video_list = await db.videos.find(query).sort("_id", 1).to_list(length=page_size)
+        if not video_list:
+            return
+        after = video_list[-1]["_id"]
+        yield await summarize_videos(db, video_list), after
+        if len(video_list) < page_size:
+            return
+
+
+async def get_video_info(db, video_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(video_id):
+        return None
+    video = await db.videos.find_one({"_id": ObjectId(video_id), **NOT_DELETED})
+    if video is None:
+        return None
+    return await summarize_video(db, video)
+
+
+async def increment_view(db, video_id: str) -> bool:
+    # 已軟刪除的影片與不存在相同, 不再累加觀看次數
+    result = await db.videos.update_one(
+        {"_id": ObjectId(video_id), **NOT_DELETED}, {"$inc": {"views": 1}}
+    )
+    return result.modified_count > 0
+
+
+async def increment_views(db, video_ids: List[str]) -> Tuple[Dict[str, int], int]:
+    """一批 id 合併成每部影片一個 $inc, 以單次 bulk_write 寫入; 無效的 id 略過
+
+    回傳 (每部影片增加的次數, 實際存在的影片數); 次數只包含存在且未刪除的影片。
+    """
+    counts = Counter(str(ObjectId(video_id)) for video_id in video_ids
+                     if ObjectId.is_valid(video_id))
+    if not counts:
+        return {}, 0
+    # bulk_write 不會回報哪些 id 有對應的影片, 先查出存在的影片, 不存在的 id 不發布 views_updated
+    live = await db.videos.find(
+        {"_id": {"$in": [ObjectId(video_id) for video_id in counts]}, **NOT_DELETED},
+        {"_id": 1},
+    ).to_list(length=None)
+    live_ids = {str(video["_id"]) for video in live}
+    counts = Counter({video_id: count for video_id, count in counts.items()
+                      if video_id in live_ids})
+    if not counts:
+        return {}, 0
+    result = await db.videos.bulk_write(
+        [UpdateOne({"_id": ObjectId(video_id), **NOT_DELETED}, {"$inc": {"views": count}})
+         for video_id, count in counts.items()],
+        ordered=False,
+    )
+    return dict(counts), result.matched_count
@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x13video_service.proto\x12\x05video\"/\n\nVideoChunk\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\x12\x10\n\x08video_id\x18\x02 \x01(\t\" \n\x0cVideoRequest\x12\x10\n\x08video_id\x18\x01 \x01(\t\"D\n\x0eUploadResponse\x12\x10\n\x08video_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x0f\n\x07message\x18\x03 \x01(\t2\x7f\n\x0cVideoService\x12\x39\n\x0bUploadVideo\x12\x11.video.VideoChunk\x1a\x15.video.UploadResponse(\x01\x12\x34\n\x08GetVideo\x12\x13.video.VideoRequest\x1a\x11.video.VideoChunk0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x13video_service.proto\x12\x05video\"/\n\nVideoChunk\x12\x0f\n\x07\x63ontent\x18\x01 \x01(\x0c\x12\x10\n\x08video_id\x18\x02 \x01(\t\" \n\x0cVideoRequest\x12\x10\n\x08video_id\x18\x01 \x01(\t\"D\n\x0eUploadResponse\x12\x10\n\x08video_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x0f\n\x07message\x18\x03 \x01(\t\"\x81\x01\n\tVideoInfo\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05title\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\x11\n\tfile_path\x18\x04 \x01(\t\x12\x10\n\x08uploader\x18\x05 \x01(\t\x12\r\n\x05views\x18\x06 \x01(\x03\x12\x10\n\x08\x64uration\x18\x07 \x01(\x01\":\n\x11ListVideosRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\x12\n\npage_token\x18\x02 \x01(\t\"F\n\tVideoPage\x12 \n\x06videos\x18\x01 \x03(\x0b\x32\x10.video.VideoInfo\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"\x1e\n\tViewBatch\x12\x11\n\tvideo_ids\x18\x01 \x03(\t\";\n\x16IncrementViewsResponse\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x03\x12\x0f\n\x07updated\x18\x02 \x01(\x03\"W\n\x1c\x43reateMultipartUploadRequest\x12\x10\n\x08video_id\x18\x01 \x01(\t\x12\x12\n\ntotal_size\x18\x02 \x01(\x03\x12\x11\n\tpart_size\x18\x03 \x01(\x03\"Y\n\x1d\x43reateMultipartUploadResponse\x12\x11\n\tupload_id\x18\x01 \x01(\t\x12\x11\n\tpart_size\x18\x02 \x01(\x03\x12\x12\n\npart_count\x18\x03 \x01(\x05\"D\n\tPartChunk\x12\x11\n\tupload_id\x18\x01 \x01(\t\x12\x13\n\x0bpart_number\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\x0c\"G\n\x12UploadPartResponse\x12\x13\n\x0bpart_number\x18\x01 \x01(\x05\x12\x0e\n\x06sha256\x18\x02 \x01(\t\x12\x0c\n\x04size\x18\x03 \x01(\x03\"4\n\rCompletedPart\x12\x13\n\x0bpart_number\x18\x01 \x01(\x05\x12\x0e\n\x06sha256\x18\x02 \x01(\t\"X\n\x1e\x43ompleteMultipartUploadRequest\x12\x11\n\tupload_id\x18\x01 \x01(\t\x12#\n\x05parts\x18\x02 \x03(\x0b\x32\x14.video.CompletedPart\"0\n\x1b\x41\x62ortMultipartUploadRequest\x12\x11\n\tupload_id\x18\x01 \x01(\t2\x84\x05\n\x0cVideoService\x12\x39\n\x0bUploadVideo\x12\x11.video.VideoChunk\x1a\x15.video.UploadResponse(\x01\x12\x34\n\x08GetVideo\x12\x13.video.VideoRequest\x1a\x11.video.VideoChunk0\x01\x12:\n\nListVideos\x12\x18.video.ListVideosRequest\x1a\x10.video.VideoPage0\x01\x12\x35\n\x0cGetVideoInfo\x12\x13.video.VideoRequest\x1a\x10.video.VideoInfo\x12\x43\n\x0eIncrementViews\x12\x10.video.ViewBatch\x1a\x1d.video.IncrementViewsResponse(\x01\x12\x62\n\x15\x43reateMultipartUpload\x12#.video.CreateMultipartUploadRequest\x1a$.video.CreateMultipartUploadResponse\x12;\n\nUploadPart\x12\x10.video.PartChunk\x1a\x19.video.UploadPartResponse(\x01\x12W\n\x17\x43ompleteMultipartUpload\x12%.video.CompleteMultipartUploadRequest\x1a\x15.video.UploadResponse\x12Q\n\x14\x41\x62ortMultipartUpload\x12\".video.AbortMultipartUploadRequest\x1a\x15.video.UploadResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -26,6 +26,30 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_VIDEOREQUEST']._serialized_end=111
   _globals['_UPLOADRESPONSE']._serialized_start=113
   _globals['_UPLOADRESPONSE']._serialized_end=181
-  _globals['_VIDEOSERVICE']._serialized_start=183
-  _globals['_VIDEOSERVICE']._serialized_end=310
+  _globals['_VIDEOINFO']._serialized_start=184
+  _globals['_VIDEOINFO']._serialized_end=313
+  _globals['_LISTVIDEOSREQUEST']._serialized_start=315
+  _globals['_LISTVIDEOSREQUEST']._serialized_end=373
+  _globals['_VIDEOPAGE']._serialized_start=375
+  _globals['_VIDEOPAGE']._serialized_end=445
+  _globals['_VIEWBATCH']._serialized_start=447
+  _globals['_VIEWBATCH']._serialized_end=477
+  _globals['_INCREMENTVIEWSRESPONSE']._serialized_start=479
+  _globals['_INCREMENTVIEWSRESPONSE']._serialized_end=538
+  _globals['_CREATEMULTIPARTUPLOADREQUEST']._serialized_start=540
+  _globals['_CREATEMULTIPARTUPLOADREQUEST']._serialized_end=627
+  _globals['_CREATEMULTIPARTUPLOADRESPONSE']._serialized_start=629
+  _globals['_CREATEMULTIPARTUPLOADRESPONSE']._serialized_end=718
+  _globals['_PARTCHUNK']._serialized_start=720
+  _globals['_PARTCHUNK']._serialized_end=788
+  _globals['_UPLOADPARTRESPONSE']._serialized_start=790
+  _globals['_UPLOADPARTRESPONSE']._serialized_end=861
+  _globals['_COMPLETEDPART']._serialized_start=863
+  _globals['_COMPLETEDPART']._serialized_end=915
+  _globals['_COMPLETEMULTIPARTUPLOADREQUEST']._serialized_start=917
+  _globals['_COMPLETEMULTIPARTUPLOADREQUEST']._serialized_end=1005
+  _globals['_ABORTMULTIPARTUPLOADREQUEST']._serialized_start=1007
+  _globals['_ABORTMULTIPARTUPLOADREQUEST']._serialized_end=1055
+  _globals['_VIDEOSERVICE']._serialized_start=1058
+  _globals['_VIDEOSERVICE']._serialized_end=1702
 # @@protoc_insertion_point(module_scope)
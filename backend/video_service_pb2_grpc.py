@@ -24,6 +24,41 @@ class VideoServiceStub(object):
                 request_serializer=video__service__pb2.VideoRequest.SerializeToString,
                 response_deserializer=video__service__pb2.VideoChunk.FromString,
                 )
+        self.ListVideos = channel.unary_stream(
+                '/video.VideoService/ListVideos',
+                request_serializer=video__service__pb2.ListVideosRequest.SerializeToString,
+                response_deserializer=video__service__pb2.VideoPage.FromString,
+                )
+        self.GetVideoInfo = channel.unary_unary(
+                '/video.VideoService/GetVideoInfo',
+                request_serializer=video__service__pb2.VideoRequest.SerializeToString,
+                response_deserializer=video__service__pb2.VideoInfo.FromString,
+                )
+        self.IncrementViews = channel.stream_unary(
+                '/video.VideoService/IncrementViews',
+                request_serializer=video__service__pb2.ViewBatch.SerializeToString,
+                response_deserializer=video__service__pb2.IncrementViewsResponse.FromString,
+                )
+        self.CreateMultipartUpload = channel.unary_unary(
+                '/video.VideoService/CreateMultipartUpload',
+                request_serializer=video__service__pb2.CreateMultipartUploadRequest.SerializeToString,
+                response_deserializer=video__service__pb2.CreateMultipartUploadResponse.FromString,
+                )
+        self.UploadPart = channel.stream_unary(
+                '/video.VideoService/UploadPart',
+                request_serializer=video__service__pb2.PartChunk.SerializeToString,
+                response_deserializer=video__service__pb2.UploadPartResponse.FromString,
+                )
+        self.CompleteMultipartUpload = channel.unary_unary(
+                '/video.VideoService/CompleteMultipartUpload',
+                request_serializer=video__service__pb2.CompleteMultipartUploadRequest.SerializeToString,
+                response_deserializer=video__service__pb2.UploadResponse.FromString,
+                )
+        self.AbortMultipartUpload = channel.unary_unary(
+                '/video.VideoService/AbortMultipartUpload',
+                request_serializer=video__service__pb2.AbortMultipartUploadRequest.SerializeToString,
+                response_deserializer=video__service__pb2.UploadResponse.FromString,
+                )
 
 
 class VideoServiceServicer(object):
@@ -41,6 +76,51 @@ class VideoServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListVideos(self, request, context):
+        """與 REST API 相同的查詢, 以 keyset 分頁逐頁串流
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetVideoInfo(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def IncrementViews(self, request_iterator, context):
+        """客戶端批次送出觀看紀錄, 結束時回傳總數
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CreateMultipartUpload(self, request, context):
+        """分段上傳: 取得 upload_id 後各 part 可在不同 stream 上並行送出
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UploadPart(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CompleteMultipartUpload(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AbortMultipartUpload(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_VideoServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -54,6 +134,41 @@ def add_VideoServiceServicer_to_server(servicer, server):
                     request_deserializer=video__service__pb2.VideoRequest.FromString,
                     response_serializer=video__service__pb2.VideoChunk.SerializeToString,
             ),
+            'ListVideos': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListVideos,
+                    request_deserializer=video__service__pb2.ListVideosRequest.FromString,
+                    response_serializer=video__service__pb2.VideoPage.SerializeToString,
+            ),
+            'GetVideoInfo': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetVideoInfo,
+                    request_deserializer=video__service__pb2.VideoRequest.FromString,
+                    response_serializer=video__service__pb2.VideoInfo.SerializeToString,
+            ),
+            'IncrementViews': grpc.stream_unary_rpc_method_handler(
+                    servicer.IncrementViews,
+                    request_deserializer=video__service__pb2.ViewBatch.FromString,
+                    response_serializer=video__service__pb2.IncrementViewsResponse.SerializeToString,
+            ),
+            'CreateMultipartUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.CreateMultipartUpload,
+                    request_deserializer=video__service__pb2.CreateMultipartUploadRequest.FromString,
+                    response_serializer=video__service__pb2.CreateMultipartUploadResponse.SerializeToString,
+            ),
+            'UploadPart': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadPart,
+                    request_deserializer=video__service__pb2.PartChunk.FromString,
+                    response_serializer=video__service__pb2.UploadPartResponse.SerializeToString,
+            ),
+            'CompleteMultipartUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.CompleteMultipartUpload,
+                    request_deserializer=video__service__pb2.CompleteMultipartUploadRequest.FromString,
+                    response_serializer=video__service__pb2.UploadResponse.SerializeToString,
+            ),
+            'AbortMultipartUpload': grpc.unary_unary_rpc_method_handler(
+                    servicer.AbortMultipartUpload,
+                    request_deserializer=video__service__pb2.AbortMultipartUploadRequest.FromString,
+                    response_serializer=video__service__pb2.UploadResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'video.VideoService', rpc_method_handlers)
@@ -97,3 +212,122 @@ class VideoService(object):
             video__service__pb2.VideoChunk.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ListVideos(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/video.VideoService/ListVideos',
+            video__service__pb2.ListVideosRequest.SerializeToString,
+            video__service__pb2.VideoPage.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetVideoInfo(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/video.VideoService/GetVideoInfo',
+            video__service__pb2.VideoRequest.SerializeToString,
+            video__service__pb2.VideoInfo.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def IncrementViews(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/video.VideoService/IncrementViews',
+            video__service__pb2.ViewBatch.SerializeToString,
+            video__service__pb2.IncrementViewsResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CreateMultipartUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/video.VideoService/CreateMultipartUpload',
+            video__service__pb2.CreateMultipartUploadRequest.SerializeToString,
+            video__service__pb2.CreateMultipartUploadResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def UploadPart(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/video.VideoService/UploadPart',
+            video__service__pb2.PartChunk.SerializeToString,
+            video__service__pb2.UploadPartResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CompleteMultipartUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/video.VideoService/CompleteMultipartUpload',
+            video__service__pb2.CompleteMultipartUploadRequest.SerializeToString,
+            video__service__pb2.UploadResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def AbortMultipartUpload(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/video.VideoService/AbortMultipartUpload',
+            video__service__pb2.AbortMultipartUploadRequest.SerializeToString,
+            video__service__pb2.UploadResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -1,46 +1,279 @@
 import asyncio
 import datetime
 import json
+import time
 import websockets
-from typing import Set, Dict
+from collections import defaultdict
+from http import HTTPStatus
+from typing import Set, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+from jose import JWTError
+from auth import decode_access_token
 from config import settings
+from chat_history import ChatHistory
+from serialization import dumps_str
+from metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_FANOUT_DURATION, WEBSOCKET_MESSAGES
+from tracing import TRACER, current_traceparent
+
+DEFAULT_ROOM = "lobby"
+
+
+class WebSocketHub:
+    # 與 Database 相同, 讓 REST handler 取得目前執行中的 WebSocketServer
+    server: "WebSocketServer" = None
+
+
+def get_websocket_server() -> Optional["WebSocketServer"]:
+    return WebSocketHub.server
+
+
+class WebSocketRelay:
+    """multi-worker 模式的 worker 端, 提供與 WebSocketServer 相同的 publish 介面
+
+    websocket 連線都在 supervisor process 中, 事件經 multiprocessing queue 轉送過去。
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def publish_event(self, event: dict):
+        traceparent = current_traceparent()
+        if traceparent is not None:
+            event = {**event, 'traceparent': traceparent}
+        self.queue.put(('event', event))
+
+    def publish_video_created(self, video: dict):
+        self.publish_event({'type': 'video_created', 'video': video})
+
+    def publish_video_deleted(self, video_id: str):
+        self.publish_event({'type': 'video_deleted', 'video_id': video_id})
+
+    def publish_view(self, video_id: str, count: int = 1):
+        self.queue.put(('view', video_id, count))
+
 
 class WebSocketServer:
-    def __init__(self):
+    def __init__(self, batch_interval: Optional[float] = None,
+                 history: Optional[ChatHistory] = None):
         self.connections: Set[websockets.WebSocketServerProtocol] = set()
-        self.users: Dict[str, websockets.WebSocketServerProtocol] = {}
+        self.users: Dict[str, Set[websockets.WebSocketServerProtocol]] = defaultdict(set)
+        self.rooms: Dict[str, Set[websockets.WebSocketServerProtocol]] = defaultdict(set)
+
+        # 批次模式: 每個房間的訊息累積一個 tick 後以單一 JSON 陣列送出
+        # batch_interval 為 None 或 0 時維持原本一則訊息一個 frame 的行為
+        if batch_interval is None:
+            batch_interval = settings.websocket_batch_interval_ms / 1000
+        self.batch_interval = batch_interval
+        self._pending: Dict[str, List[dict]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+        # 每個房間最近的聊天紀錄, 新加入的連線會先收到這些訊息
+        self.history = history if history is not None else ChatHistory()
+
+        # 觀看次數事件: 一段時間內的增量合併成一個 views_updated 事件
+        self._view_deltas: Dict[str, int] = {}
+        self._view_flush_task: Optional[asyncio.Task] = None
+        self._event_tasks: Set[asyncio.Task] = set()
+
+        # websockets.serve 回傳的 server, 關閉時使用
+        self.serving: Optional[websockets.WebSocketServer] = None
 
-    async def register(self, websocket: websockets.WebSocketServerProtocol, user_id: str):
+    async def register(self, websocket: websockets.WebSocketServerProtocol, user_id: str,
+                       room: str = DEFAULT_ROOM):
         self.connections.add(websocket)
-        self.users[user_id] = websocket
+        WEBSOCKET_CONNECTIONS.inc()
+        self.users[user_id].add(websocket)
+        self.rooms[room].add(websocket)
 
-    async def unregister(self, websocket: websockets.WebSocketServerProtocol, user_id: str):
+    async def unregister(self, websocket: websockets.WebSocketServerProtocol, user_id: str,
+                         room: str = DEFAULT_ROOM):
         self.connections.remove(websocket)
-        self.users.pop(user_id, None)
+        WEBSOCKET_CONNECTIONS.dec()
+        sockets = self.users.get(user_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.users[user_id]
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(websocket)
+            if not members:
+                del self.rooms[room]
+
+    async def _send_all(self, conns, data: str, kind: str = "event"):
+        # 只序列化一次; 單一連線送出失敗不影響其他連線
+        if conns:
+            start = time.perf_counter()
+            with TRACER.span("websocket.send", attributes={"websocket.kind": kind,
+                                                           "websocket.recipients": len(conns)}):
+                await asyncio.gather(
+                    *[conn.send(data) for conn in conns], return_exceptions=True
+                )
+            WEBSOCKET_FANOUT_DURATION.observe(time.perf_counter() - start, kind)
+            WEBSOCKET_MESSAGES.inc(len(conns), kind)
 
     async def broadcast(self, message: dict):
-        if self.connections:
-            await asyncio.gather(
-                *[conn.send(json.dumps(message)) for conn in self.connections]
+        await self._send_all(list(self.connections), dumps_str(message))
+
+    async def broadcast_to_room(self, room: str, message: dict):
+        if not self.batch_interval:
+            await self._send_all(list(self.rooms.get(room, ())), dumps_str(message), "chat")
+            return
+
+        self._pending.setdefault(room, []).append(message)
+        if room not in self._flush_tasks:
+            self._flush_tasks[room] = asyncio.create_task(self._flush_later(room))
+
+    async def _flush_later(self, room: str):
+        try:
+            await asyncio.sleep(self.batch_interval)
+        finally:
+            self._flush_tasks.pop(room, None)
+        await self.flush_room(room)
+
+    async def flush_room(self, room: str):
+        batch = self._pending.pop(room, None)
+        if batch:
+            await self._send_all(list(self.rooms.get(room, ())), dumps_str(batch), "chat")
+
+    async def flush(self):
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        self._flush_tasks.clear()
+        for room in list(self._pending):
+            await self.flush_room(room)
+        if self._view_flush_task is not None:
+            self._view_flush_task.cancel()
+            self._view_flush_task = None
+        await self.flush_views()
+
+    def publish_event(self, event: dict):
+        # 事件帶上產生它的請求的 trace, 前端可據此關聯到對應的 API 呼叫
+        traceparent = current_traceparent()
+        if traceparent is not None:
+            event = {**event, 'traceparent': traceparent}
+        # REST handler 不等待 websocket 送出, 慢速連線不會拖慢 API 回應
+        task = asyncio.get_running_loop().create_task(self.broadcast(event))
+        self._event_tasks.add(task)
+        task.add_done_callback(self._event_tasks.discard)
+
+    def publish_video_created(self, video: dict):
+        self.publish_event({'type': 'video_created', 'video': video})
+
+    def publish_video_deleted(self, video_id: str):
+        self.publish_event({'type': 'video_deleted', 'video_id': video_id})
+
+    def stop_accepting(self):
+        # 只關閉 listening socket, 已建立的連線在 shutdown 時才關閉
+        if self.serving is not None:
+            self.serving.server.close()
+
+    async def shutdown(self):
+        """送出尚未送出的事件、批次與觀看次數並寫入聊天紀錄後, 以 1001 (going away) 關閉所有連線"""
+        self.stop_accepting()
+        if self._event_tasks:
+            await asyncio.gather(*self._event_tasks, return_exceptions=True)
+        await self.flush()
+        await self.history.stop()
+        if self.serving is not None:
+            self.serving.close()
+            await self.serving.wait_closed()
+
+    def handle_relayed(self, message: tuple):
+        # multi-worker 模式下由 supervisor 轉送 worker 發布的事件 (見 WebSocketRelay)
+        if message[0] == 'event':
+            self.publish_event(message[1])
+        elif message[0] == 'view':
+            self.publish_view(message[1], message[2])
+
+    def publish_view(self, video_id: str, count: int = 1):
+        self._view_deltas[video_id] = self._view_deltas.get(video_id, 0) + count
+        if self._view_flush_task is None:
+            self._view_flush_task = asyncio.get_running_loop().create_task(
+                self._flush_views_later()
             )
 
+    async def _flush_views_later(self):
+        try:
+            await asyncio.sleep(settings.view_event_interval_ms / 1000)
+        finally:
+            self._view_flush_task = None
+        await self.flush_views()
+
+    async def flush_views(self):
+        if not self._view_deltas:
+            return
+        deltas, self._view_deltas = self._view_deltas, {}
+        # views 中為各影片在這段時間內增加的次數, 客戶端直接累加
+        await self.broadcast({'type': 'views_updated', 'views': deltas})
+
     async def send_to_user(self, user_id: str, message: dict):
         if user_id in self.users:
-            await self.users[user_id].send(json.dumps(message))
+            await self._send_all(list(self.users[user_id]), dumps_str(message), "direct")
+
+    def authenticate(self, path: str, headers) -> Optional[str]:
+        # token 可放在 query string (瀏覽器無法自訂 header) 或 Authorization header
+        token = parse_qs(urlsplit(path).query).get('token', [None])[0]
+        if token is None:
+            auth_header = headers.get('Authorization', '') if headers else ''
+            if auth_header.startswith('Bearer '):
+                token = auth_header.split(' ')[1]
+        if not token:
+            return None
+        try:
+            return decode_access_token(token).get('sub')
+        except JWTError:
+            return None
+
+    def _over_connection_cap(self, user_id: str) -> bool:
+        return len(self.users.get(user_id, ())) >= settings.websocket_max_connections_per_user
+
+    async def process_request(self, path: str, request_headers):
+        # 在握手階段驗證 JWT, 驗證結果會被快取, handler 再次查詢時不需重新驗簽
+        user_id = self.authenticate(path, request_headers)
+        if user_id is None:
+            return HTTPStatus.UNAUTHORIZED, [], b"Missing or invalid token\n"
+        if self._over_connection_cap(user_id):
+            return HTTPStatus.TOO_MANY_REQUESTS, [], b"Too many connections\n"
+        return None
 
     async def handler(self, websocket: websockets.WebSocketServerProtocol, path: str):
-        user_id = path.split('/')[-1]
-        await self.register(websocket, user_id)
+        url = urlsplit(path)
+        room = parse_qs(url.query).get('room', [DEFAULT_ROOM])[0]
+
+        # 使用者身分只來自已驗證的 token, 不再信任 URL 路徑
+        user_id = self.authenticate(path, getattr(websocket, 'request_headers', None))
+        if user_id is None:
+            await websocket.close(1008, 'Missing or invalid token')
+            return
+        # process_request 之後到這裡之間可能有其他連線完成握手, 再檢查一次
+        if self._over_connection_cap(user_id):
+            await websocket.close(1008, 'Too many connections')
+            return
+
+        await self.register(websocket, user_id, room)
         try:
+            await self.history.load(room)
+            backlog = self.history.recent(room)
+            if backlog:
+                await websocket.send(dumps_str({
+                    'type': 'chat_history',
+                    'room': room,
+                    'messages': backlog
+                }))
+
             async for message in websocket:
                 data = json.loads(message)
                 if data['type'] == 'chat':
-                    await self.broadcast({
+                    chat = {
                         'type': 'chat',
+                        'room': room,
                         'user_id': user_id,
                         'message': data['message'],
-                        'timestamp': datetime.utcnow().isoformat()
-                    })
+                        'timestamp': datetime.datetime.utcnow().isoformat()
+                    }
+                    self.history.append(room, chat)
+                    await self.broadcast_to_room(room, chat)
                 elif data['type'] == 'notification':
                     target_user_id = data['target_user_id']
                     await self.send_to_user(target_user_id, {
@@ -48,4 +281,4 @@ class WebSocketServer:
                         'message': data['message']
                     })
         finally:
-            await self.unregister(websocket, user_id)
\ No newline at end of file
+            await self.unregister(websocket, user_id, room)